@@ -0,0 +1,112 @@
+"""
+Micro-benchmark for planning-data-entity-sync's payload parsing.
+
+Compares building the reference maps from a Datasette-style columnar payload
+({"columns": [...], "rows": [[...], ...]}) the old way (one dict per row, then
+build_reference_maps over the dicts) with the columnar path (_iter_fields
+reading only the reference / entity / name columns).
+
+Usage (from the repo root):
+
+    python benchmarks/columnar_rows.py
+    python benchmarks/columnar_rows.py --rows 500000 --extra-columns 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+JOB_DIR = Path(__file__).resolve().parent.parent / "src" / "planning-data-entity-sync"
+sys.path.insert(0, str(JOB_DIR))
+
+import main as entity_sync  # noqa: E402
+
+
+def make_payload(rows: int, extra_columns: int) -> Dict[str, Any]:
+    extras = [f"extra-{i}" for i in range(extra_columns)]
+    columns = ["entity", "dataset", "reference", "name", *extras]
+    return {
+        "columns": columns,
+        "rows": [
+            [
+                1_000_000 + i,
+                "local-authority",
+                f"REF{i:07d}",
+                f"Council {i}",
+                *[f"value-{i}-{j}" for j in range(extra_columns)],
+            ]
+            for i in range(rows)
+        ],
+    }
+
+
+# The implementation before the columnar path, kept here as the baseline
+def legacy_rows_to_dicts(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    for value in payload.values():
+        if isinstance(value, list) and value:
+            if isinstance(value[0], dict):
+                return value
+    rows = payload["rows"]
+    columns = payload["columns"]
+    dict_rows = []
+    for row in rows:
+        if not isinstance(row, list):
+            continue
+        dict_rows.append({col: row[i] for i, col in enumerate(columns)})
+    return dict_rows
+
+
+def legacy(payload: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    rows = legacy_rows_to_dicts(payload)
+    return entity_sync.build_reference_maps(
+        (row.get("reference"), row.get("entity"), row.get("name")) for row in rows
+    )
+
+
+def columnar(payload: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    return entity_sync.build_reference_maps(
+        entity_sync._iter_fields(payload, entity_sync.REFERENCE_FIELDS)
+    )
+
+
+def measure(fn: Callable[[Any], Any], payload: Any, repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"best_secs": best, "peak_alloc_mb": peak / (1024 * 1024)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--extra-columns", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = make_payload(args.rows, args.extra_columns)
+    assert legacy(payload) == columnar(payload)
+
+    print(f"{args.rows} rows x {len(payload['columns'])} columns")
+    print(f"{'path':<10}{'best s':>10}{'peak alloc MB':>16}")
+    for name, fn in (("legacy", legacy), ("columnar", columnar)):
+        result = measure(fn, payload, args.repeat)
+        print(f"{name:<10}{result['best_secs']:>10.3f}{result['peak_alloc_mb']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,575 @@
+"""
+Local stand-ins for the Notion, Planning Data and Metabase endpoints used by the
+sync jobs, backed by synthetic in-memory data.
+
+One ThreadingHTTPServer serves all three APIs:
+
+  Notion          POST  /v1/databases/{id}/query   (archived pages left out)
+                  GET   /v1/databases/{id}
+                  POST  /v1/pages
+                  PATCH /v1/pages/{id}
+  Planning Data   GET   /entity.json
+  Metabase        POST  /api/card/{id}/query/json
+                  POST  /api/card/{id}/query/csv
+
+Every response can be delayed (latency) and any request can be answered with an
+injected 429 or 5xx instead, at random or for the next requests to a given
+endpoint (forced_5xx). As with the real APIs, a 429 is rejected before the
+request is applied, while a 5xx may come after it was (a create may have
+happened). Counters per endpoint and status are kept so a benchmark run can
+report request volume and retries.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+COUNCILS_DB_ID = "27c35d469ad180aaacf4d8beb0ddb20c"
+SERVICES_DB_ID = "2e235d469ad18014a673cd7719bb400a"
+METABASE_CARD_ID = "1239"
+
+PD_DATASETS = [
+    "article-4-direction-area",
+    "conservation-area",
+    "listed-building-outline",
+    "tree",
+    "tree-preservation-zone",
+]
+PD_CHECKBOXES = [
+    "PD-Article4",
+    "PD-ConservationArea",
+    "PD-ListedBuildingOutline",
+    "PD-Trees",
+    "PD-TreePreservationZone",
+]
+
+COUNCILS_SCHEMA = {
+    "Council Name": "title",
+    "Reference Code": "rich_text",
+    "PD Entity": "rich_text",
+    "Customer Status": "select",
+    **{name: "checkbox" for name in PD_CHECKBOXES},
+}
+SERVICES_SCHEMA = {
+    "Flow Id": "title",
+    "Reference Code": "rich_text",
+    "Council Name": "rich_text",
+    "Service Name": "rich_text",
+    "Usage": "number",
+    "First Online": "date",
+    "URL": "url",
+    "Councils": "relation",
+    "Rank": "number",
+}
+
+
+# ----------------------------
+# Scenario
+# ----------------------------
+
+
+@dataclass
+class Scenario:
+    councils: int = 300
+    services: int = 1000
+    existing_services: float = 0.5  # share of flows already in the services DB
+    entities_per_dataset: int = 5000
+    latency_ms: float = 0.0
+    error_rate_429: float = 0.0
+    error_rate_5xx: float = 0.0
+    retry_after_secs: float = 0.0
+    seed: int = 1
+
+
+@dataclass
+class Counters:
+    requests: Counter = field(default_factory=Counter)  # (endpoint, status)
+    injected_429: int = 0
+    injected_5xx: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        by_endpoint: Dict[str, Dict[str, int]] = {}
+        for (endpoint, status), n in sorted(self.requests.items()):
+            by_endpoint.setdefault(endpoint, {})[str(status)] = n
+        return {
+            "total": sum(self.requests.values()),
+            "by_endpoint": by_endpoint,
+            "injected_429": self.injected_429,
+            "injected_5xx": self.injected_5xx,
+        }
+
+
+# ----------------------------
+# Notion property helpers
+# ----------------------------
+
+
+def _iso(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _text(value: str) -> List[dict]:
+    return [{"type": "text", "text": {"content": value}, "plain_text": value}]
+
+
+def _prop(ptype: str, value: Any) -> dict:
+    if ptype in ("title", "rich_text"):
+        return {"type": ptype, ptype: _text(value) if value else []}
+    if ptype == "select":
+        return {"type": ptype, ptype: {"name": value} if value else None}
+    if ptype == "date":
+        return {"type": ptype, ptype: {"start": value} if value else None}
+    if ptype == "relation":
+        return {"type": ptype, ptype: [{"id": i} for i in value or []]}
+    if ptype == "checkbox":
+        # Notion has no empty checkbox: one never set reads as unticked
+        return {"type": ptype, ptype: bool(value)}
+    return {"type": ptype, ptype: value}
+
+
+def _matches_equals(page: dict, flt: dict) -> bool:
+    """
+    Supports the one property filter the jobs send besides last_edited_time:
+    {"property": name, "title" | "rich_text": {"equals": value}}.
+    """
+    for ptype in ("title", "rich_text"):
+        expected = (flt.get(ptype) or {}).get("equals")
+        if expected is None:
+            continue
+        prop = page["properties"].get(flt.get("property")) or {}
+        text = "".join(part.get("plain_text", "") for part in prop.get(ptype) or [])
+        return text == expected
+    return True
+
+
+def _normalise_write(ptype: str, payload: dict) -> dict:
+    """
+    Converts a property value as sent by a client into the shape Notion
+    returns when the page is read back.
+    """
+    value = payload.get(ptype)
+    if ptype in ("title", "rich_text"):
+        parts = value or []
+        text = "".join((p.get("text") or {}).get("content", "") for p in parts)
+        return _prop(ptype, text)
+    if ptype == "relation":
+        return _prop(ptype, [r.get("id") for r in value or []])
+    if ptype == "select":
+        return _prop(ptype, (value or {}).get("name"))
+    if ptype == "date":
+        return _prop(ptype, (value or {}).get("start"))
+    return _prop(ptype, value)
+
+
+# ----------------------------
+# Synthetic data
+# ----------------------------
+
+
+class FakeData:
+    def __init__(self, scenario: Scenario) -> None:
+        rng = random.Random(scenario.seed)
+        self.lock = threading.Lock()
+        self.clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.databases: Dict[str, Dict[str, dict]] = {
+            COUNCILS_DB_ID: {},
+            SERVICES_DB_ID: {},
+        }
+        self.schemas = {
+            COUNCILS_DB_ID: COUNCILS_SCHEMA,
+            SERVICES_DB_ID: SERVICES_SCHEMA,
+        }
+
+        # Planning Data: local authorities (10% missing from Notion) and
+        # datasets whose entities belong to random organisations.
+        self.local_authorities = [
+            {
+                "entity": 1000 + i,
+                "dataset": "local-authority",
+                "reference": f"REF{i:05d}",
+                "name": f"Council {i}",
+            }
+            for i in range(int(scenario.councils * 1.1) + 1)
+        ]
+        org_ids = [str(la["entity"]) for la in self.local_authorities]
+        self.dataset_entities = {
+            dataset: [
+                {"organisation-entity": rng.choice(org_ids)}
+                for _ in range(rng.randint(0, scenario.entities_per_dataset))
+            ]
+            for dataset in PD_DATASETS
+        }
+        self.org_counts: Dict[Tuple[str, str], int] = Counter(
+            (dataset, e["organisation-entity"])
+            for dataset, entities in self.dataset_entities.items()
+            for e in entities
+        )
+
+        # Notion councils: PD Entity present on ~80%, some stale.
+        council_page_ids = []
+        for la in self.local_authorities[: scenario.councils]:
+            pd_entity = ""
+            roll = rng.random()
+            if roll < 0.7:
+                pd_entity = str(la["entity"])
+            elif roll < 0.8:
+                pd_entity = str(la["entity"] + 1)
+            props = {
+                "Council Name": la["name"],
+                "Reference Code": la["reference"],
+                "PD Entity": pd_entity,
+                "Customer Status": "Live",
+                **{name: rng.random() < 0.5 for name in PD_CHECKBOXES},
+            }
+            council_page_ids.append(self._insert(COUNCILS_DB_ID, props)["id"])
+
+        # Metabase rows, and the subset already present in the services DB.
+        self.metabase_rows = []
+        for i in range(scenario.services):
+            council = rng.randrange(scenario.councils)
+            la = self.local_authorities[council]
+            row = {
+                "reference_code": la["reference"],
+                "council_name": la["name"],
+                "team_slug": f"team-{council}",
+                "flow_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "service_name": f"Service {i}",
+                "service_slug": f"service-{i}",
+                "usage": rng.randint(0, 5000),
+                "first_online_at": _iso(
+                    self.clock - timedelta(days=rng.randint(1, 900))
+                ),
+                "url": f"https://example.planx.uk/{la['reference']}/service-{i}",
+            }
+            self.metabase_rows.append(row)
+            if rng.random() < scenario.existing_services:
+                stale = rng.random() < 0.3
+                props = {
+                    "Flow Id": row["flow_id"],
+                    "Reference Code": row["reference_code"],
+                    "Council Name": row["council_name"],
+                    "Service Name": row["service_name"],
+                    "Usage": row["usage"] - (1 if stale else 0),
+                    "First Online": row["first_online_at"],
+                    "URL": row["url"],
+                    "Councils": [council_page_ids[council]] if not stale else [],
+                    "Rank": 0,
+                }
+                self._insert(SERVICES_DB_ID, props)
+
+    def _tick(self) -> str:
+        self.clock += timedelta(seconds=1)
+        return _iso(self.clock)
+
+    def _insert(self, database_id: str, values: Dict[str, Any]) -> dict:
+        schema = self.schemas[database_id]
+        now = self._tick()
+        page = {
+            "object": "page",
+            "id": str(uuid.uuid4()),
+            "created_time": now,
+            "last_edited_time": now,
+            "archived": False,
+            "parent": {"type": "database_id", "database_id": database_id},
+            "properties": {
+                name: _prop(ptype, values.get(name)) for name, ptype in schema.items()
+            },
+        }
+        self.databases[database_id][page["id"]] = page
+        return page
+
+    # -------- Notion operations --------
+
+    def query(self, database_id: str, body: dict, filter_properties: List[str]) -> dict:
+        with self.lock:
+            pages = [
+                p for p in self.databases[database_id].values() if not p["archived"]
+            ]
+        since = ((body.get("filter") or {}).get("last_edited_time") or {}).get(
+            "on_or_after"
+        )
+        if since:
+            pages = [p for p in pages if p["last_edited_time"] >= since]
+        pages = [p for p in pages if _matches_equals(p, body.get("filter") or {})]
+        for sort in reversed(body.get("sorts") or []):
+            if sort.get("timestamp") in ("created_time", "last_edited_time"):
+                pages.sort(
+                    key=lambda p, ts=sort["timestamp"]: p[ts],
+                    reverse=sort.get("direction") == "descending",
+                )
+        start = int(body.get("start_cursor") or 0)
+        size = int(body.get("page_size") or 100)
+        chunk = pages[start : start + size]
+        has_more = start + size < len(pages)
+        if filter_properties:
+            # Only the title property has a well-known id ("title")
+            keep = {
+                name
+                for name, ptype in self.schemas[database_id].items()
+                if "title" in filter_properties and ptype == "title"
+            }
+            chunk = [
+                {
+                    **p,
+                    "properties": {
+                        k: v for k, v in p["properties"].items() if k in keep
+                    },
+                }
+                for p in chunk
+            ]
+        return {
+            "object": "list",
+            "results": chunk,
+            "has_more": has_more,
+            "next_cursor": str(start + size) if has_more else None,
+        }
+
+    def retrieve_database(self, database_id: str) -> dict:
+        schema = self.schemas[database_id]
+        return {
+            "object": "database",
+            "id": database_id,
+            "properties": {n: {"name": n, "type": t} for n, t in schema.items()},
+        }
+
+    def create_page(self, body: dict) -> dict:
+        database_id = (body.get("parent") or {}).get("database_id")
+        schema = self.schemas[database_id]
+        with self.lock:
+            page = self._insert(database_id, {})
+            for name, value in (body.get("properties") or {}).items():
+                if name in schema:
+                    page["properties"][name] = _normalise_write(schema[name], value)
+        return page
+
+    def update_page(self, page_id: str, body: dict) -> Optional[dict]:
+        with self.lock:
+            for database_id, pages in self.databases.items():
+                page = pages.get(page_id)
+                if page is None:
+                    continue
+                schema = self.schemas[database_id]
+                for name, value in (body.get("properties") or {}).items():
+                    if name in schema:
+                        page["properties"][name] = _normalise_write(schema[name], value)
+                if "archived" in body:
+                    page["archived"] = bool(body["archived"])
+                page["last_edited_time"] = self._tick()
+                return page
+        return None
+
+    # -------- Planning Data --------
+
+    def entity_json(self, query: Dict[str, str]) -> dict:
+        dataset = query.get("dataset", "")
+        org = query.get("organisation_entity")
+        limit = int(query.get("limit") or 10)
+        offset = int(query.get("offset") or 0)
+
+        if dataset == "local-authority":
+            rows = self.local_authorities
+        else:
+            rows = self.dataset_entities.get(dataset, [])
+
+        if org is not None:
+            count = self.org_counts.get((dataset, org), 0)
+            return {"entities": [], "count": count, "links": {}}
+
+        page = rows[offset : offset + limit]
+        links: Dict[str, str] = {}
+        if offset + limit < len(rows):
+            links["next"] = "/entity.json?" + urlencode(
+                {**query, "offset": offset + limit}
+            )
+        return {"entities": page, "count": len(rows), "links": links}
+
+
+# ----------------------------
+# HTTP server
+# ----------------------------
+
+
+def _to_csv(rows: List[dict]) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(rows[0]) if rows else [])
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+_PAGE_PATH = re.compile(r"^/v1/pages/([^/]+)$")
+_DB_QUERY_PATH = re.compile(r"^/v1/databases/([^/]+)/query$")
+_DB_PATH = re.compile(r"^/v1/databases/([^/]+)$")
+_CARD_PATH = re.compile(r"^/api/card/([^/]+)/query/(json|csv)$")
+
+
+class FakeServer:
+    """
+    Runs the fake APIs on 127.0.0.1 in a background thread.
+    """
+
+    def __init__(self, scenario: Scenario) -> None:
+        self.scenario = scenario
+        self.data = FakeData(scenario)
+        self.counters = Counters()
+        # endpoint label -> how many of its next responses to replace with a
+        # 503 (the request is still applied, as when a proxy drops a reply)
+        self.forced_5xx: Counter = Counter()
+        self._rng = random.Random(scenario.seed + 1)
+        self._rng_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> FakeServer:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _inject(self, endpoint: str) -> Optional[int]:
+        with self._rng_lock:
+            if self.forced_5xx[endpoint] > 0:
+                self.forced_5xx[endpoint] -= 1
+                return 503
+            roll = self._rng.random()
+        if roll < self.scenario.error_rate_429:
+            return 429
+        if roll < self.scenario.error_rate_429 + self.scenario.error_rate_5xx:
+            return 503
+        return None
+
+    def endpoint(self, method: str, raw_path: str) -> str:
+        """
+        The endpoint label route() would answer the request under.
+        """
+        path = urlsplit(raw_path).path
+        if method == "POST" and _DB_QUERY_PATH.match(path):
+            return "notion.databases.query"
+        if method == "GET" and _DB_PATH.match(path):
+            return "notion.databases.retrieve"
+        if method == "POST" and path == "/v1/pages":
+            return "notion.pages.create"
+        if method == "PATCH" and _PAGE_PATH.match(path):
+            return "notion.pages.update"
+        if method == "GET" and path == "/entity.json":
+            return "planning_data.entity"
+        if method == "POST" and _CARD_PATH.match(path):
+            return "metabase.card.query"
+        return f"{method} {path}"
+
+    def route(self, method: str, raw_path: str, body: Any) -> Tuple[str, int, Any]:
+        """
+        Returns (endpoint label, status, JSON response).
+        """
+        parts = urlsplit(raw_path)
+        path = parts.path
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+        if method == "POST" and (m := _DB_QUERY_PATH.match(path)):
+            if m.group(1) not in self.data.databases:
+                return "notion.databases.query", 404, {"message": "not found"}
+            return (
+                "notion.databases.query",
+                200,
+                self.data.query(
+                    m.group(1),
+                    body,
+                    parse_qs(parts.query).get("filter_properties") or [],
+                ),
+            )
+        if method == "GET" and (m := _DB_PATH.match(path)):
+            if m.group(1) not in self.data.databases:
+                return "notion.databases.retrieve", 404, {"message": "not found"}
+            return (
+                "notion.databases.retrieve",
+                200,
+                self.data.retrieve_database(m.group(1)),
+            )
+        if method == "POST" and path == "/v1/pages":
+            return "notion.pages.create", 200, self.data.create_page(body)
+        if method == "PATCH" and (m := _PAGE_PATH.match(path)):
+            page = self.data.update_page(m.group(1), body)
+            if page is None:
+                return "notion.pages.update", 404, {"message": "not found"}
+            return "notion.pages.update", 200, page
+        if method == "GET" and path == "/entity.json":
+            return "planning_data.entity", 200, self.data.entity_json(query)
+        if method == "POST" and (m := _CARD_PATH.match(path)):
+            if m.group(2) == "csv":
+                return "metabase.card.query", 200, _to_csv(self.data.metabase_rows)
+            return "metabase.card.query", 200, self.data.metabase_rows
+        return f"{method} {path}", 404, {"message": "unknown endpoint"}
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                is_json = "json" in (self.headers.get("Content-Type") or "json")
+                body = json.loads(raw) if raw and is_json else {}
+
+                if server.scenario.latency_ms:
+                    time.sleep(server.scenario.latency_ms / 1000)
+
+                endpoint = server.endpoint(self.command, self.path)
+                injected = server._inject(endpoint)
+                if injected != 429:
+                    endpoint, status, payload = server.route(
+                        self.command, self.path, body
+                    )
+                headers: Dict[str, str] = {}
+                if injected is not None:
+                    status = injected
+                    payload = {"object": "error", "status": status, "code": "injected"}
+                    if injected == 429:
+                        payload["code"] = "rate_limited"
+                        headers["Retry-After"] = str(server.scenario.retry_after_secs)
+                        server.counters.injected_429 += 1
+                    else:
+                        server.counters.injected_5xx += 1
+                server.counters.requests[(endpoint, status)] += 1
+
+                # A str payload is a CSV export; everything else is JSON
+                if isinstance(payload, str):
+                    out, content_type = payload.encode(), "text/csv"
+                else:
+                    out, content_type = json.dumps(payload).encode(), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(out)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(out)
+
+            do_GET = do_POST = do_PATCH = _handle
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,197 @@
+"""
+End-to-end benchmark for the sync jobs.
+
+Starts the local API stand-ins from fake_servers.py, runs each job as a
+subprocess pointed at them, and reports wall time, peak RSS and request counts.
+
+Usage (from the repo root):
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --councils 1000 --services 10000 \\
+        --latency-ms 20 --error-rate-429 0.02 --json out.json
+    python benchmarks/run_benchmarks.py --jobs entity-sync api-fetch
+
+Each job runs against a fresh copy of the synthetic data, so results do not
+depend on the order jobs are run in. Extra environment variables (for example
+INCREMENTAL or PD_COUNT_BACKEND) are passed through to the jobs unchanged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from fake_servers import FakeServer, Scenario
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_ROOT / "src"
+
+JOBS = {
+    "entity-sync": SRC_DIR / "planning-data-entity-sync",
+    "api-fetch": SRC_DIR / "planning-data-api-fetch",
+    "services-detailed": SRC_DIR / "sync-planx-services-detailed",
+    "sync-all": SRC_DIR / "sync-all",
+}
+
+
+# ----------------------------
+# Running a job
+# ----------------------------
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def job_env(base_url: str, state_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "NOTION_TOKEN": "benchmark-token",
+            "METABASE_API_KEY": "benchmark-key",
+            "NOTION_BASE_URL": base_url,
+            "PLANNING_DATA_BASE_URL": base_url,
+            "METABASE_URL": base_url,
+            "DRY_RUN": "false",
+            "PYTHONUNBUFFERED": "1",
+        }
+    )
+    # Keep job state out of the working tree unless explicitly configured.
+    env.setdefault("SYNC_STATE_DIR", os.path.join(state_dir, "state"))
+    env.setdefault("HTTP_CACHE_DIR", os.path.join(state_dir, "http"))
+    return env
+
+
+def run_job(name: str, scenario: Scenario, log_dir: str) -> Dict[str, Any]:
+    job_dir = JOBS[name]
+    with FakeServer(scenario) as server, tempfile.TemporaryDirectory() as state_dir:
+        log_path = os.path.join(log_dir, f"{name}.log")
+        with open(log_path, "w", encoding="utf-8") as log:
+            started = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable, "main.py"],
+                cwd=job_dir,
+                env=job_env(server.base_url, state_dir),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+            # wait4 reports the child's own peak RSS (KiB on Linux, bytes on macOS)
+            _, status, usage = os.wait4(proc.pid, 0)
+            wall = time.perf_counter() - started
+            proc.returncode = os.waitstatus_to_exitcode(status)
+
+        rss_kib = usage.ru_maxrss
+        if platform.system() == "Darwin":
+            rss_kib //= 1024
+
+        counters = server.counters.as_dict()
+        return {
+            "job": name,
+            "exit_code": proc.returncode,
+            "wall_secs": round(wall, 3),
+            "peak_rss_mb": round(rss_kib / 1024, 1),
+            "requests": counters["total"],
+            "retried": counters["injected_429"] + counters["injected_5xx"],
+            "counters": counters,
+            "log": log_path,
+        }
+
+
+# ----------------------------
+# Reporting
+# ----------------------------
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'job':<20}{'exit':>6}{'wall s':>10}{'rss MB':>10}{'requests':>10}"
+    header += f"{'retried':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['job']:<20}{r['exit_code']:>6}{r['wall_secs']:>10.2f}"
+            f"{r['peak_rss_mb']:>10.1f}{r['requests']:>10}{r['retried']:>10}"
+        )
+    for r in results:
+        if r["exit_code"] != 0:
+            print(f"[WARN] {r['job']} failed, see {r['log']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", nargs="+", choices=sorted(JOBS), default=None)
+    parser.add_argument("--councils", type=int, default=Scenario.councils)
+    parser.add_argument("--services", type=int, default=Scenario.services)
+    parser.add_argument(
+        "--existing-services", type=float, default=Scenario.existing_services
+    )
+    parser.add_argument(
+        "--entities-per-dataset", type=int, default=Scenario.entities_per_dataset
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after-secs", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=Scenario.seed)
+    parser.add_argument("--log-dir", default=None, help="Where job output is kept")
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args()
+
+    scenario = Scenario(
+        councils=args.councils,
+        services=args.services,
+        existing_services=args.existing_services,
+        entities_per_dataset=args.entities_per_dataset,
+        latency_ms=args.latency_ms,
+        error_rate_429=args.error_rate_429,
+        error_rate_5xx=args.error_rate_5xx,
+        retry_after_secs=args.retry_after_secs,
+        seed=args.seed,
+    )
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix="planx-bench-")
+    os.makedirs(log_dir, exist_ok=True)
+
+    results = []
+    for name in args.jobs or list(JOBS):
+        print(f"Running {name} ...", flush=True)
+        results.append(run_job(name, scenario, log_dir))
+
+    print()
+    print_table(results)
+    print(f"\nJob logs: {log_dir}")
+
+    if args.json:
+        report = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "scenario": vars(scenario),
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if any(r["exit_code"] != 0 for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
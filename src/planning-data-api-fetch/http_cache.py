@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+# ----------------------------
+# Persistent HTTP cache
+# ----------------------------
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0  # served from disk without a request
+    revalidations: int = 0  # served from disk after a 304 Not Modified
+    misses: int = 0  # full response downloaded
+    evictions: int = 0
+
+    def report(self) -> str:
+        return (
+            f"hits={self.hits}, revalidations={self.revalidations}, "
+            f"misses={self.misses}, evictions={self.evictions}"
+        )
+
+
+class HttpCache:
+    """
+    On-disk cache of GET response bodies keyed by URL, stored in one SQLite file.
+
+    - Entries younger than ttl_secs are served without touching the network.
+    - Older entries are revalidated with If-None-Match / If-Modified-Since, so
+      an unchanged response costs a 304 with no body.
+    - The total body size is kept under max_bytes by evicting the least
+      recently used entries.
+    """
+
+    def __init__(self, cache_dir: str, ttl_secs: int, max_bytes: int) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "http-cache.sqlite3")
+        self.ttl_secs = ttl_secs
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " url TEXT PRIMARY KEY,"
+            " body BLOB NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def fetch(self, url: str, send: Callable[[Dict[str, str]], Any]) -> bytes:
+        """
+        Returns the response body for url, calling send(headers) only when the
+        cached copy is missing or stale. send must return a response object
+        with status_code, headers, content and raise_for_status().
+        """
+        entry = self._get(url)
+        now = time.time()
+
+        if entry is not None:
+            body, etag, last_modified, stored_at = entry
+            if now - stored_at < self.ttl_secs:
+                self._touch(url, now, refresh=False)
+                with self._lock:
+                    self.stats.hits += 1
+                return body
+
+        headers: Dict[str, str] = {}
+        if entry is not None:
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        resp = send(headers)
+        if resp.status_code == 304 and entry is not None:
+            self._touch(url, time.time(), refresh=True)
+            with self._lock:
+                self.stats.revalidations += 1
+            return entry[0]
+
+        resp.raise_for_status()
+        body = resp.content
+        self._put(
+            url, body, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        )
+        with self._lock:
+            self.stats.misses += 1
+        return body
+
+    # ----------------------------
+    # Storage
+    # ----------------------------
+
+    def _get(self, url: str) -> Optional[Tuple[bytes, str, str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, stored_at FROM entries"
+                " WHERE url = ?",
+                (url,),
+            ).fetchone()
+        return row
+
+    def _touch(self, url: str, now: float, refresh: bool) -> None:
+        with self._lock:
+            if refresh:
+                self._conn.execute(
+                    "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE url = ?",
+                    (now, now, url),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE url = ?", (now, url)
+                )
+            self._conn.commit()
+
+    def _put(
+        self,
+        url: str,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (url, body, etag, last_modified, stored_at, accessed_at, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now, len(body)),
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT url, size FROM entries ORDER BY accessed_at ASC"
+        ).fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            total -= size
+            self.stats.evictions += 1
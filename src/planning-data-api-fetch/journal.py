@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+JOURNAL_VERSION = 1
+MAX_AGE = timedelta(hours=24)
+
+
+# ----------------------------
+# Write-ahead journal
+# ----------------------------
+
+
+class Journal:
+    """
+    Append-only JSONL log of one run's progress, kept under the state dir so an
+    interrupted run can be resumed by the next one.
+
+    Records (one JSON object per line):
+      {"t": "header", ...}          job, context and start time
+      {"t": "batch", ...}           a processed Notion batch: its page ids, the
+                                    cursor that resumes after it, the writes it
+                                    planned and any job-specific extras
+      {"t": "ops", "ops": [...]}    writes planned outside a batch
+      {"t": "listed"}               every page was read and planned
+      {"t": "done", "key": ...}     a planned write that succeeded
+
+    Every planned write is an op dict with a unique "key". Ops are logged
+    before they are submitted and marked done from the worker that applied
+    them, so after a crash pending_ops() is exactly the work left over.
+    The file is removed once a run gets to the end, even with failed writes:
+    a sync run plans those afresh next time (resuming would plan nothing
+    new), while MODE=apply keeps it so a re-run retries only what failed.
+
+    A journal left by a run with a different context (database, datasets, ...)
+    or older than MAX_AGE is discarded rather than resumed, since its plan
+    would be stale. With no state dir, or for dry runs, every method is a
+    no-op.
+    """
+
+    def __init__(self, state_dir: Optional[str], name: str, context: Dict[str, Any]):
+        self.enabled = bool(state_dir)
+        self.path = os.path.join(state_dir, f"{name}.jsonl") if state_dir else ""
+        self.resumed = False
+        self.listed = False
+        self.cursor: Optional[str] = None
+        self.seen_pages: Set[str] = set()
+        self.extras: Dict[str, List[Any]] = {}
+        self._planned: Dict[str, dict] = {}
+        self._done: Set[str] = set()
+        self._lock = threading.Lock()
+        self._file = None
+
+        if not self.enabled:
+            return
+        os.makedirs(state_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            self._load(context)
+        if not self.resumed:
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._append(
+                {
+                    "t": "header",
+                    "version": JOURNAL_VERSION,
+                    "context": context,
+                    "started_at": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+        else:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    # ----------------------------
+    # Loading
+    # ----------------------------
+
+    def _load(self, context: Dict[str, Any]) -> None:
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A crash mid-append leaves a partial last line
+                    break
+
+        header = records[0] if records else {}
+        reason = None
+        if header.get("t") != "header" or header.get("version") != JOURNAL_VERSION:
+            reason = "unreadable"
+        elif header.get("context") != context:
+            reason = "configuration changed"
+        else:
+            started = datetime.fromisoformat(header["started_at"])
+            if datetime.now(timezone.utc) - started > MAX_AGE:
+                reason = "older than 24h"
+        if reason:
+            print(f"[WARN] Discarding journal {self.path}: {reason}")
+            return
+
+        for record in records[1:]:
+            kind = record.get("t")
+            if kind == "batch":
+                self.cursor = record.get("cursor")
+                self.seen_pages.update(record.get("pages") or [])
+                for key, values in (record.get("extras") or {}).items():
+                    self.extras.setdefault(key, []).extend(values)
+            if kind in ("batch", "ops"):
+                for op in record.get("ops") or []:
+                    self._planned[op["key"]] = op
+            elif kind == "done":
+                self._done.add(record["key"])
+            elif kind == "listed":
+                self.listed = True
+        self.resumed = True
+
+    # ----------------------------
+    # Recording
+    # ----------------------------
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def pending_ops(self) -> List[dict]:
+        """
+        Ops planned by the interrupted run that never completed, in plan order.
+        """
+        return [op for key, op in self._planned.items() if key not in self._done]
+
+    def has_op(self, key: str) -> bool:
+        """
+        Whether the interrupted run already planned this op (done or not).
+        """
+        return key in self._planned
+
+    def record_batch(
+        self,
+        cursor: Optional[str],
+        page_ids: List[str],
+        ops: List[dict],
+        extras: Optional[Dict[str, List[Any]]] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        record: Dict[str, Any] = {
+            "t": "batch",
+            "cursor": cursor,
+            "pages": page_ids,
+            "ops": ops,
+        }
+        if extras:
+            record["extras"] = extras
+        self._append(record)
+
+    def record_ops(self, ops: List[dict]) -> None:
+        if self.enabled and ops:
+            self._append({"t": "ops", "ops": ops})
+
+    def mark_listed(self) -> None:
+        """
+        Records that the scan finished, so a resumed run only has the pending
+        ops left to apply.
+        """
+        if self.enabled:
+            self._append({"t": "listed"})
+
+    def mark_done(self, key: str) -> None:
+        if self.enabled:
+            self._append({"t": "done", "key": key})
+
+    def tracked(self, key: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Wraps fn so the op is marked done as soon as it succeeds.
+        """
+
+        def run(*args: Any) -> Any:
+            result = fn(*args)
+            self.mark_done(key)
+            return result
+
+        return run
+
+    def complete(self) -> None:
+        """
+        Removes the journal: the run finished and nothing needs resuming.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._file.close()
+            self._file = None
+        os.remove(self.path)
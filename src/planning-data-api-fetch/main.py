@@ -1,22 +1,34 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Tuple
-from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlencode, urljoin
 
 from dotenv import load_dotenv
 
 from api_helpers import (
+    NotionWriteExecutor,
+    cache_stats_report,
+    configure_cache,
+    configure_transport,
     fetch_json,
-    query_all_database_pages,
-    read_checkbox,
-    read_text_or_title,
     update_page_checkbox_properties,
 )
 from config import AppConfig, build_config
+from journal import Journal
+from metrics import METRICS, write_metrics
+from notion_snapshot import iter_snapshot_cursor_batches
+from page_records import CouncilPage, council_page_decoder
+from plan_file import read_plan, shard_ops, summarize_ops, write_plan
+from profiling import profile_run
+from record_hashes import RecordHashes, record_hash
+from run_fingerprint import check_unchanged, fingerprint, record_run
 
 load_dotenv()
 
+METRICS_JOB = "planning-data-api-fetch"
+
 
 # ----------------------------
 # Planning Data helpers
@@ -42,6 +54,155 @@ def extract_count(payload: Any) -> int:
     return 0
 
 
+def fetch_dataset_counts(
+    config: AppConfig, pd_entities: List[str], datasets: List[str]
+) -> Dict[Tuple[str, str], Union[int, Exception]]:
+    """
+    Resolves the count for every (PD Entity, dataset) pair concurrently, with at
+    most config.planning_data_max_in_flight requests open against Planning Data.
+    Each value is either the count or the exception raised while fetching it, so
+    a failed request only affects the council it belongs to.
+    """
+    results: Dict[Tuple[str, str], Union[int, Exception]] = {}
+    if not pd_entities or not datasets:
+        return results
+
+    def fetch_count(dataset: str, pd_entity: str) -> int:
+        url = build_planning_data_url(config, dataset, pd_entity)
+        payload = fetch_json(url, timeout_secs=config.request_timeout_secs)
+        return extract_count(payload)
+
+    max_workers = max(1, config.planning_data_max_in_flight)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_count, dataset, pd_entity): (pd_entity, dataset)
+            for pd_entity in dict.fromkeys(pd_entities)
+            for dataset in datasets
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = e
+
+    return results
+
+
+def build_dataset_page_url(config: AppConfig, dataset: str, offset: int) -> str:
+    params = {
+        "dataset": dataset,
+        "field": "organisation-entity",
+        "limit": config.planning_data_page_size,
+        "offset": offset,
+    }
+    return f"{config.planning_data_base_url}?{urlencode(params)}"
+
+
+def fetch_organisation_counts(config: AppConfig, dataset: str) -> Dict[str, int]:
+    """
+    Pages through every entity in a dataset (organisation-entity field only)
+    and returns { organisation_entity: number of entities }.
+    """
+    counts: Dict[str, int] = {}
+    offset = 0
+    url: Optional[str] = build_dataset_page_url(config, dataset, offset)
+
+    while url:
+        payload = fetch_json(url, timeout_secs=config.request_timeout_secs)
+        entities = payload.get("entities") if isinstance(payload, dict) else None
+        if not entities:
+            break
+
+        for entity in entities:
+            org = entity.get("organisation-entity")
+            if org is None or str(org).strip() == "":
+                continue
+            key = str(org).strip()
+            counts[key] = counts.get(key, 0) + 1
+
+        offset += len(entities)
+        next_url = (payload.get("links") or {}).get("next")
+        if next_url:
+            next_url = urljoin(url, next_url)
+        elif len(entities) >= config.planning_data_page_size:
+            # Fall back to offset paging if the response has no links block
+            total = payload.get("count")
+            if not isinstance(total, int) or offset < total:
+                next_url = build_dataset_page_url(config, dataset, offset)
+        url = next_url if next_url != url else None
+
+    return counts
+
+
+def build_count_index(
+    config: AppConfig, datasets: List[str]
+) -> Dict[str, Union[Dict[str, int], Exception]]:
+    """
+    Builds { dataset: { organisation_entity: count } }, paging each dataset once.
+    A dataset that fails to load maps to the exception instead of an index.
+    """
+    index: Dict[str, Union[Dict[str, int], Exception]] = {}
+    max_workers = max(1, min(config.planning_data_max_in_flight, len(datasets)))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_organisation_counts, config, dataset): dataset
+            for dataset in datasets
+        }
+        for future in as_completed(futures):
+            dataset = futures[future]
+            try:
+                index[dataset] = future.result()
+            except Exception as e:
+                index[dataset] = e
+    return index
+
+
+def resolve_dataset_counts(
+    config: AppConfig,
+    pd_entities: List[str],
+    datasets: List[str],
+    count_index: Optional[Dict[str, Union[Dict[str, int], Exception]]] = None,
+) -> Dict[Tuple[str, str], Union[int, Exception]]:
+    """
+    Returns the same { (pd_entity, dataset): count } mapping regardless of which
+    count backend is configured. With the index backend, pass the result of
+    build_count_index so datasets are only paged through once per run.
+    """
+    if config.planning_data_count_backend != "index":
+        return fetch_dataset_counts(config, pd_entities, datasets)
+
+    index = (
+        count_index if count_index is not None else build_count_index(config, datasets)
+    )
+    results: Dict[Tuple[str, str], Union[int, Exception]] = {}
+    for pd_entity in pd_entities:
+        for dataset in datasets:
+            counts = index[dataset]
+            if isinstance(counts, Exception):
+                results[(pd_entity, dataset)] = counts
+            else:
+                results[(pd_entity, dataset)] = counts.get(pd_entity.strip(), 0)
+    return results
+
+
+def source_fingerprint(
+    count_index: Optional[Dict[str, Union[Dict[str, int], Exception]]],
+) -> Optional[str]:
+    """
+    Fingerprint of the Planning Data side of a run: every organisation's
+    count from the index backend. None if it could not be read, or with the
+    probe backend, whose only cheap fingerprint (each dataset's total) misses
+    an entity moving between organisations, so those runs are never skipped.
+    """
+    if count_index is None:
+        print("[INFO] SKIP_UNCHANGED needs PD_COUNT_BACKEND=index; running in full")
+        return None
+    if any(isinstance(counts, Exception) for counts in count_index.values()):
+        return None
+    return fingerprint(["index", count_index])
+
+
 # ----------------------------
 # Dry Run helpers
 # ----------------------------
@@ -57,7 +218,76 @@ def log_page_updates(ref: str, page_id: str, diffs: Dict[str, bool]) -> None:
 # ----------------------------
 
 
-def sync_notion_from_planning_data(config: AppConfig) -> None:
+def submit_op(
+    writer: NotionWriteExecutor, journal: Journal, config: AppConfig, op: dict
+) -> None:
+    writer.submit(
+        op["label"],
+        journal.tracked(op["key"], update_page_checkbox_properties),
+        config,
+        op["page_id"],
+        op["props"],
+        log_line=op["log"],
+    )
+
+
+def apply_plan(config: AppConfig, context: Dict[str, Any]) -> None:
+    """
+    MODE=apply: executes this shard's share of a plan written by MODE=plan,
+    without reading Notion or Planning Data. Progress is journaled as in a
+    normal run, so an interrupted apply finishes when it is re-run.
+    """
+    plan = read_plan(config.plan_file, METRICS_JOB, context)
+    ops = shard_ops(plan["ops"], config.shard_index, config.shard_count)
+    journal = Journal(
+        config.state_dir,
+        f"journal-{METRICS_JOB}-apply-{config.shard_index}of{config.shard_count}",
+        context={**context, "plan_created_at": plan["created_at"]},
+    )
+    if journal.resumed:
+        ops = journal.pending_ops()
+        print(f"Resuming interrupted apply: {len(ops)} writes left")
+    else:
+        journal.record_ops(ops)
+    print(
+        f"Applying plan from {plan['created_at']} "
+        f"(shard {config.shard_index + 1}/{config.shard_count}): "
+        f"{summarize_ops(ops)}"
+    )
+
+    errors: List[Tuple[str, str]] = []
+    updated_logs: List[str] = []
+    with NotionWriteExecutor(config) as writer, METRICS.phase("apply"):
+        for op in ops:
+            submit_op(writer, journal, config, op)
+        updated_pages = writer.drain(errors, updated_logs)
+    if not errors:
+        journal.complete()
+
+    if config.verbose_logs and updated_logs:
+        print("\n[UPDATED PAGES]")
+        for line in updated_logs:
+            print(line)
+    print("\n[SUMMARY]")
+    print("✅ Finished")
+    print(f"Updated pages: {updated_pages}")
+    print(f"Phases: {METRICS.phase_report()}")
+    if errors:
+        print(f"Errors: {len(errors)}")
+        for pid, err in errors:
+            print(f"- {pid}: {err}")
+
+
+def sync_notion_from_planning_data(
+    config: AppConfig, pages: Optional[List[CouncilPage]] = None
+) -> None:
+    """
+    pages: an already loaded councils snapshot (see src/sync-all), decoded
+    with this job's checkbox properties. When given, it is filtered locally
+    instead of querying Notion.
+    """
+    configure_transport(config)
+    configure_cache(config)
     selected_datasets = [
         d
         for d, enabled in config.dataset_enabled.items()
@@ -66,6 +296,16 @@ def sync_notion_from_planning_data(config: AppConfig) -> None:
     if not selected_datasets:
         raise ValueError("No datasets enabled in config.dataset_enabled.")
     print(f"Datasets enabled: {', '.join(selected_datasets)}")
+    # Plans and journals only carry over between runs configured alike
+    context = {
+        "database_id": config.notion_database_id,
+        "datasets": selected_datasets,
+        "only_update_if_changed": config.only_update_if_changed,
+    }
+    if config.mode == "apply":
+        apply_plan(config, context)
+        return
+    print(f"Count backend: {config.planning_data_count_backend}")
 
     filter_payload = {
         "and": [
@@ -76,93 +316,247 @@ def sync_notion_from_planning_data(config: AppConfig) -> None:
             },
         ]
     }
-    pages = query_all_database_pages(config, filter_payload=filter_payload)
-    print(f"Loaded Notion pages: {len(pages)}")
+    keep_props = [
+        config.notion_ref_code_prop,
+        config.notion_council_name_prop,
+        config.notion_pd_entity_prop,
+        *config.dataset_to_notion_prop.values(),
+    ]
+
+    def matches_filter(page: CouncilPage) -> bool:
+        return bool(page.ref and page.pd_entity)
 
+    count_index = None
+    if config.planning_data_count_backend == "index":
+        with METRICS.phase("index"):
+            count_index = build_count_index(config, selected_datasets)
+    skip_unchanged = config.skip_unchanged and config.mode == "sync"
+    source = None
+    if skip_unchanged:
+        with METRICS.phase("fingerprint"):
+            source = source_fingerprint(count_index)
+
+    loaded_pages = 0
     updated_pages = 0
+    planned_updates = 0
     skipped_no_ref = 0
     skipped_no_pd_entity = 0
     skipped_no_change = 0
+    settled_by_hash = 0
     errors: List[Tuple[str, str]] = []
     updated_logs: List[str] = []
     skipped_logs: List[str] = []
-
-    for page in pages:
-        council_name = ""
-        try:
-            page_id = page.get("id")
-            props = page.get("properties") or {}
-
-            ref = read_text_or_title(props, config.notion_ref_code_prop)
-            council_name = (
-                read_text_or_title(props, config.notion_council_name_prop) or ""
+    plan_ops: List[dict] = []
+
+    # Plan-only runs write nothing, so they have nothing to resume either
+    journal = Journal(
+        None if config.dry_run else config.state_dir,
+        "journal-planning-data-api-fetch",
+        context=context,
+    )
+    hashes = RecordHashes(
+        None if config.dry_run else config.state_dir,
+        f"record-hashes-{METRICS_JOB}",
+        context,
+    )
+    if source is not None and not journal.resumed:
+        with METRICS.phase("fingerprint"):
+            unchanged, reason = check_unchanged(
+                config, f"fingerprint-{METRICS_JOB}", context, source
+            )
+        print(f"Fingerprints: {reason}")
+        if unchanged:
+            journal.complete()
+            print("\n[SUMMARY]")
+            print("✅ Finished (nothing changed; Notion was not scanned)")
+            print(f"Phases: {METRICS.phase_report()}")
+            return
+
+    with NotionWriteExecutor(config) as writer:
+        if journal.resumed:
+            resumed_ops = journal.pending_ops()
+            print(
+                f"Resuming interrupted run: {len(journal.seen_pages)} pages "
+                f"already planned, {len(resumed_ops)} writes left"
+            )
+            for op in resumed_ops:
+                submit_op(writer, journal, config, op)
+            planned_updates += len(resumed_ops)
+
+        # Notion pages stream in one query response at a time; each batch is
+        # diffed and its writes queued while the next batch is being fetched.
+        # The journal records each planned batch with the cursor after it, so
+        # a resumed run carries on from there.
+        if journal.listed:
+            page_batches = []
+        elif pages is not None:
+            page_batches = [([page for page in pages if matches_filter(page)], None)]
+        else:
+            page_batches = iter_snapshot_cursor_batches(
+                config,
+                "councils-planning-data-api-fetch",
+                keep_props,
+                council_page_decoder(config, config.dataset_to_notion_prop.values()),
+                filter_payload=filter_payload,
+                local_filter=matches_filter,
+                start_cursor=journal.cursor,
+            )
+        planning_failed = False
+        for batch, cursor in METRICS.timed_iter("fetch", page_batches):
+            loaded_pages += len(batch)
+
+            # Pass 1: read Notion properties and find councils that need counts
+            METRICS.enter_phase("plan")
+            planned_ids: List[str] = []
+            candidates: List[Tuple[CouncilPage, str, str, str]] = []
+            for page in batch:
+                council_name = ""
+                try:
+                    page_id = page.id
+                    if page_id in journal.seen_pages:
+                        continue
+
+                    ref = page.ref
+                    council_name = page.council_name or ""
+                    if not ref:
+                        planned_ids.append(page_id)
+                        skipped_no_ref += 1
+                        if config.verbose_logs:
+                            name_part = (
+                                f" council={council_name}" if council_name else ""
+                            )
+                            skipped_logs.append(
+                                f"[SKIP] {name_part.strip()} -> missing reference code"
+                            )
+                        continue
+
+                    pd_entity = page.pd_entity
+                    if not pd_entity:
+                        planned_ids.append(page_id)
+                        skipped_no_pd_entity += 1
+                        if config.verbose_logs:
+                            skipped_logs.append(
+                                f"[SKIP] ref={ref} council={council_name} "
+                                "-> missing PD Entity"
+                            )
+                        continue
+
+                    candidates.append((page, ref, council_name, pd_entity))
+
+                except Exception as e:
+                    planning_failed = True
+                    label = council_name or "unknown council"
+                    errors.append((label, str(e)))
+
+            # Pass 2: resolve the batch's Planning Data counts at once
+            METRICS.enter_phase("fetch")
+            counts = resolve_dataset_counts(
+                config,
+                [c[3] for c in candidates],
+                selected_datasets,
+                count_index,
             )
-            if not ref:
-                skipped_no_ref += 1
-                if config.verbose_logs:
-                    name_part = f" council={council_name}" if council_name else ""
-                    skipped_logs.append(
-                        f"[SKIP] {name_part.strip()} -> missing reference code"
-                    )
-                continue
-
-            pd_entity = read_text_or_title(props, config.notion_pd_entity_prop)
-            if not pd_entity:
-                skipped_no_pd_entity += 1
-                if config.verbose_logs:
-                    skipped_logs.append(
-                        f"[SKIP] ref={ref} council={council_name} -> missing PD Entity"
-                    )
-                continue
 
-            desired: Dict[str, bool] = {}
-            for dataset in selected_datasets:
-                prop_name = config.dataset_to_notion_prop[dataset]
-                url = build_planning_data_url(config, dataset, pd_entity)
-                payload = fetch_json(url, timeout_secs=config.request_timeout_secs)
-                desired[prop_name] = extract_count(payload) > 0
-
-            diffs: Dict[str, bool] = {}
-            if config.only_update_if_changed:
-                for prop_name, new_value in desired.items():
-                    current_value = read_checkbox(props, prop_name)
-                    if current_value != new_value:
-                        diffs[prop_name] = new_value
-
-                if not diffs:
-                    skipped_no_change += 1
+            # Pass 3: diff each council and plan its writes
+            METRICS.enter_phase("plan")
+            ops: List[dict] = []
+            for page, ref, council_name, pd_entity in candidates:
+                page_id = page.id
+                try:
+                    desired: Dict[str, bool] = {}
+                    for dataset in selected_datasets:
+                        prop_name = config.dataset_to_notion_prop[dataset]
+                        count = counts[(pd_entity, dataset)]
+                        if isinstance(count, Exception):
+                            raise count
+                        desired[prop_name] = count > 0
+
+                    diffs: Dict[str, bool] = {}
+                    if config.only_update_if_changed:
+                        # One hash comparison settles a page nobody has edited
+                        # since it was last seen to hold these values
+                        digest = record_hash(desired)
+                        if hashes.unchanged(page_id, digest, page.edited):
+                            settled_by_hash += 1
+                        else:
+                            for prop_name, new_value in desired.items():
+                                current_value = page.checkboxes.get(prop_name)
+                                if current_value != new_value:
+                                    diffs[prop_name] = new_value
+                        hashes.remember(page_id, digest, None if diffs else page.edited)
+
+                        if not diffs:
+                            planned_ids.append(page_id)
+                            skipped_no_change += 1
+                            if config.verbose_logs:
+                                skipped_logs.append(
+                                    f"[SKIP] ref={ref} council={council_name} "
+                                    "-> no changes"
+                                )
+                            continue
+                    else:
+                        diffs = desired
+
+                    planned_ids.append(page_id)
+                    if config.dry_run:
+                        log_page_updates(ref, page_id, diffs)
+                        updated_pages += 1
+                    log_line = None
                     if config.verbose_logs:
-                        skipped_logs.append(
-                            f"[SKIP] ref={ref} council={council_name} -> no changes"
+                        pretty = ", ".join([f"{k} → {v}" for k, v in diffs.items()])
+                        log_line = (
+                            f"[UPDATE] ref={ref} council={council_name}: {pretty}"
                         )
-                    continue
-            else:
-                diffs = desired
-
-            if config.dry_run:
-                log_page_updates(ref, page_id, diffs)
-            else:
-                if config.verbose_logs:
-                    pretty = ", ".join([f"{k} → {v}" for k, v in diffs.items()])
-                    updated_logs.append(
-                        f"[UPDATE] ref={ref} council={council_name}: {pretty}"
+                    ops.append(
+                        {
+                            "key": f"checkbox:{page_id}",
+                            "page_id": page_id,
+                            "props": diffs,
+                            "label": council_name or "unknown council",
+                            "log": log_line,
+                        }
                     )
-                update_page_checkbox_properties(config, page_id, diffs)
 
-            updated_pages += 1
+                    planned_updates += 1
+
+                    if planned_updates % 25 == 0:
+                        print(
+                            "Progress: "
+                            f"updated={planned_updates}, "
+                            f"no_ref={skipped_no_ref}, "
+                            f"no_pd_entity={skipped_no_pd_entity}, "
+                            f"no_change={skipped_no_change}"
+                        )
 
-            if updated_pages % 25 == 0:
-                print(
-                    "Progress: "
-                    f"updated={updated_pages}, "
-                    f"no_ref={skipped_no_ref}, "
-                    f"no_pd_entity={skipped_no_pd_entity}, "
-                    f"no_change={skipped_no_change}"
-                )
+                except Exception as e:
+                    planning_failed = True
+                    label = council_name or "unknown council"
+                    errors.append((label, str(e)))
 
-        except Exception as e:
-            label = council_name or "unknown council"
-            errors.append((label, str(e)))
+            # Log the batch before queueing its writes; pages that failed to
+            # plan are left out so a resumed run plans them again.
+            if config.dry_run:
+                plan_ops.extend(ops)
+            else:
+                journal.record_batch(cursor, planned_ids, ops)
+                for op in ops:
+                    submit_op(writer, journal, config, op)
+            METRICS.end_phase()
+
+        if not planning_failed:
+            journal.mark_listed()
+        print(f"Loaded Notion pages: {loaded_pages}")
+        with METRICS.phase("apply"):
+            updated_pages += writer.drain(errors, updated_logs)
+    # Pages whose write failed were stored without a time, so are re-checked
+    hashes.save()
+
+    # The run got to the end, so nothing is left to resume: writes that failed
+    # are planned afresh by the next run, along with any new changes. Only a
+    # crash leaves the journal behind.
+    journal.complete()
+    if not errors and source is not None:
+        record_run(config, f"fingerprint-{METRICS_JOB}", context, source)
 
     if config.verbose_logs:
         if updated_logs:
@@ -175,13 +569,24 @@ def sync_notion_from_planning_data(config: AppConfig) -> None:
                 print(line)
 
     print("\n[SUMMARY]")
-    print(f"Loaded Notion pages: {len(pages)}")
+    print(f"Loaded Notion pages: {loaded_pages}")
     print("✅ Finished")
     label = "Would update pages" if config.dry_run else "Updated pages"
     print(f"{label}: {updated_pages}")
     print(f"Skipped (missing Reference Code): {skipped_no_ref}")
     print(f"Skipped (missing PD Entity): {skipped_no_pd_entity}")
     print(f"Skipped (no changes needed): {skipped_no_change}")
+    if settled_by_hash:
+        print(f"  of which settled by record hash: {settled_by_hash}")
+    if config.dry_run:
+        print(f"Plan: {summarize_ops(plan_ops)}")
+        if config.plan_file:
+            write_plan(config.plan_file, METRICS_JOB, context, plan_ops)
+            print(f"Plan written to {config.plan_file}")
+    cache_report = cache_stats_report()
+    if cache_report:
+        print(f"HTTP cache: {cache_report}")
+    print(f"Phases: {METRICS.phase_report()}")
     if errors:
         print(f"Errors: {len(errors)}")
         for pid, err in errors:
@@ -196,7 +601,11 @@ def sync_notion_from_planning_data(config: AppConfig) -> None:
 def main() -> None:
     notion_token = os.environ.get("NOTION_TOKEN")
     config = build_config(notion_token=notion_token)
-    sync_notion_from_planning_data(config)
+    try:
+        with profile_run(config.profile, config.profile_dir, METRICS_JOB):
+            sync_notion_from_planning_data(config)
+    finally:
+        write_metrics(config.metrics_dir, METRICS_JOB)
 
 
 if __name__ == "__main__":
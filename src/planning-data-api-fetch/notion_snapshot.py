@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from api_helpers import iter_database_cursor_batches, iter_database_page_batches
+from config import AppConfig
+from state_store import load_state, save_state
+
+SNAPSHOT_VERSION = 1
+BATCH_SIZE = 100
+# Notion gives every database's title property this id
+TITLE_PROPERTY_ID = "title"
+
+
+# ----------------------------
+# Incremental Notion snapshots
+# ----------------------------
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _compact_page(page: dict, keep_props: List[str]) -> dict:
+    props = page.get("properties") or {}
+    return {
+        "id": page.get("id"),
+        "last_edited_time": page.get("last_edited_time") or "",
+        "properties": {k: props[k] for k in keep_props if k in props},
+    }
+
+
+def _is_removed(page: dict) -> bool:
+    return bool(page.get("archived") or page.get("in_trash"))
+
+
+def _choose_mode(
+    config: AppConfig, state: Optional[dict], keep_props: List[str]
+) -> Tuple[str, str]:
+    """
+    Returns (mode, reason) where mode is "incremental" or "full".
+    """
+    if state is None:
+        return "full", "no snapshot yet"
+    if state.get("version") != SNAPSHOT_VERSION:
+        return "full", "snapshot version changed"
+    if state.get("database_id") != config.notion_database_id:
+        return "full", "snapshot is for a different database"
+    if sorted(state.get("keep_props") or []) != sorted(keep_props):
+        return "full", "tracked properties changed"
+    if not state.get("watermark"):
+        return "full", "snapshot has no watermark"
+    if config.full_rescan:
+        return "full", "FULL_RESCAN requested"
+
+    last_full = state.get("last_full_scan_at")
+    max_age = timedelta(days=config.full_rescan_interval_days)
+    now = datetime.now(timezone.utc)
+    if not last_full or now - datetime.fromisoformat(last_full) > max_age:
+        return "full", f"last full scan older than {max_age.days} days"
+
+    return "incremental", f"pages edited since {state['watermark']}"
+
+
+def _sweep_due(config: AppConfig, state: dict) -> Tuple[bool, str]:
+    """
+    Returns (due, reason) for the removal sweep of an incremental read: a
+    title-only listing of every page id, which is the only way to notice
+    pages archived or deleted since the snapshot. It costs as many requests
+    as a full scan, so it only runs every REMOVAL_SWEEP_INTERVAL_DAYS.
+    """
+    last_sweep = state.get("last_sweep_at") or state.get("last_full_scan_at")
+    max_age = timedelta(days=config.removal_sweep_interval_days)
+    if not last_sweep:
+        return True, "no sweep recorded yet"
+    if datetime.now(timezone.utc) - datetime.fromisoformat(last_sweep) >= max_age:
+        return True, f"last sweep older than {max_age.days} days"
+    return False, f"last sweep at {last_sweep}"
+
+
+def _report_drift(
+    previous: Dict[str, dict], current: Dict[str, dict], watermark: str
+) -> None:
+    """
+    Compares the stored snapshot with a fresh full scan. Only differences an
+    incremental query could never have picked up are counted: pages edited
+    before the watermark that are missing or different, and pages that have
+    since disappeared from Notion (deleted or archived).
+    """
+    unseen = 0
+    for page_id, page in current.items():
+        if page["last_edited_time"] >= watermark:
+            continue
+        old = previous.get(page_id)
+        if old is None or old["properties"] != page["properties"]:
+            unseen += 1
+    removed = len(previous.keys() - current.keys())
+    status = "OK" if not unseen and not removed else "DRIFT"
+    print(
+        f"[CONSISTENCY] {status}: snapshot={len(previous)} notion={len(current)} "
+        f"unseen_edits={unseen} removed={removed}"
+    )
+
+
+def iter_snapshot_page_batches(
+    config: AppConfig,
+    name: str,
+    keep_props: List[str],
+    decode: Callable[[dict], Any],
+    filter_payload: Optional[dict] = None,
+    local_filter: Optional[Callable[[Any], bool]] = None,
+) -> Iterator[List[Any]]:
+    """
+    See iter_snapshot_cursor_batches; yields the batches only.
+    """
+    for batch, _ in iter_snapshot_cursor_batches(
+        config, name, keep_props, decode, filter_payload, local_filter
+    ):
+        yield batch
+
+
+def iter_snapshot_cursor_batches(
+    config: AppConfig,
+    name: str,
+    keep_props: List[str],
+    decode: Callable[[dict], Any],
+    filter_payload: Optional[dict] = None,
+    local_filter: Optional[Callable[[Any], bool]] = None,
+    start_cursor: Optional[str] = None,
+) -> Iterator[Tuple[List[Any], Optional[str]]]:
+    """
+    Yields (batch, cursor) for the database's pages, like
+    iter_database_cursor_batches, except that each page is passed through
+    decode (e.g. a council_page_decoder) as it arrives, so the caller never
+    holds on to page JSON.
+
+    With config.incremental off this is a plain streaming scan using
+    filter_payload. With it on, a compact snapshot of every page (only
+    keep_props) is persisted under config.state_dir. The next run queries only
+    pages whose last_edited_time is on or after the stored watermark, merges
+    them into the snapshot and replays the rest. Pages archived or deleted
+    since then drop out of that query rather than showing up as edited, so
+    they are only removed by a full scan or by the removal sweep made every
+    REMOVAL_SWEEP_INTERVAL_DAYS (see _sweep_due). filter_payload is then
+    applied locally via local_filter, so pages that stop matching are not
+    left stale in the snapshot. local_filter is given decoded records.
+
+    The snapshot is saved once the scan completes, so a run that fails before
+    then simply re-reads from the previous watermark.
+
+    Each batch comes with the Notion cursor that resumes the scan after it.
+    Only a plain scan can be resumed that way (start_cursor); with
+    config.incremental on the snapshot needs every page, so the cursor is
+    always None.
+    """
+    if not config.incremental:
+        for batch, cursor in iter_database_cursor_batches(
+            config, filter_payload=filter_payload, start_cursor=start_cursor
+        ):
+            yield [decode(page) for page in batch], cursor
+        return
+
+    state = load_state(config.state_dir, name)
+    mode, reason = _choose_mode(config, state, keep_props)
+    print(f"Notion read mode: {mode} ({reason})")
+
+    pages: Dict[str, dict] = {}
+    last_full_scan_at = state.get("last_full_scan_at") if state else None
+    last_sweep_at = state.get("last_sweep_at") if state else None
+
+    if mode == "full":
+        for batch in iter_database_page_batches(config):
+            records = []
+            for page in batch:
+                if _is_removed(page):
+                    continue
+                compact = _compact_page(page, keep_props)
+                pages[compact["id"]] = compact
+                records.append(decode(compact))
+            yield [r for r in records if local_filter is None or local_filter(r)], None
+        if state is not None and state.get("watermark"):
+            _report_drift(state.get("pages") or {}, pages, state["watermark"])
+        last_full_scan_at = last_sweep_at = _utc_now()
+    else:
+        pages = dict(state.get("pages") or {})
+        edited_filter = {
+            "timestamp": "last_edited_time",
+            "last_edited_time": {"on_or_after": state["watermark"]},
+        }
+        changed = 0
+        for batch in iter_database_page_batches(config, filter_payload=edited_filter):
+            for page in batch:
+                if _is_removed(page):
+                    pages.pop(page["id"], None)
+                    continue
+                pages[page["id"]] = _compact_page(page, keep_props)
+                changed += 1
+        print(f"Notion pages edited since last run: {changed}")
+
+        sweep, sweep_reason = _sweep_due(config, state)
+        print(f"Removal sweep: {'running' if sweep else 'skipped'} ({sweep_reason})")
+        if sweep:
+            # Checks the snapshot against a listing of the live page ids
+            # (title only, so each response stays small)
+            swept_at = _utc_now()
+            live = {
+                page["id"]
+                for batch in iter_database_page_batches(
+                    config, filter_properties=[TITLE_PROPERTY_ID]
+                )
+                for page in batch
+                if not _is_removed(page)
+            }
+            removed = pages.keys() - live
+            for page_id in removed:
+                del pages[page_id]
+            print(f"Notion pages archived or deleted since last sweep: {len(removed)}")
+            last_sweep_at = swept_at
+
+        records = (decode(page) for page in pages.values())
+        matching = [r for r in records if local_filter is None or local_filter(r)]
+        for i in range(0, len(matching), BATCH_SIZE):
+            yield matching[i : i + BATCH_SIZE], None
+
+    watermark = max(
+        (p["last_edited_time"] for p in pages.values() if p["last_edited_time"]),
+        default=state.get("watermark") if state else None,
+    )
+    save_state(
+        config.state_dir,
+        name,
+        {
+            "version": SNAPSHOT_VERSION,
+            "database_id": config.notion_database_id,
+            "keep_props": keep_props,
+            "watermark": watermark,
+            "last_full_scan_at": last_full_scan_at,
+            "last_sweep_at": last_sweep_at,
+            "saved_at": _utc_now(),
+            "pages": pages,
+        },
+    )
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from state_store import load_state, save_state
+
+RECORD_HASHES_VERSION = 1
+
+
+# ----------------------------
+# Per-record content hashes
+# ----------------------------
+
+
+def record_hash(values: Dict[str, Any]) -> str:
+    """
+    Short hash of a page's desired property values, as canonical JSON.
+    """
+    encoded = json.dumps(values, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class RecordHashes:
+    """
+    For each page: the hash of the property values this job last wanted it to
+    have, and the page's last_edited_time when it was seen to hold them.
+    While both still match, the page needs no write and its properties are
+    not compared one by one.
+
+    Pages planned for a write are stored without a time (their new one is
+    not known until Notion reports it), so the next run compares them field
+    by field once and stores the time then. A store saved with a different
+    context is ignored. With no state dir nothing is loaded or saved.
+
+    This only saves the per-field comparison: the source data is still
+    fetched and every page read to know what each page should hold.
+    """
+
+    def __init__(self, state_dir: Optional[str], name: str, context: Dict[str, Any]):
+        self.state_dir = state_dir
+        self.name = name
+        self.context = context
+        self._previous: Dict[str, List[Optional[str]]] = {}
+        self.pages: Dict[str, List[Optional[str]]] = {}
+
+        state = load_state(state_dir, name)
+        if (
+            state is not None
+            and state.get("version") == RECORD_HASHES_VERSION
+            and state.get("context") == context
+        ):
+            self._previous = state.get("pages") or {}
+
+    def unchanged(self, page_id: str, digest: str, edited: Optional[str]) -> bool:
+        entry = self._previous.get(page_id)
+        return (
+            entry is not None
+            and entry[0] == digest
+            and entry[1] is not None
+            and entry[1] == edited
+        )
+
+    def remember(self, page_id: str, digest: str, edited: Optional[str]) -> None:
+        """
+        edited is the page's last_edited_time if it already holds the hashed
+        values, or None if it is about to be written.
+        """
+        self.pages[page_id] = [digest, edited]
+
+    def save(self) -> None:
+        """
+        Stores this run's hashes over the previous ones. Entries for pages this
+        run did not look at (e.g. planned before a resume) are kept: a page
+        edited since will not match its stored time anyway.
+        """
+        if not self.state_dir:
+            return
+        save_state(
+            self.state_dir,
+            self.name,
+            {
+                "version": RECORD_HASHES_VERSION,
+                "context": self.context,
+                "pages": {**self._previous, **self.pages},
+            },
+        )
@@ -1,11 +1,158 @@
 from __future__ import annotations
 
+import json
+import sys
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from config import AppConfig
+from http_cache import HttpCache
+from metrics import METRICS
+from retry_policy import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimitPause,
+    RetryPolicy,
+)
+
+
+# ----------------------------
+# Shared HTTP transport
+# ----------------------------
+
+# One persistent session per scheme://host so connections (and TLS sessions)
+# are reused across every Notion and Planning Data call in a run.
+_sessions: Dict[str, Any] = {}
+_sessions_lock = threading.Lock()
+_pool_maxsize = 10
+_use_http2 = False
+
+# Retry state shared by every thread: a 429 pause and a circuit breaker per
+# scheme://host, so one caller's throttling or outage applies to all of them.
+_retry_policy = RetryPolicy()
+_breaker_failure_threshold = 8
+_breaker_cooldown_secs = 60.0
+_host_guards: Dict[str, Tuple[RateLimitPause, CircuitBreaker]] = {}
+
+
+def configure_transport(config: AppConfig) -> None:
+    """
+    Applies pool size / HTTP/2 / retry settings to the shared transport.
+    Any sessions opened with previous settings are closed.
+    """
+    global _pool_maxsize, _use_http2, _retry_policy
+    global _breaker_failure_threshold, _breaker_cooldown_secs
+    with _sessions_lock:
+        _pool_maxsize = max(1, config.http_pool_maxsize)
+        _use_http2 = config.http2
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _retry_policy = RetryPolicy(
+            max_attempts=max(1, config.retry_max_attempts),
+            base_delay_secs=config.retry_base_delay_secs,
+            max_delay_secs=config.retry_max_delay_secs,
+            deadline_secs=config.request_deadline_secs,
+        )
+        _breaker_failure_threshold = config.breaker_failure_threshold
+        _breaker_cooldown_secs = config.breaker_cooldown_secs
+        _host_guards.clear()
+
+
+def _build_session() -> Any:
+    global _use_http2
+    if _use_http2:
+        try:
+            import h2  # noqa: F401
+            import httpx
+
+            limits = httpx.Limits(
+                max_connections=_pool_maxsize,
+                max_keepalive_connections=_pool_maxsize,
+            )
+            return httpx.Client(http2=True, limits=limits)
+        except ImportError:
+            print(
+                "[WARN] HTTP2 requested but h2 is not installed "
+                "(install httpx[http2]); falling back to HTTP/1.1."
+            )
+            _use_http2 = False
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_host_guards(url: str) -> Tuple[RateLimitPause, CircuitBreaker]:
+    """
+    Returns the shared (429 pause, circuit breaker) for the URL's host.
+    """
+    key = _host_key(url)
+    with _sessions_lock:
+        guards = _host_guards.get(key)
+        if guards is None:
+            guards = _host_guards[key] = (
+                RateLimitPause(),
+                CircuitBreaker(key, _breaker_failure_threshold, _breaker_cooldown_secs),
+            )
+        return guards
+
+
+def get_session(url: str) -> Any:
+    """
+    Returns the shared session for the URL's host, creating it on first use.
+    This is a requests.Session, or an httpx.Client when HTTP/2 is enabled;
+    both expose the same request()/Response surface used below.
+    """
+    key = _host_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _build_session()
+            _sessions[key] = session
+        return session
+
+
+# ----------------------------
+# Response cache
+# ----------------------------
+
+_cache: Optional[HttpCache] = None
+
+
+def configure_cache(config: AppConfig) -> None:
+    """
+    Enables the on-disk fetch_json cache when config.http_cache_dir is set.
+    """
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = (
+        HttpCache(
+            config.http_cache_dir,
+            ttl_secs=config.http_cache_ttl_secs,
+            max_bytes=config.http_cache_max_mb * 1024 * 1024,
+        )
+        if config.http_cache_dir
+        else None
+    )
+
+
+def cache_stats_report() -> Optional[str]:
+    return _cache.stats.report() if _cache is not None else None
 
 
 # ----------------------------
@@ -16,9 +163,34 @@ from config import AppConfig
 def fetch_json(url: str, timeout_secs: int) -> Dict[str, Any]:
     if not url:
         raise ValueError("Missing URL.")
-    resp = request_with_retry("GET", url, timeout_secs=timeout_secs)
-    resp.raise_for_status()
-    return resp.json()
+
+    if _cache is None:
+        resp = request_with_retry("GET", url, timeout_secs=timeout_secs)
+        resp.raise_for_status()
+        return resp.json()
+
+    body = _cache.fetch(
+        url,
+        lambda headers: request_with_retry(
+            "GET", url, timeout_secs=timeout_secs, headers=headers or None
+        ),
+    )
+    return json.loads(body)
+
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(exc, httpx.TransportError)
+
+
+def _retry_after_secs(resp: Any) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to backoff
 
 
 def request_with_retry(
@@ -27,36 +199,94 @@ def request_with_retry(
     timeout_secs: int,
     headers: Optional[Dict[str, str]] = None,
     json_body: Optional[dict] = None,
-    max_attempts: int = 7,
+    idempotent: bool = True,
 ) -> requests.Response:
-    backoff = 1.0
-
-    for _ in range(max_attempts):
-        resp = requests.request(
-            method,
-            url,
-            headers=headers,
-            json=json_body,
-            timeout=timeout_secs,
-        )
-
-        # Notion rate-limits with 429 + Retry-After
-        if resp.status_code == 429:
-            retry_after = resp.headers.get("Retry-After")
-            sleep_s = float(retry_after) if retry_after else backoff
-            time.sleep(sleep_s)
-            backoff = min(backoff * 2, 30)
-            continue
-
-        # transient server-side errors
-        if 500 <= resp.status_code < 600:
-            time.sleep(backoff)
-            backoff = min(backoff * 2, 30)
-            continue
-
-        return resp
+    """
+    Sends a request, retrying 429s, 5xx responses and connection errors per
+    the configured RetryPolicy (see configure_transport):
+
+    - backoff is exponential with full jitter;
+    - a 429 with Retry-After pauses every request to that host, not just this
+      one;
+    - retries stop once the next one would overrun the request's deadline;
+    - while the host's circuit breaker is open, fails fast with
+      CircuitOpenError instead of sending anything.
+
+    Once retries are used up the last error is raised (HTTPError for a
+    response), so a failed request never comes back looking like a result.
+
+    Without idempotent (page creates), only 429s are retried: the host
+    rejects those unapplied, but after a 5xx or a dropped connection the
+    request may have gone through, and resending it would repeat it. Those
+    are raised at once, for the caller to check before trying again.
+    """
+    policy = _retry_policy
+    pause, breaker = get_host_guards(url)
+    session = get_session(url)
+    deadline = time.monotonic() + policy.deadline_secs
 
-    return resp
+    attempt = 0
+    while True:
+        slept = pause.wait()
+        if slept:
+            METRICS.add_sleep("retry_after", slept)
+        try:
+            breaker.before_request()
+        except CircuitOpenError:
+            METRICS.count_circuit_open(method, url)
+            raise
+
+        started = time.perf_counter()
+        try:
+            resp = session.request(
+                method,
+                url,
+                headers=headers,
+                json=json_body,
+                timeout=timeout_secs,
+            )
+        except Exception as e:
+            METRICS.observe_request(method, url, "error", time.perf_counter() - started)
+            breaker.record_failure()
+            if not _is_transient(e):
+                raise
+            failure: Any = e
+            reason = "error"
+        else:
+            METRICS.observe_request(
+                method, url, resp.status_code, time.perf_counter() - started
+            )
+            if 500 <= resp.status_code < 600:
+                breaker.record_failure()
+                failure, reason = resp, "5xx"
+            else:
+                # Any other response, 429 included, means the host is up
+                breaker.record_success()
+                if resp.status_code != 429:
+                    return resp
+                failure, reason = resp, "429"
+
+        if not idempotent and reason != "429":
+            if isinstance(failure, Exception):
+                raise failure
+            failure.raise_for_status()
+
+        attempt += 1
+        retry_after = _retry_after_secs(failure) if reason == "429" else None
+        delay = retry_after if retry_after is not None else policy.backoff(attempt - 1)
+        if attempt >= policy.max_attempts or time.monotonic() + delay > deadline:
+            if isinstance(failure, Exception):
+                raise failure
+            failure.raise_for_status()
+            return failure
+
+        METRICS.count_retry(method, url, reason)
+        if retry_after is not None:
+            # Pause the whole host; this thread waits at the top of the loop
+            pause.pause_for(retry_after)
+        else:
+            METRICS.add_sleep("backoff", delay)
+            time.sleep(delay)
 
 
 # ----------------------------
@@ -74,17 +304,51 @@ def build_notion_headers(config: AppConfig) -> Dict[str, str]:
     }
 
 
-def query_all_database_pages(config: AppConfig, page_size: int = 100) -> List[dict]:
+def iter_database_page_batches(
+    config: AppConfig,
+    page_size: int = 100,
+    filter_payload: Optional[dict] = None,
+    filter_properties: Optional[List[str]] = None,
+) -> Iterator[List[dict]]:
     """
-    Returns ALL page objects in the database via Notion's paginated query endpoint.
+    Yields the database one query response (up to page_size pages) at a time.
+    The next cursor is fetched in a background thread while the caller works
+    on the current batch, so at most two batches are held in memory.
+    filter_properties (property ids) limits the properties each page comes
+    back with.
+    """
+    for batch, _ in iter_database_cursor_batches(
+        config,
+        page_size=page_size,
+        filter_payload=filter_payload,
+        filter_properties=filter_properties,
+    ):
+        yield batch
+
+
+def iter_database_cursor_batches(
+    config: AppConfig,
+    page_size: int = 100,
+    filter_payload: Optional[dict] = None,
+    start_cursor: Optional[str] = None,
+    filter_properties: Optional[List[str]] = None,
+) -> Iterator[Tuple[List[dict], Optional[str]]]:
+    """
+    Like iter_database_page_batches, starting at start_cursor and yielding
+    (batch, cursor) where cursor resumes the query after the batch (None
+    after the last one).
     """
     url = f"{config.notion_base_url}/databases/{config.notion_database_id}/query"
+    if filter_properties:
+        url += "?" + urlencode([("filter_properties", p) for p in filter_properties])
     headers = build_notion_headers(config)
 
-    pages: List[dict] = []
-    payload: Dict[str, Any] = {"page_size": page_size}
-
-    while True:
+    def fetch_batch(cursor: Optional[str]) -> dict:
+        payload: Dict[str, Any] = {"page_size": page_size}
+        if filter_payload:
+            payload["filter"] = filter_payload
+        if cursor:
+            payload["start_cursor"] = cursor
         resp = request_with_retry(
             "POST",
             url,
@@ -93,17 +357,52 @@ def query_all_database_pages(config: AppConfig, page_size: int = 100) -> List[di
             json_body=payload,
         )
         resp.raise_for_status()
-        data = resp.json()
+        return resp.json()
 
-        pages.extend(data.get("results") or [])
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending: Optional[Future] = prefetcher.submit(fetch_batch, start_cursor)
+        while pending is not None:
+            data = pending.result()
+            next_cursor = data.get("next_cursor") if data.get("has_more") else None
+            pending = (
+                prefetcher.submit(fetch_batch, next_cursor)
+                if next_cursor is not None
+                else None
+            )
+            yield data.get("results") or [], next_cursor
 
-        if not data.get("has_more"):
-            break
-        payload["start_cursor"] = data.get("next_cursor")
 
+def query_all_database_pages(config: AppConfig, page_size: int = 100) -> List[dict]:
+    """
+    Returns ALL page objects in the database via Notion's paginated query endpoint.
+    """
+    pages: List[dict] = []
+    for batch in iter_database_page_batches(config, page_size=page_size):
+        pages.extend(batch)
     return pages
 
 
+def query_latest_edited_page(config: AppConfig) -> Optional[dict]:
+    """
+    Returns the most recently edited page in the database (one query sorted
+    by last_edited_time), or None if the database is empty.
+    """
+    url = f"{config.notion_base_url}/databases/{config.notion_database_id}/query"
+    resp = request_with_retry(
+        "POST",
+        url,
+        headers=build_notion_headers(config),
+        timeout_secs=config.request_timeout_secs,
+        json_body={
+            "page_size": 1,
+            "sorts": [{"timestamp": "last_edited_time", "direction": "descending"}],
+        },
+    )
+    resp.raise_for_status()
+    results = resp.json().get("results") or []
+    return results[0] if results else None
+
+
 def update_page_text_property(
     config: AppConfig, page_id: str, prop_name: str, value: str
 ) -> None:
@@ -133,7 +432,10 @@ def create_council_page(
     council_name: str,
     reference_code: str,
     pd_entity: str,
-) -> None:
+) -> dict:
+    """
+    Creates a council page and returns the new page object.
+    """
     url = f"{config.notion_base_url}/pages"
     headers = build_notion_headers(config)
 
@@ -170,8 +472,183 @@ def create_council_page(
             "parent": {"database_id": config.notion_database_id},
             "properties": properties_payload,
         },
+        idempotent=False,
     )
     resp.raise_for_status()
+    return resp.json()
+
+
+def find_council_page(
+    config: AppConfig, title_prop_name: str, reference_code: str
+) -> Optional[dict]:
+    """
+    Returns the council page whose Reference Code equals reference_code, or
+    None. Used before retrying a create that may already have gone through.
+    """
+    ptype = "title" if title_prop_name == config.notion_ref_code_prop else "rich_text"
+    resp = request_with_retry(
+        "POST",
+        f"{config.notion_base_url}/databases/{config.notion_database_id}/query",
+        headers=build_notion_headers(config),
+        timeout_secs=config.request_timeout_secs,
+        json_body={
+            "page_size": 1,
+            "filter": {
+                "property": config.notion_ref_code_prop,
+                ptype: {"equals": reference_code},
+            },
+        },
+    )
+    resp.raise_for_status()
+    results = resp.json().get("results") or []
+    return results[0] if results else None
+
+
+def _create_outcome_unknown(exc: Exception) -> bool:
+    """
+    True if a create failed in a way that leaves open whether Notion made
+    the page: a 5xx or a transient connection error.
+    """
+    response = getattr(exc, "response", None)
+    if response is not None:
+        return response.status_code >= 500
+    return _is_transient(exc)
+
+
+def create_council_page_once(
+    config: AppConfig,
+    title_prop_name: str,
+    council_name: str,
+    reference_code: str,
+    pd_entity: str,
+    check_first: bool = True,
+) -> dict:
+    """
+    create_council_page, unless the page already exists; returns either way.
+    With check_first, looks for the page before the first attempt too (an
+    earlier run may have made it). A create that fails without saying
+    whether it went through is retried with backoff, but only after the
+    lookup finds no page, so a council is never created twice.
+    """
+    policy = _retry_policy
+    attempt = 0
+    while True:
+        if check_first or attempt:
+            existing = find_council_page(config, title_prop_name, reference_code)
+            if existing is not None:
+                return existing
+        try:
+            return create_council_page(
+                config, title_prop_name, council_name, reference_code, pd_entity
+            )
+        except Exception as e:
+            attempt += 1
+            if attempt >= policy.max_attempts or not _create_outcome_unknown(e):
+                raise
+            reason = "error" if _is_transient(e) else "5xx"
+        delay = policy.backoff(attempt - 1)
+        METRICS.count_retry("POST", f"{config.notion_base_url}/pages", reason)
+        METRICS.add_sleep("backoff", delay)
+        time.sleep(delay)
+
+
+# ----------------------------
+# Notion write executor
+# ----------------------------
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second and banks up
+    to `burst` tokens. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = max(rate, 0.01)
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._tokens = min(self._burst, self._tokens + elapsed * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class NotionWriteExecutor:
+    """
+    Queues Notion page mutations and drains them concurrently, paced by a token
+    bucket matched to Notion's per-integration rate limit.
+
+    Use as a context manager; call drain() to wait for everything submitted so
+    far and fold each outcome into the caller's errors / updated_logs lists.
+    """
+
+    def __init__(self, config: AppConfig) -> None:
+        self._bucket = TokenBucket(
+            config.notion_writes_per_second, config.notion_write_burst
+        )
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, config.notion_write_concurrency)
+        )
+        self._pending: List[
+            Tuple[str, Optional[str], Optional[Callable[[Any], None]], Future]
+        ] = []
+
+    def __enter__(self) -> NotionWriteExecutor:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._pool.shutdown(wait=True)
+
+    def submit(
+        self,
+        label: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        log_line: Optional[str] = None,
+        on_success: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        """
+        Queues fn(*args). label identifies the write in errors; log_line is
+        added to updated_logs and on_success(result) is called (from drain)
+        only if the write succeeds.
+        """
+        future = self._pool.submit(self._run, fn, *args)
+        self._pending.append((label, log_line, on_success, future))
+
+    def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._bucket.acquire()
+        return fn(*args)
+
+    def drain(self, errors: List[Tuple[str, str]], updated_logs: List[str]) -> int:
+        """
+        Waits for all queued writes, in submission order.
+        Returns the number that succeeded.
+        """
+        succeeded = 0
+        for label, log_line, on_success, future in self._pending:
+            try:
+                result = future.result()
+                if on_success is not None:
+                    on_success(result)
+            except Exception as e:
+                errors.append((label, str(e)))
+                continue
+            succeeded += 1
+            if log_line:
+                updated_logs.append(log_line)
+        self._pending.clear()
+        return succeeded
 
 
 def read_text_or_title(page_properties: dict, prop_name: str) -> Optional[str]:
@@ -2,6 +2,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 import os
+import sys
+from typing import Optional
+
+RUN_MODES = {"sync", "plan", "apply"}
 
 
 @dataclass(frozen=True)
@@ -9,7 +13,9 @@ class AppConfig:
     # ----------------------------
     # Planning Data API
     # ----------------------------
-    planning_data_url: str
+    planning_data_base_url: str
+    planning_data_dataset: str  # Dataset whose entities are mapped by reference
+    planning_data_page_size: int  # Entities per entity.json page
 
     # ----------------------------
     # Notion
@@ -23,26 +29,76 @@ class AppConfig:
     notion_customer_status_new_value: str
     notion_version: str
     notion_base_url: str
+    notion_writes_per_second: float  # Sustained write rate (Notion allows ~3 req/s)
+    notion_write_burst: int  # Writes allowed back-to-back before pacing kicks in
+    notion_write_concurrency: int  # Writes in flight at once
 
     # ----------------------------
     # Behaviour
     # ----------------------------
     request_timeout_secs: int
+    retry_max_attempts: int  # Attempts per request, including the first
+    retry_base_delay_secs: float  # First backoff ceiling; doubles per retry
+    retry_max_delay_secs: float  # Cap on a single backoff
+    request_deadline_secs: float  # Stop retrying a request after this long
+    breaker_failure_threshold: int  # Consecutive failures that open a circuit
+    breaker_cooldown_secs: float  # How long an open circuit fails fast
+    http_pool_maxsize: int  # Max pooled connections per host
+    http2: bool  # Use HTTP/2 (needs httpx[http2]) instead of pooled HTTP/1.1
+    http_cache_dir: Optional[str]  # If set, cache fetch_json responses on disk
+    http_cache_ttl_secs: int  # Serve cached responses without revalidating
+    http_cache_max_mb: int  # LRU-evict cached responses above this size
+    state_dir: Optional[str]  # Where snapshots and other run state are kept
+    incremental: bool  # Only read Notion pages edited since the last run
+    full_rescan: bool  # Force a full read (and consistency check) this run
+    full_rescan_interval_days: int  # Force a full read at least this often
+    removal_sweep_interval_days: int  # List live page ids this often when incremental
+    skip_unchanged: bool  # Skip the run when source and target fingerprints match
+    metrics_dir: Optional[str]  # Write JSON + Prometheus run metrics here
+    profile: bool  # Profile each phase (PROFILE or --profile), see profiling.py
+    profile_dir: str  # Profiles go to a per-run directory under here
     only_update_if_changed: bool
-    dry_run: bool  # If true, do not perform updates
+    dry_run: bool  # Plan only: nothing is written (MODE=plan or DRY_RUN)
+    mode: str  # "sync" (plan + apply), "plan" or "apply"
+    plan_file: Optional[str]  # Written by MODE=plan, executed by MODE=apply
+    shard_index: int  # With shard_count > 1, apply only this worker's share
+    shard_count: int
     verbose_logs: bool  # If true, log per-page details
 
 
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return int(value.strip())
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return float(value.strip())
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
 def build_config(notion_token: str) -> AppConfig:
     """
     Construct configuration for the app.
     Pass NOTION_TOKEN in from GHA Secrets or env.
     """
-    planning_data_url = (
-        "https://www.planning.data.gov.uk/entity.json?"
-        "dataset=local-authority&field=entity&field=dataset&field=reference&"
-        "field=name&limit=500"
-    )
+    # Hosts can be overridden to point the job at local stand-ins (benchmarks/)
+    planning_data_host = (
+        os.environ.get("PLANNING_DATA_BASE_URL") or "https://www.planning.data.gov.uk"
+    ).rstrip("/")
+    notion_host = (
+        os.environ.get("NOTION_BASE_URL") or "https://api.notion.com"
+    ).rstrip("/")
 
     dry_run_env = os.environ.get("DRY_RUN")
     dry_run = (
@@ -50,9 +106,35 @@ def build_config(notion_token: str) -> AppConfig:
         if dry_run_env is not None
         else False
     )
+    # DRY_RUN is shorthand for MODE=plan: the diff is computed and shown, and
+    # written to PLAN_FILE if set, but never applied.
+    mode = (os.environ.get("MODE") or ("plan" if dry_run else "sync")).strip().lower()
+    if mode not in RUN_MODES:
+        raise ValueError(
+            f"Unknown MODE '{mode}'. Expected one of: {', '.join(sorted(RUN_MODES))}"
+        )
+    plan_file = os.environ.get("PLAN_FILE") or None
+    if mode == "apply" and not plan_file:
+        raise ValueError("MODE=apply requires PLAN_FILE to be set.")
+    shard_index = _env_int("SHARD_INDEX", 0)
+    shard_count = _env_int("SHARD_COUNT", 1)
+    if not 0 <= shard_index < max(shard_count, 1):
+        raise ValueError(
+            f"SHARD_INDEX must be between 0 and SHARD_COUNT - 1 ({shard_count - 1})."
+        )
+
+    state_dir = os.environ.get("SYNC_STATE_DIR") or None
+    incremental = _env_bool("INCREMENTAL")
+    if incremental and not state_dir:
+        raise ValueError("INCREMENTAL requires SYNC_STATE_DIR to be set.")
+    skip_unchanged = _env_bool("SKIP_UNCHANGED")
+    if skip_unchanged and not state_dir:
+        raise ValueError("SKIP_UNCHANGED requires SYNC_STATE_DIR to be set.")
 
     return AppConfig(
-        planning_data_url=planning_data_url,
+        planning_data_base_url=f"{planning_data_host}/entity.json",
+        planning_data_dataset=os.environ.get("PD_DATASET") or "local-authority",
+        planning_data_page_size=_env_int("PD_PAGE_SIZE", 500),
         notion_token=notion_token,
         notion_database_id="27c35d469ad180aaacf4d8beb0ddb20c",
         notion_ref_code_prop="Reference Code",
@@ -61,9 +143,36 @@ def build_config(notion_token: str) -> AppConfig:
         notion_customer_status_prop="Customer Status",
         notion_customer_status_new_value="New",
         notion_version="2022-06-28",
-        notion_base_url="https://api.notion.com/v1",
+        notion_base_url=f"{notion_host}/v1",
+        notion_writes_per_second=_env_float("NOTION_WRITES_PER_SECOND", 3.0),
+        notion_write_burst=_env_int("NOTION_WRITE_BURST", 5),
+        notion_write_concurrency=_env_int("NOTION_WRITE_CONCURRENCY", 4),
         request_timeout_secs=60,
+        retry_max_attempts=_env_int("RETRY_MAX_ATTEMPTS", 7),
+        retry_base_delay_secs=_env_float("RETRY_BASE_DELAY_SECS", 1.0),
+        retry_max_delay_secs=_env_float("RETRY_MAX_DELAY_SECS", 30.0),
+        request_deadline_secs=_env_float("REQUEST_DEADLINE_SECS", 300.0),
+        breaker_failure_threshold=_env_int("BREAKER_FAILURE_THRESHOLD", 8),
+        breaker_cooldown_secs=_env_float("BREAKER_COOLDOWN_SECS", 60.0),
+        http_pool_maxsize=_env_int("HTTP_POOL_MAXSIZE", 10),
+        http2=_env_bool("HTTP2"),
+        http_cache_dir=os.environ.get("HTTP_CACHE_DIR") or None,
+        http_cache_ttl_secs=_env_int("HTTP_CACHE_TTL_SECS", 12 * 60 * 60),
+        http_cache_max_mb=_env_int("HTTP_CACHE_MAX_MB", 256),
+        state_dir=state_dir,
+        incremental=incremental,
+        full_rescan=_env_bool("FULL_RESCAN"),
+        full_rescan_interval_days=_env_int("FULL_RESCAN_INTERVAL_DAYS", 7),
+        removal_sweep_interval_days=_env_int("REMOVAL_SWEEP_INTERVAL_DAYS", 3),
+        skip_unchanged=skip_unchanged,
+        metrics_dir=os.environ.get("METRICS_DIR") or None,
+        profile=_env_bool("PROFILE") or "--profile" in sys.argv[1:],
+        profile_dir=os.environ.get("PROFILE_DIR") or "profiles",
         only_update_if_changed=True,
-        dry_run=dry_run,
+        dry_run=mode == "plan",
+        mode=mode,
+        plan_file=plan_file,
+        shard_index=shard_index,
+        shard_count=shard_count,
         verbose_logs=True,
     )
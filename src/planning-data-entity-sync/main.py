@@ -1,27 +1,65 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Tuple
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urljoin
 
 from dotenv import load_dotenv
 
 from api_helpers import (
-    create_council_page,
+    NotionWriteExecutor,
+    cache_stats_report,
+    configure_cache,
+    configure_transport,
+    create_council_page_once,
     fetch_json,
-    query_all_database_pages,
-    read_text_or_title,
     update_page_text_property,
 )
 from config import AppConfig, build_config
+from journal import Journal
+from metrics import METRICS, write_metrics
+from notion_snapshot import iter_snapshot_cursor_batches
+from page_records import CouncilPage, council_page_decoder
+from plan_file import read_plan, shard_ops, summarize_ops, write_plan
+from profiling import profile_run
+from record_hashes import RecordHashes, record_hash
+from run_fingerprint import check_unchanged, fingerprint, record_run
 
 load_dotenv()
 
+METRICS_JOB = "planning-data-entity-sync"
+
 
 # ----------------------------
 # Planning Data parsing
 # ----------------------------
 
 
+# The columns build_reference_maps reads, in the order it unpacks them
+REFERENCE_FIELDS = ("reference", "entity", "name")
+
+
+def _columnar_rows(payload: Any) -> Optional[Tuple[List[str], List[Any]]]:
+    """
+    Returns (columns, rows) for a Datasette-style {"columns": [...],
+    "rows": [[...], ...]} payload, or None for any other shape.
+    """
+    if not isinstance(payload, dict):
+        return None
+    rows = payload.get("rows")
+    columns = payload.get("columns")
+    if (
+        isinstance(rows, list)
+        and rows
+        and isinstance(rows[0], list)
+        and isinstance(columns, list)
+        and columns
+    ):
+        return columns, rows
+    return None
+
+
 def _rows_to_dicts(payload: Any) -> List[Dict[str, Any]]:
     if isinstance(payload, list):
         return [row for row in payload if isinstance(row, dict)]
@@ -29,26 +67,21 @@ def _rows_to_dicts(payload: Any) -> List[Dict[str, Any]]:
     if not isinstance(payload, dict):
         return []
 
+    columnar = _columnar_rows(payload)
+    if columnar is not None:
+        columns, rows = columnar
+        return [dict(zip(columns, row)) for row in rows if isinstance(row, list)]
+
+    rows = payload.get("rows")
+    if isinstance(rows, list) and rows and isinstance(rows[0], dict):
+        return rows
+
     # Common pattern: a single top-level key holding list[dict]
     for value in payload.values():
         if isinstance(value, list) and value:
             if isinstance(value[0], dict):
                 return value
 
-    rows = payload.get("rows")
-    if isinstance(rows, list) and rows:
-        if isinstance(rows[0], dict):
-            return rows
-
-        columns = payload.get("columns") or []
-        if columns and isinstance(rows[0], list):
-            dict_rows = []
-            for row in rows:
-                if not isinstance(row, list):
-                    continue
-                dict_rows.append({col: row[i] for i, col in enumerate(columns)})
-            return dict_rows
-
     results = payload.get("results")
     if isinstance(results, list):
         return [row for row in results if isinstance(row, dict)]
@@ -56,17 +89,44 @@ def _rows_to_dicts(payload: Any) -> List[Dict[str, Any]]:
     return []
 
 
+def _iter_fields(payload: Any, fields: Tuple[str, ...]) -> Iterator[Tuple[Any, ...]]:
+    """
+    Yields one tuple of the requested fields per row (None where a field is
+    missing). Columnar payloads are read by column index, so no per-row dict
+    is built and the other columns are never touched.
+    """
+    columnar = _columnar_rows(payload)
+    if columnar is None:
+        for row in _rows_to_dicts(payload):
+            yield tuple(row.get(field) for field in fields)
+        return
+
+    columns, rows = columnar
+    index = {col: i for i, col in enumerate(columns)}
+    positions = [index.get(field) for field in fields]
+    if None not in positions and len(positions) > 1:
+        pick = itemgetter(*positions)
+        yield from map(pick, (row for row in rows if isinstance(row, list)))
+        return
+
+    for row in rows:
+        if isinstance(row, list):
+            yield tuple(row[i] if i is not None else None for i in positions)
+
+
 def build_reference_maps(
-    rows: List[Dict[str, Any]],
+    rows: Iterable[Tuple[Any, Any, Any]],
 ) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    rows: (reference, entity, name) tuples, see REFERENCE_FIELDS.
+    """
     entity_by_ref: Dict[str, str] = {}
     name_by_ref: Dict[str, str] = {}
     duplicates: List[Tuple[str, str, str]] = []
 
-    for row in rows:
-        ref = (row.get("reference") or "").strip()
-        entity = row.get("entity")
-        name = (row.get("name") or "").strip()
+    for ref, entity, name in rows:
+        ref = (ref or "").strip()
+        name = (name or "").strip()
         if not ref or entity is None:
             continue
 
@@ -89,6 +149,70 @@ def build_reference_maps(
     return entity_by_ref, name_by_ref
 
 
+# ----------------------------
+# Planning Data fetching
+# ----------------------------
+
+
+def build_entity_page_url(
+    config: AppConfig, dataset: str, fields: Tuple[str, ...], offset: int
+) -> str:
+    params = [
+        ("dataset", dataset),
+        *[("field", field) for field in fields],
+        ("limit", config.planning_data_page_size),
+        ("offset", offset),
+    ]
+    return f"{config.planning_data_base_url}?{urlencode(params)}"
+
+
+def iter_planning_data_rows(
+    config: AppConfig,
+    fields: Tuple[str, ...] = REFERENCE_FIELDS,
+    dataset: Optional[str] = None,
+) -> Iterator[Tuple[Any, ...]]:
+    """
+    Yields a tuple of `fields` for every entity in a dataset (default
+    config.planning_data_dataset), one entity.json page at a time, following
+    links.next and falling back to offset paging. Only the current page is
+    held in memory.
+    """
+    dataset = dataset or config.planning_data_dataset
+    offset = 0
+    pages = 0
+    url: Optional[str] = build_entity_page_url(config, dataset, fields, offset)
+
+    while url:
+        payload = fetch_json(url, timeout_secs=config.request_timeout_secs)
+        rows = list(_iter_fields(payload, fields))
+        pages += 1
+        if not rows:
+            if offset == 0:
+                payload_type = type(payload).__name__
+                payload_keys = list(payload.keys()) if isinstance(payload, dict) else []
+                raise ValueError(
+                    "Planning Data payload missing rows. "
+                    f"type={payload_type} keys={payload_keys}"
+                )
+            break
+
+        yield from rows
+        offset += len(rows)
+
+        links = payload.get("links") if isinstance(payload, dict) else None
+        next_url = (links or {}).get("next")
+        if next_url:
+            next_url = urljoin(url, next_url)
+        elif len(rows) >= config.planning_data_page_size:
+            # Fall back to offset paging if the response has no links block
+            total = payload.get("count") if isinstance(payload, dict) else None
+            if not isinstance(total, int) or offset < total:
+                next_url = build_entity_page_url(config, dataset, fields, offset)
+        url = next_url if next_url != url else None
+
+    print(f"Loaded Planning Data rows: {offset} ({pages} pages of {dataset})")
+
+
 # ----------------------------
 # Dry Run helpers
 # ----------------------------
@@ -109,131 +233,406 @@ def log_new_page(ref: str, council_name: str, pd_entity: str) -> None:
 # ----------------------------
 
 
-def detect_title_prop_name(pages: List[dict], config: AppConfig) -> str:
+def detect_title_prop_name(pages: List[CouncilPage]) -> Optional[str]:
+    """
+    Returns whichever of Council Name / Reference Code is the title property,
+    or None if none of the given pages reveal it.
+    """
     for page in pages:
-        props = page.get("properties") or {}
-        council_prop = props.get(config.notion_council_name_prop) or {}
-        if council_prop.get("type") == "title":
-            return config.notion_council_name_prop
-        ref_prop = props.get(config.notion_ref_code_prop) or {}
-        if ref_prop.get("type") == "title":
-            return config.notion_ref_code_prop
-    return config.notion_council_name_prop
-
-
-def sync_notion_from_planning_data(config: AppConfig) -> None:
-    payload = fetch_json(
-        config.planning_data_url, timeout_secs=config.request_timeout_secs
-    )
-    rows = _rows_to_dicts(payload)
-    if not rows:
-        payload_type = type(payload).__name__
-        payload_keys = list(payload.keys()) if isinstance(payload, dict) else []
-        raise ValueError(
-            "Planning Data payload missing rows. "
-            f"type={payload_type} keys={payload_keys}"
+        if page.title_prop:
+            return page.title_prop
+    return None
+
+
+def set_pd_entity(page: Optional[CouncilPage], value: str) -> None:
+    """
+    Mirrors a successful PD Entity write into an in-memory page record, so a
+    shared councils snapshot stays current for jobs that run afterwards.
+    """
+    if page is not None:
+        page.pd_entity = value
+
+
+def submit_op(
+    writer: NotionWriteExecutor,
+    journal: Journal,
+    config: AppConfig,
+    op: dict,
+    on_created: Optional[Callable[[dict], None]] = None,
+    pages_by_id: Optional[Dict[str, CouncilPage]] = None,
+    check_existing: bool = False,
+) -> None:
+    """
+    Queues a planned write: a PD Entity update ("pd_entity:<page id>") or a
+    new council page ("create:<ref>"). With check_existing, a create first
+    looks for the page in case an earlier attempt already made it (see
+    create_council_page_once). on_created is given each created page object.
+    """
+    if op["key"].startswith("create:"):
+        writer.submit(
+            op["ref"],
+            journal.tracked(op["key"], create_council_page_once),
+            config,
+            op["title_prop"],
+            op["council_name"],
+            op["ref"],
+            op["pd_entity"],
+            check_existing,
+            on_success=on_created,
         )
+        return
+
+    page = (pages_by_id or {}).get(op["page_id"])
+    writer.submit(
+        op["label"],
+        journal.tracked(op["key"], update_page_text_property),
+        config,
+        op["page_id"],
+        config.notion_pd_entity_prop,
+        op["value"],
+        log_line=op["log"],
+        on_success=lambda _, page=page, value=op["value"]: set_pd_entity(page, value),
+    )
+
+
+def apply_plan(config: AppConfig, context: Dict[str, Any]) -> None:
+    """
+    MODE=apply: executes this shard's share of a plan written by MODE=plan,
+    without reading Notion or Planning Data. Progress is journaled as in a
+    normal run, so an interrupted apply finishes when it is re-run. Creates
+    always check for an existing page first, so re-applying a plan is safe.
+    """
+    plan = read_plan(config.plan_file, METRICS_JOB, context)
+    ops = shard_ops(plan["ops"], config.shard_index, config.shard_count)
+    journal = Journal(
+        config.state_dir,
+        f"journal-{METRICS_JOB}-apply-{config.shard_index}of{config.shard_count}",
+        context={**context, "plan_created_at": plan["created_at"]},
+    )
+    if journal.resumed:
+        ops = journal.pending_ops()
+        print(f"Resuming interrupted apply: {len(ops)} writes left")
+    else:
+        journal.record_ops(ops)
+    print(
+        f"Applying plan from {plan['created_at']} "
+        f"(shard {config.shard_index + 1}/{config.shard_count}): "
+        f"{summarize_ops(ops)}"
+    )
+
+    errors: List[Tuple[str, str]] = []
+    updated_logs: List[str] = []
+    with NotionWriteExecutor(config) as writer, METRICS.phase("apply"):
+        for op in ops:
+            submit_op(writer, journal, config, op, check_existing=True)
+        written = writer.drain(errors, updated_logs)
+    if not errors:
+        journal.complete()
+
+    if config.verbose_logs and updated_logs:
+        print("\n[UPDATED PAGES]")
+        for line in updated_logs:
+            print(line)
+    print("\n[SUMMARY]")
+    print("✅ Finished")
+    print(f"Written pages: {written}")
+    print(f"Phases: {METRICS.phase_report()}")
+    if errors:
+        print(f"Errors: {len(errors)} (first 15)")
+        for pid, err in errors[:15]:
+            print(f"- {pid}: {err}")
 
-    ref_to_entity, ref_to_name = build_reference_maps(rows)
-    print(f"Loaded Planning Data rows: {len(rows)}")
-    print(f"Reference codes mapped: {len(ref_to_entity)}")
 
-    pages = query_all_database_pages(config)
-    print(f"Loaded Notion pages: {len(pages)}")
-    title_prop_name = detect_title_prop_name(pages, config)
+def sync_notion_from_planning_data(
+    config: AppConfig,
+    pages: Optional[List[CouncilPage]] = None,
+    checkbox_props: Iterable[str] = (),
+) -> None:
+    """
+    pages: an already loaded councils snapshot (see src/sync-all). When given,
+    it is used instead of querying Notion, and successful writes are applied
+    to it in place: updated PD Entity values are patched onto the page
+    records and newly created pages are decoded and appended.
+
+    checkbox_props: the checkbox properties the snapshot's records carry.
+    Created pages are decoded with them too, so a job reading the snapshot
+    after this one sees their actual values rather than none at all.
+    """
+    configure_transport(config)
+    configure_cache(config)
+    # Plans and journals only carry over between runs configured alike
+    context = {
+        "database_id": config.notion_database_id,
+        "dataset": config.planning_data_dataset,
+        "only_update_if_changed": config.only_update_if_changed,
+    }
+    if config.mode == "apply":
+        apply_plan(config, context)
+        return
+
+    # Rows are mapped as each page arrives, so fetch includes indexing
+    with METRICS.phase("fetch"):
+        ref_to_entity, ref_to_name = build_reference_maps(
+            iter_planning_data_rows(config)
+        )
+    print(f"Reference codes mapped: {len(ref_to_entity)}")
+    skip_unchanged = config.skip_unchanged and config.mode == "sync"
+    source = fingerprint([ref_to_entity, ref_to_name]) if skip_unchanged else None
 
+    loaded_pages = 0
+    title_prop_name: Optional[str] = None
     updated_pages = 0
     created_pages = 0
     skipped_no_ref = 0
     skipped_no_match = 0
     skipped_no_change = 0
+    settled_by_hash = 0
     errors: List[Tuple[str, str]] = []
     updated_logs: List[str] = []
     skipped_logs: List[str] = []
     existing_refs: set[str] = set()
 
-    for page in pages:
-        try:
-            page_id = page.get("id")
-            props = page.get("properties") or {}
-
-            ref = read_text_or_title(props, config.notion_ref_code_prop)
-            council_name = (
-                read_text_or_title(props, config.notion_council_name_prop) or ""
+    planned_updates = 0
+    plan_ops: List[dict] = []
+    # Plan-only runs write nothing, so they have nothing to resume either
+    journal = Journal(
+        None if config.dry_run else config.state_dir,
+        "journal-planning-data-entity-sync",
+        context=context,
+    )
+    hashes = RecordHashes(
+        None if config.dry_run else config.state_dir,
+        f"record-hashes-{METRICS_JOB}",
+        context,
+    )
+    if source is not None and not journal.resumed:
+        with METRICS.phase("fingerprint"):
+            unchanged, reason = check_unchanged(
+                config, f"fingerprint-{METRICS_JOB}", context, source
             )
-            if not ref:
-                skipped_no_ref += 1
-                if config.verbose_logs:
-                    name_part = f" council={council_name}" if council_name else ""
-                    skipped_logs.append(
-                        f"[SKIP] {name_part.strip()} -> missing reference code"
-                    )
-                continue
-            existing_refs.add(ref)
-
-            desired_entity = ref_to_entity.get(ref)
-            if not desired_entity:
-                skipped_no_match += 1
-                if config.verbose_logs:
-                    skipped_logs.append(
-                        f"[SKIP] ref={ref} council={council_name} -> no PD entity match"
-                    )
-                continue
+        print(f"Fingerprints: {reason}")
+        if unchanged:
+            journal.complete()
+            print("\n[SUMMARY]")
+            print("✅ Finished (nothing changed; Notion was not scanned)")
+            print(f"Phases: {METRICS.phase_report()}")
+            return
+    decode_page = council_page_decoder(config, checkbox_props)
+    pages_by_id = {page.id: page for page in pages or []}
+    on_created = (
+        (lambda page: pages.append(decode_page(page))) if pages is not None else None
+    )
+
+    with NotionWriteExecutor(config) as writer:
 
-            current_entity = read_text_or_title(props, config.notion_pd_entity_prop)
+        def submit_update(op: dict) -> None:
+            submit_op(writer, journal, config, op, pages_by_id=pages_by_id)
 
-            if config.only_update_if_changed and current_entity == desired_entity:
-                skipped_no_change += 1
-                if config.verbose_logs:
-                    skipped_logs.append(
-                        f"[SKIP] ref={ref} council={council_name} -> no changes needed"
+        if journal.resumed:
+            existing_refs.update(journal.extras.get("refs") or [])
+            title_props = journal.extras.get("title_prop") or []
+            title_prop_name = title_props[0] if title_props else None
+            resumed_updates = [op for op in journal.pending_ops() if "value" in op]
+            print(
+                f"Resuming interrupted run: {len(journal.seen_pages)} pages "
+                f"already planned, {len(journal.pending_ops())} writes left"
+            )
+            for op in resumed_updates:
+                submit_update(op)
+            planned_updates += len(resumed_updates)
+
+        # Pages stream in one query response at a time; the next response is
+        # fetched while the current batch is being diffed. The journal records
+        # each planned batch with the cursor after it, so a resumed run carries
+        # on from there.
+        keep_props = [
+            config.notion_ref_code_prop,
+            config.notion_council_name_prop,
+            config.notion_pd_entity_prop,
+        ]
+        if journal.listed:
+            page_batches = []
+        elif pages is not None:
+            page_batches = [(list(pages), None)]
+        else:
+            page_batches = iter_snapshot_cursor_batches(
+                config,
+                "councils-planning-data-entity-sync",
+                keep_props,
+                decode_page,
+                start_cursor=journal.cursor,
+            )
+        planning_failed = False
+        for batch, cursor in METRICS.timed_iter("fetch", page_batches):
+            METRICS.enter_phase("plan")
+            loaded_pages += len(batch)
+            if title_prop_name is None:
+                title_prop_name = detect_title_prop_name(batch)
+
+            planned_ids: List[str] = []
+            batch_refs: List[str] = []
+            ops: List[dict] = []
+            for page in batch:
+                try:
+                    page_id = page.id
+                    if page_id in journal.seen_pages:
+                        continue
+
+                    ref = page.ref
+                    council_name = page.council_name or ""
+                    if not ref:
+                        planned_ids.append(page_id)
+                        skipped_no_ref += 1
+                        if config.verbose_logs:
+                            name_part = (
+                                f" council={council_name}" if council_name else ""
+                            )
+                            skipped_logs.append(
+                                f"[SKIP] {name_part.strip()} -> missing reference code"
+                            )
+                        continue
+                    existing_refs.add(ref)
+                    batch_refs.append(ref)
+
+                    desired_entity = ref_to_entity.get(ref)
+                    if not desired_entity:
+                        planned_ids.append(page_id)
+                        skipped_no_match += 1
+                        if config.verbose_logs:
+                            skipped_logs.append(
+                                f"[SKIP] ref={ref} council={council_name} "
+                                "-> no PD entity match"
+                            )
+                        continue
+
+                    current_entity = page.pd_entity
+
+                    unchanged = False
+                    if config.only_update_if_changed:
+                        # One hash comparison settles a page nobody has edited
+                        # since it was last seen to hold this value
+                        digest = record_hash(
+                            {config.notion_pd_entity_prop: desired_entity}
+                        )
+                        if hashes.unchanged(page_id, digest, page.edited):
+                            settled_by_hash += 1
+                            unchanged = True
+                        else:
+                            unchanged = current_entity == desired_entity
+                        hashes.remember(
+                            page_id, digest, page.edited if unchanged else None
+                        )
+
+                    if unchanged:
+                        planned_ids.append(page_id)
+                        skipped_no_change += 1
+                        if config.verbose_logs:
+                            skipped_logs.append(
+                                f"[SKIP] ref={ref} council={council_name} "
+                                "-> no changes needed"
+                            )
+                        continue
+
+                    planned_ids.append(page_id)
+                    if config.dry_run:
+                        log_page_updates(ref, page_id, desired_entity)
+                        updated_pages += 1
+                    log_line = None
+                    if config.verbose_logs:
+                        from_value = current_entity or "empty"
+                        log_line = (
+                            f"[UPDATE] ref={ref} council={council_name} -> "
+                            f"PD Entity {from_value} -> {desired_entity}"
+                        )
+                    ops.append(
+                        {
+                            "key": f"pd_entity:{page_id}",
+                            "page_id": page_id,
+                            "value": desired_entity,
+                            "label": page_id or "unknown",
+                            "log": log_line,
+                        }
                     )
-                continue
 
+                    planned_updates += 1
+
+                    if planned_updates % 25 == 0:
+                        print(
+                            "Progress: "
+                            f"updated={planned_updates}, "
+                            f"no_ref={skipped_no_ref}, "
+                            f"no_match={skipped_no_match}, "
+                            f"no_change={skipped_no_change}"
+                        )
+
+                except Exception as e:
+                    planning_failed = True
+                    errors.append((page.id or "unknown", str(e)))
+
+            # Log the batch before queueing its writes; pages that failed to plan
+            # are left out so a resumed run plans them again.
+            extras: Dict[str, List[str]] = {"refs": batch_refs}
+            if title_prop_name and not journal.extras.get("title_prop"):
+                extras["title_prop"] = journal.extras["title_prop"] = [title_prop_name]
             if config.dry_run:
-                log_page_updates(ref, page_id, desired_entity)
+                plan_ops.extend(ops)
             else:
-                if config.verbose_logs:
-                    from_value = current_entity or "empty"
-                    log_line = (
-                        f"[UPDATE] ref={ref} council={council_name} -> "
-                        f"PD Entity {from_value} -> {desired_entity}"
-                    )
-                    updated_logs.append(log_line)
-                update_page_text_property(
-                    config, page_id, config.notion_pd_entity_prop, desired_entity
-                )
-
-            updated_pages += 1
-
-            if updated_pages % 25 == 0:
-                print(
-                    "Progress: "
-                    f"updated={updated_pages}, "
-                    f"no_ref={skipped_no_ref}, "
-                    f"no_match={skipped_no_match}, "
-                    f"no_change={skipped_no_change}"
-                )
-
-        except Exception as e:
-            errors.append((page.get("id", "unknown"), str(e)))
+                journal.record_batch(cursor, planned_ids, ops, extras=extras)
+                for op in ops:
+                    submit_update(op)
+            METRICS.end_phase()
+
+        if not planning_failed:
+            journal.mark_listed()
+        print(f"Loaded Notion pages: {loaded_pages}")
+        title_prop_name = title_prop_name or config.notion_council_name_prop
+
+        # Creates the interrupted run planned but may or may not have applied are
+        # checked against Notion first, so a resumed run never duplicates a page.
+        resumed_creates = [op for op in journal.pending_ops() if "ref" in op]
+        missing_refs = [
+            ref
+            for ref in ref_to_entity.keys()
+            if ref not in existing_refs and not journal.has_op(f"create:{ref}")
+        ]
+        create_ops = [
+            {
+                "key": f"create:{ref}",
+                "ref": ref,
+                "council_name": ref_to_name.get(ref, ""),
+                "pd_entity": ref_to_entity[ref],
+                "title_prop": title_prop_name,
+            }
+            for ref in missing_refs
+        ]
+        if missing_refs:
+            print(f"Missing in Notion: {len(missing_refs)} (creating new pages)")
+        with METRICS.phase("apply"):
+            updated_pages += writer.drain(errors, updated_logs)
 
-    missing_refs = [ref for ref in ref_to_entity.keys() if ref not in existing_refs]
-    if missing_refs:
-        print(f"Missing in Notion: {len(missing_refs)} (creating new pages)")
-    for ref in missing_refs:
-        try:
-            council_name = ref_to_name.get(ref, "")
-            pd_entity = ref_to_entity[ref]
             if config.dry_run:
-                log_new_page(ref, council_name, pd_entity)
+                for op in create_ops:
+                    log_new_page(op["ref"], op["council_name"], op["pd_entity"])
+                    created_pages += 1
+                plan_ops.extend(create_ops)
             else:
-                create_council_page(
-                    config, title_prop_name, council_name, ref, pd_entity
-                )
-            created_pages += 1
-        except Exception as e:
-            errors.append((ref, str(e)))
+                journal.record_ops(create_ops)
+                for op in resumed_creates:
+                    submit_op(
+                        writer, journal, config, op, on_created, check_existing=True
+                    )
+                for op in create_ops:
+                    submit_op(writer, journal, config, op, on_created)
+            created_pages += writer.drain(errors, updated_logs)
+    # Pages whose write failed were stored without a time, so are re-checked
+    hashes.save()
+
+    # The run got to the end, so nothing is left to resume: writes that failed
+    # are planned afresh by the next run, along with any new changes. Only a
+    # crash leaves the journal behind.
+    journal.complete()
+    if not errors and source is not None:
+        record_run(config, f"fingerprint-{METRICS_JOB}", context, source)
 
     if config.verbose_logs:
         if updated_logs:
@@ -246,7 +645,7 @@ def sync_notion_from_planning_data(config: AppConfig) -> None:
                 print(line)
 
     print("\n[SUMMARY]")
-    print(f"Loaded Notion pages: {len(pages)}")
+    print(f"Loaded Notion pages: {loaded_pages}")
     print("✅ Finished")
     label = "Would update pages" if config.dry_run else "Updated pages"
     print(f"{label}: {updated_pages}")
@@ -255,6 +654,17 @@ def sync_notion_from_planning_data(config: AppConfig) -> None:
     print(f"Skipped (missing Reference Code): {skipped_no_ref}")
     print(f"Skipped (no PD entity match): {skipped_no_match}")
     print(f"Skipped (no changes needed): {skipped_no_change}")
+    if settled_by_hash:
+        print(f"  of which settled by record hash: {settled_by_hash}")
+    if config.dry_run:
+        print(f"Plan: {summarize_ops(plan_ops)}")
+        if config.plan_file:
+            write_plan(config.plan_file, METRICS_JOB, context, plan_ops)
+            print(f"Plan written to {config.plan_file}")
+    cache_report = cache_stats_report()
+    if cache_report:
+        print(f"HTTP cache: {cache_report}")
+    print(f"Phases: {METRICS.phase_report()}")
     if errors:
         print(f"Errors: {len(errors)} (first 15)")
         for pid, err in errors[:15]:
@@ -269,7 +679,11 @@ def sync_notion_from_planning_data(config: AppConfig) -> None:
 def main() -> None:
     notion_token = os.environ.get("NOTION_TOKEN")
     config = build_config(notion_token=notion_token)
-    sync_notion_from_planning_data(config)
+    try:
+        with profile_run(config.profile, config.profile_dir, METRICS_JOB):
+            sync_notion_from_planning_data(config)
+    finally:
+        write_metrics(config.metrics_dir, METRICS_JOB)
 
 
 if __name__ == "__main__":
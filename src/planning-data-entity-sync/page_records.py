@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional
+
+from api_helpers import read_text_or_title
+from config import AppConfig
+
+
+# ----------------------------
+# Council page records
+# ----------------------------
+
+
+@dataclass(slots=True)
+class CouncilPage:
+    """
+    The properties the jobs read from a Councils DB page, decoded once as the
+    page is loaded. Holding these instead of the page JSON keeps a councils
+    snapshot small however many properties the database has.
+    """
+
+    id: str
+    edited: Optional[str] = None  # The page's last_edited_time
+    ref: Optional[str] = None
+    council_name: Optional[str] = None
+    pd_entity: Optional[str] = None
+    # Whichever of Council Name / Reference Code is the title property, if
+    # this page reveals it
+    title_prop: Optional[str] = None
+    # { property name: value } for the requested checkbox properties
+    checkboxes: Dict[str, Optional[bool]] = field(default_factory=dict)
+
+
+def read_checkbox(page_properties: dict, prop_name: str) -> Optional[bool]:
+    prop = page_properties.get(prop_name)
+    if not prop or prop.get("type") != "checkbox":
+        return None
+    return prop.get("checkbox")
+
+
+def council_page_decoder(
+    config: AppConfig, checkbox_props: Iterable[str] = ()
+) -> Callable[[dict], CouncilPage]:
+    """
+    Returns a function turning a Notion page object into a CouncilPage.
+    config supplies the Reference Code / Council Name / PD Entity property
+    names; checkbox_props are the checkbox properties to keep as well.
+    """
+    ref_prop = config.notion_ref_code_prop
+    name_prop = config.notion_council_name_prop
+    pd_entity_prop = config.notion_pd_entity_prop
+    checkbox_props = tuple(checkbox_props)
+
+    def decode(page: dict) -> CouncilPage:
+        props = page.get("properties") or {}
+        title_prop = None
+        for prop_name in (name_prop, ref_prop):
+            if (props.get(prop_name) or {}).get("type") == "title":
+                title_prop = prop_name
+                break
+        return CouncilPage(
+            id=page.get("id"),
+            edited=page.get("last_edited_time"),
+            ref=read_text_or_title(props, ref_prop),
+            council_name=read_text_or_title(props, name_prop),
+            pd_entity=read_text_or_title(props, pd_entity_prop),
+            title_prop=title_prop,
+            checkboxes={name: read_checkbox(props, name) for name in checkbox_props},
+        )
+
+    return decode
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+# ----------------------------
+# Retry policy
+# ----------------------------
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How request_with_retry retries 429s, 5xx responses and connection errors.
+    """
+
+    max_attempts: int = 7  # Attempts per request, including the first
+    base_delay_secs: float = 1.0  # Backoff ceiling for the first retry
+    max_delay_secs: float = 30.0  # Cap on any single backoff
+    deadline_secs: float = 300.0  # Stop retrying a request after this long
+
+    def backoff(self, attempt: int) -> float:
+        """
+        "Full jitter" exponential backoff: a random delay up to
+        base * 2^attempt (capped), so concurrent callers that failed together
+        do not all retry together.
+        """
+        ceiling = min(self.max_delay_secs, self.base_delay_secs * (2**attempt))
+        return random.uniform(0, ceiling)
+
+
+# ----------------------------
+# Shared 429 pause
+# ----------------------------
+
+
+class RateLimitPause:
+    """
+    A pause shared by every thread talking to one host. When any request gets
+    a 429 with Retry-After, pause_for() holds back all requests to that host,
+    not just the one that was throttled. Waiters are released with a little
+    jitter so they do not all fire at the same instant.
+    """
+
+    def __init__(self, spread_secs: float = 1.0) -> None:
+        self._spread_secs = spread_secs
+        self._until = 0.0
+        self._lock = threading.Lock()
+
+    def pause_for(self, secs: float) -> None:
+        with self._lock:
+            self._until = max(self._until, time.monotonic() + secs)
+
+    def wait(self) -> float:
+        """
+        Blocks until the pause (if any) is over. Returns the seconds slept.
+        """
+        slept = 0.0
+        while True:
+            with self._lock:
+                remaining = self._until - time.monotonic()
+            if remaining <= 0:
+                break
+            delay = remaining + random.uniform(0, self._spread_secs)
+            time.sleep(delay)
+            slept += delay
+        return slept
+
+
+# ----------------------------
+# Circuit breaker
+# ----------------------------
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of sending a request while a host's circuit is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker. After failure_threshold consecutive failures
+    (5xx or no response, across all threads) the circuit opens and requests
+    fail fast with CircuitOpenError for cooldown_secs. Then a single trial
+    request is let through: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, host: str, failure_threshold: int, cooldown_secs: float):
+        self.host = host
+        self._threshold = max(1, failure_threshold)
+        self._cooldown_secs = cooldown_secs
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self._cooldown_secs and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(
+                f"Circuit open for {self.host} after {self._failures} consecutive "
+                f"failures; failing fast for {self._cooldown_secs:.0f}s"
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"[INFO] Circuit closed for {self.host}")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or (
+                self._opened_at is None and self._failures >= self._threshold
+            ):
+                if self._opened_at is None:
+                    print(
+                        f"[WARN] Circuit open for {self.host} after "
+                        f"{self._failures} consecutive failures"
+                    )
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from api_helpers import query_latest_edited_page
+from config import AppConfig
+from state_store import load_state, save_state
+
+FINGERPRINT_VERSION = 1
+# Notion keeps last_edited_time to the minute, so an edit made in the same
+# minute as the newest recorded one would not show up. A target fingerprint
+# is only trusted once that newest edit is at least this old.
+SETTLE_SECS = 120
+
+
+# ----------------------------
+# Run fingerprints
+# ----------------------------
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def fingerprint(data: Any) -> str:
+    """
+    sha256 of data as canonical JSON (sorted keys, no whitespace), so equal
+    data hashes the same however it was built.
+    """
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def target_fingerprint(config: AppConfig) -> Optional[str]:
+    """
+    Fingerprint of the Notion database as it stands, from a single query: the
+    id and last_edited_time of its most recently edited page. Any later edit,
+    by a job or by hand, puts a newer page on top and changes it. Deleting or
+    archiving an older page does not, which is why a skip is only trusted
+    until the next full run is due.
+
+    Returns None if the newest edit is under SETTLE_SECS old.
+    """
+    page = query_latest_edited_page(config)
+    if page is None:
+        return fingerprint(None)
+    edited = page.get("last_edited_time") or ""
+    if not edited:
+        return None
+    edited_at = datetime.fromisoformat(edited.replace("Z", "+00:00"))
+    if _utc_now() - edited_at < timedelta(seconds=SETTLE_SECS):
+        return None
+    return fingerprint([page.get("id"), edited])
+
+
+def check_unchanged(
+    config: AppConfig, name: str, context: Dict[str, Any], source: str
+) -> Tuple[bool, str]:
+    """
+    Returns (unchanged, reason). unchanged is True only if the last recorded
+    run had the same context and source fingerprint, Notion has not been
+    edited since, and no full run is due (FULL_RESCAN or
+    FULL_RESCAN_INTERVAL_DAYS). Notion is only queried if everything else
+    matches.
+    """
+    state = load_state(config.state_dir, name)
+    if state is None:
+        return False, "no fingerprints recorded yet"
+    if state.get("version") != FINGERPRINT_VERSION:
+        return False, "fingerprint version changed"
+    if state.get("context") != context:
+        return False, "configuration changed"
+    if config.full_rescan:
+        return False, "FULL_RESCAN requested"
+
+    recorded_at = state.get("recorded_at")
+    max_age = timedelta(days=config.full_rescan_interval_days)
+    if not recorded_at or _utc_now() - datetime.fromisoformat(recorded_at) > max_age:
+        return False, f"last full run older than {max_age.days} days"
+    if state.get("source") != source:
+        return False, "source data changed"
+    if not state.get("target"):
+        return False, "Notion was still settling after the last run"
+    if state["target"] != target_fingerprint(config):
+        return False, "Notion edited since the last run"
+
+    return True, f"source data and Notion unchanged since {recorded_at}"
+
+
+def record_run(
+    config: AppConfig, name: str, context: Dict[str, Any], source: str
+) -> None:
+    """
+    Records the fingerprints of a run that completed without errors: the
+    source data it synced from and the Notion database as it left it.
+    """
+    try:
+        target = target_fingerprint(config)
+    except Exception as e:
+        print(f"[WARN] Could not fingerprint Notion: {e}")
+        target = None
+    save_state(
+        config.state_dir,
+        name,
+        {
+            "version": FINGERPRINT_VERSION,
+            "context": context,
+            "source": source,
+            "target": target,
+            "recorded_at": _utc_now().isoformat(),
+        },
+    )
+    if target is None:
+        print("[INFO] Notion was edited moments ago; the next run will not skip")
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+# Run order: entity-sync writes PD Entity, which api-fetch reads.
+ENTITY_SYNC_DIR = "planning-data-entity-sync"
+API_FETCH_DIR = "planning-data-api-fetch"
+SERVICES_DETAILED_DIR = "sync-planx-services-detailed"
+
+
+# ----------------------------
+# Job loading
+# ----------------------------
+
+
+def load_job(dirname: str) -> ModuleType:
+    """
+    Imports <dirname>/main.py as a standalone module.
+
+    Every job folder uses the same local module names (config, api_helpers,
+    ...), so those are cleared from sys.modules before and after the import.
+    The loaded main module keeps references to its own copies.
+    """
+    job_dir = SRC_DIR / dirname
+    local_names = {path.stem for path in job_dir.glob("*.py")}
+    saved = {name: sys.modules.pop(name) for name in local_names if name in sys.modules}
+
+    sys.path.insert(0, str(job_dir))
+    try:
+        spec = importlib.util.spec_from_file_location(
+            f"{dirname.replace('-', '_')}_main", job_dir / "main.py"
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(job_dir))
+        for name in local_names:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+    return module
+
+
+# ----------------------------
+# Shared councils snapshot
+# ----------------------------
+
+
+def load_councils(entity_job: ModuleType, entity_config, fetch_config) -> List:
+    """
+    Reads the Councils DB once for all jobs, decoding each page into a compact
+    record (see page_records.py) holding every property any of them uses.
+    Honours INCREMENTAL / FULL_RESCAN like the individual jobs.
+    """
+    keep_props = list(
+        dict.fromkeys(
+            [
+                entity_config.notion_ref_code_prop,
+                entity_config.notion_council_name_prop,
+                entity_config.notion_pd_entity_prop,
+                *fetch_config.dataset_to_notion_prop.values(),
+            ]
+        )
+    )
+    decode = entity_job.council_page_decoder(
+        entity_config, fetch_config.dataset_to_notion_prop.values()
+    )
+    pages: List = []
+    for batch, _ in entity_job.iter_snapshot_cursor_batches(
+        entity_config, "councils-sync-all", keep_props, decode
+    ):
+        pages.extend(batch)
+    return pages
+
+
+# ----------------------------
+# Entry point
+# ----------------------------
+
+
+def main() -> None:
+    notion_token = os.environ.get("NOTION_TOKEN")
+
+    entity_job = load_job(ENTITY_SYNC_DIR)
+    fetch_job = load_job(API_FETCH_DIR)
+    services_job = load_job(SERVICES_DETAILED_DIR)
+
+    entity_config = entity_job.build_config(notion_token=notion_token)
+    fetch_config = fetch_job.build_config(notion_token=notion_token)
+
+    # A plan file belongs to one job, so plan / apply the jobs one at a time
+    if entity_config.mode == "apply" or entity_config.plan_file:
+        raise ValueError(
+            "sync-all does not support MODE=apply or PLAN_FILE; "
+            "run each job on its own to plan and apply."
+        )
+
+    councils_db_ids = {
+        entity_config.notion_database_id,
+        fetch_config.notion_database_id,
+        services_job.sync_config.COUNCILS_DB_ID,
+    }
+    if len(councils_db_ids) != 1:
+        raise ValueError(
+            f"Jobs disagree on the Councils DB id: {sorted(councils_db_ids)}"
+        )
+
+    councils = load_councils(entity_job, entity_config, fetch_config)
+    print(f"Loaded shared councils snapshot: {len(councils)} pages")
+
+    print(f"\n===== {ENTITY_SYNC_DIR} =====")
+    try:
+        with entity_job.profile_run(
+            entity_config.profile, entity_config.profile_dir, entity_job.METRICS_JOB
+        ):
+            # Councils it creates are decoded with the checkboxes api-fetch
+            # compares against, like the rest of the snapshot
+            entity_job.sync_notion_from_planning_data(
+                entity_config,
+                pages=councils,
+                checkbox_props=fetch_config.dataset_to_notion_prop.values(),
+            )
+    finally:
+        entity_job.write_metrics(entity_config.metrics_dir, entity_job.METRICS_JOB)
+
+    print(f"\n===== {API_FETCH_DIR} =====")
+    try:
+        with fetch_job.profile_run(
+            fetch_config.profile, fetch_config.profile_dir, fetch_job.METRICS_JOB
+        ):
+            fetch_job.sync_notion_from_planning_data(fetch_config, pages=councils)
+    finally:
+        fetch_job.write_metrics(fetch_config.metrics_dir, fetch_job.METRICS_JOB)
+
+    print(f"\n===== {SERVICES_DETAILED_DIR} =====")
+    services_job.main(council_pages=councils)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,284 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import httpx
 import requests
 import pandas as pd
 from notion_client import Client
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
 
 import sync_config
+from metrics import METRICS, MetricsTransport
+from notion_snapshot import load_db_records
+
+log = logging.getLogger(__name__)
+
+# Arrow-backed strings when pyarrow is installed, pandas' own otherwise
+try:
+    import pyarrow  # noqa: F401
+
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+
+# ───────────────────────── Rate control + retries ─────────────────
+# How much a 429 during recovery lowers the rate being recovered to
+THROTTLED_RATE_DECAY = 0.9
+
+
+class AdaptiveRate:
+    """
+    AIMD controller for the Notion request rate, shared by the sync reads and
+    the async writes (thread-safe). A 429 halves the rate down to min_rate
+    and, with Retry-After, pauses all requests until then. Every accepted
+    request then closes `recovery` of the gap back to the rate that drew the
+    429 (at least `increase`), so a throttled run is back near its working
+    rate within a few dozen requests; past that rate, and before any 429,
+    it rises by `increase` per request up to max_rate. A 429 while still
+    recovering lowers that target by THROTTLED_RATE_DECAY rather than
+    resetting it to the cut rate, so a run of unlucky 429s cannot ratchet
+    the rate down to min_rate. Requests already in flight when the rate was
+    cut were sent at the old rate, so their 429s pause but do not cut again.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        increase: float,
+        decrease: float = 0.5,
+        recovery: float = 0.0,
+    ):
+        self.min_rate = max(min(min_rate, rate), 0.01)
+        self.max_rate = max(max_rate, rate)
+        self._rate = rate
+        self._increase = increase
+        self._decrease = decrease
+        self._recovery = recovery
+        self._throttled_rate = 0.0
+        self._paused_until = 0.0
+        self._last_cut = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def on_success(self):
+        with self._lock:
+            gap = self._throttled_rate - self._rate
+            step = max(self._increase, gap * self._recovery)
+            self._rate = min(self.max_rate, self._rate + step)
+
+    def on_throttle(self, sent_at: float, retry_after: float | None):
+        with self._lock:
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if sent_at < self._last_cut:
+                return
+            if self._rate >= self._throttled_rate:
+                self._throttled_rate = self._rate
+            else:
+                # Throttled again before getting back: the limit may have
+                # dropped, so aim a little lower, but not at the cut rate
+                self._throttled_rate *= THROTTLED_RATE_DECAY
+            self._rate = max(self.min_rate, self._rate * self._decrease)
+            self._last_cut = now
+        log.info(f"Notion throttled us; write rate now {self._rate:.2f}/s")
+
+    def pause_remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+
+NOTION_RATE = AdaptiveRate(
+    sync_config.NOTION_WRITES_PER_SECOND,
+    sync_config.NOTION_MIN_WRITES_PER_SECOND,
+    sync_config.NOTION_MAX_WRITES_PER_SECOND,
+    sync_config.NOTION_RATE_INCREASE,
+    recovery=sync_config.NOTION_RATE_RECOVERY,
+)
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+def _retry_delay(attempt: int) -> float:
+    """
+    Full-jitter exponential backoff.
+    """
+    ceiling = min(
+        sync_config.RETRY_MAX_DELAY_SECS,
+        sync_config.RETRY_BASE_DELAY_SECS * (2**attempt),
+    )
+    return random.uniform(0, ceiling)
+
+
+def _is_page_create(request: httpx.Request) -> bool:
+    """
+    POST /v1/pages is the one write that is not idempotent: resending a
+    create that Notion applied before failing makes a second page.
+    """
+    return request.method == "POST" and request.url.path.rstrip("/").endswith("/pages")
+
+
+def _retry_reason(
+    request: httpx.Request, response: httpx.Response | None, attempt: int
+) -> str | None:
+    """
+    Why a response should be retried ("429", "5xx" or "connection"), or None
+    if it should be returned as is (success, other errors, last attempt).
+    Page creates are only retried on 429, which Notion rejects unapplied; a
+    5xx or dropped connection may still have made the page, so those go back
+    to the caller (see create_retry_wait).
+    """
+    if attempt + 1 >= sync_config.NOTION_MAX_ATTEMPTS:
+        return None
+    if response is None:
+        return None if _is_page_create(request) else "connection"
+    if response.status_code == 429:
+        return "429"
+    if response.status_code >= 500 and not _is_page_create(request):
+        return "5xx"
+    return None
+
+
+def create_retry_wait(error: Exception, attempt: int) -> float | None:
+    """
+    How long to wait before retrying a page create that failed with error,
+    or None if it should not be retried. Only failures that leave it unknown
+    whether Notion made the page qualify (5xx, timeouts, dropped
+    connections), and the caller must look the page up before creating it
+    again.
+    """
+    if attempt + 1 >= sync_config.NOTION_MAX_ATTEMPTS:
+        return None
+    if isinstance(error, HTTPResponseError) and error.status >= 500:
+        reason = "5xx"
+    elif isinstance(error, (RequestTimeoutError, httpx.TransportError)):
+        reason = "connection"
+    else:
+        return None
+    METRICS.count_retry("POST", f"{sync_config.NOTION_BASE_URL}/v1/pages", reason)
+    wait = _retry_delay(attempt)
+    METRICS.add_sleep("backoff", wait)
+    return wait
+
+
+def _after_response(
+    request: httpx.Request,
+    response: httpx.Response | None,
+    attempt: int,
+    sent_at: float,
+) -> float | None:
+    """
+    Feeds a response into NOTION_RATE and returns how long to wait before
+    retrying it, or None to stop (the response is final).
+    """
+    if response is not None and response.status_code == 429:
+        NOTION_RATE.on_throttle(sent_at, _retry_after(response))
+    elif response is not None and response.status_code < 500:
+        NOTION_RATE.on_success()
+    reason = _retry_reason(request, response, attempt)
+    if reason is None:
+        return None
+    METRICS.count_retry(request.method, str(request.url), reason)
+    if reason == "429":
+        # The shared pause covers Retry-After; without one, back off
+        wait = NOTION_RATE.pause_remaining() or _retry_delay(attempt)
+    else:
+        wait = _retry_delay(attempt)
+    METRICS.add_sleep("retry_after" if reason == "429" else "backoff", wait)
+    return wait
+
+
+class RetryTransport(httpx.BaseTransport):
+    """
+    Retries 429s (honouring Retry-After), 5xx responses and connection errors
+    under notion_client's httpx.Client, which does not retry by itself. Page
+    creates are only retried on 429 (see _retry_reason).
+    """
+
+    def __init__(self, wrapped: httpx.BaseTransport):
+        self._wrapped = wrapped
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            time.sleep(NOTION_RATE.pause_remaining())
+            sent_at = time.monotonic()
+            try:
+                response = self._wrapped.handle_request(request)
+            except httpx.TransportError:
+                if _retry_reason(request, None, attempt) is None:
+                    raise
+                response = None
+            wait = _after_response(request, response, attempt, sent_at)
+            if wait is None:
+                return response
+            if response is not None:
+                response.close()
+            time.sleep(wait)
+            attempt += 1
+
+    def close(self):
+        self._wrapped.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """
+    RetryTransport for notion_client's AsyncClient.
+    """
+
+    def __init__(self, wrapped: httpx.AsyncBaseTransport):
+        self._wrapped = wrapped
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            await asyncio.sleep(NOTION_RATE.pause_remaining())
+            sent_at = time.monotonic()
+            try:
+                response = await self._wrapped.handle_async_request(request)
+            except httpx.TransportError:
+                if _retry_reason(request, None, attempt) is None:
+                    raise
+                response = None
+            wait = _after_response(request, response, attempt, sent_at)
+            if wait is None:
+                return response
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    async def aclose(self):
+        await self._wrapped.aclose()
 
 
 # ───────────────────────── Notion client ─────────────────────────
 def notion_client() -> Client:
     if not sync_config.NOTION_TOKEN:
         raise ValueError("NOTION_TOKEN env var not set.")
-    return Client(auth=sync_config.NOTION_TOKEN)
+    return Client(
+        client=httpx.Client(transport=RetryTransport(MetricsTransport())),
+        auth=sync_config.NOTION_TOKEN,
+        base_url=sync_config.NOTION_BASE_URL,
+    )
 
 
 # ───────────────────────── Metabase ──────────────────────────────
@@ -35,13 +301,50 @@ def fetch_metabase_json() -> list[dict]:
         "Content-Type": "application/json",
     }
 
+    started = time.perf_counter()
     r = requests.post(
         json_url, headers=headers, json={}, timeout=sync_config.TIMEOUT_SECONDS
     )
+    METRICS.observe_request(
+        "POST", json_url, r.status_code, time.perf_counter() - started
+    )
     r.raise_for_status()
     return r.json()
 
 
+# The card's columns; a response missing any of them fails the run
+METABASE_COLUMNS = (
+    "reference_code",
+    "council_name",
+    "team_slug",
+    "flow_id",
+    "service_name",
+    "service_slug",
+    "usage",
+    "first_online_at",
+    "url",
+)
+METABASE_TEXT_COLUMNS = [c for c in METABASE_COLUMNS if c != "usage"]
+
+
+def _check_metabase_columns(columns) -> None:
+    missing = set(METABASE_COLUMNS) - set(columns)
+    if missing:
+        raise ValueError(f"Metabase response missing columns: {sorted(missing)}")
+
+
+def _type_metabase_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Text columns become stripped strings (missing -> ""), usage an int.
+    first_online_at stays the string Metabase sent: it is written to Notion's
+    date as is and compared with what Notion stores.
+    """
+    for col in METABASE_TEXT_COLUMNS:
+        df[col] = df[col].astype(STRING_DTYPE).fillna("").str.strip()
+    df["usage"] = pd.to_numeric(df["usage"], errors="coerce").fillna(0).astype(int)
+    return df
+
+
 def format_metabase_df(payload: list[dict]) -> pd.DataFrame:
     """
     Returns a dataframe with columns:
@@ -49,44 +352,69 @@ def format_metabase_df(payload: list[dict]) -> pd.DataFrame:
       service_slug, usage, first_online_at, url
     """
     df = pd.DataFrame(payload)
+    _check_metabase_columns(df.columns)
+    return _type_metabase_columns(df)
 
-    expected = {
-        "reference_code",
-        "council_name",
-        "team_slug",
-        "flow_id",
-        "service_name",
-        "service_slug",
-        "usage",
-        "first_online_at",
-        "url",
-    }
-    missing = expected - set(df.columns)
-    if missing:
-        raise ValueError(f"Metabase response missing columns: {sorted(missing)}")
 
-    for col in [
-        "reference_code",
-        "council_name",
-        "team_slug",
-        "flow_id",
-        "service_name",
-        "service_slug",
-        "url",
-    ]:
-        df[col] = df[col].fillna("").astype(str).str.strip()
+def fetch_metabase_csv_df() -> pd.DataFrame:
+    """
+    Streams the card's CSV export and decodes it METABASE_CHUNK_ROWS rows at
+    a time straight into typed columns, so the raw export is never held in
+    memory. Fails on the first chunk if a column is missing.
+    """
+    if not sync_config.METABASE_API_KEY:
+        raise ValueError("METABASE_API_KEY env var not set.")
 
-    df["usage"] = pd.to_numeric(df["usage"], errors="coerce").fillna(0).astype(int)
-    return df
+    csv_url = (
+        f"{sync_config.METABASE_URL.rstrip('/')}/api/card/"
+        f"{sync_config.CARD_ID}/query/csv"
+    )
+    headers = {"x-api-key": sync_config.METABASE_API_KEY}
+
+    started = time.perf_counter()
+    # Unformatted values, so dates and numbers come through as in the JSON export
+    with requests.post(
+        csv_url,
+        headers=headers,
+        data={"format_rows": "false"},
+        timeout=sync_config.TIMEOUT_SECONDS,
+        stream=True,
+    ) as r:
+        METRICS.observe_request(
+            "POST", csv_url, r.status_code, time.perf_counter() - started
+        )
+        r.raise_for_status()
+        r.raw.decode_content = True
+
+        chunks = []
+        reader = pd.read_csv(
+            r.raw,
+            usecols=lambda col: col in METABASE_COLUMNS,
+            dtype={col: STRING_DTYPE for col in METABASE_TEXT_COLUMNS},
+            keep_default_na=False,
+            chunksize=sync_config.METABASE_CHUNK_ROWS,
+        )
+        for chunk in reader:
+            if not chunks:
+                _check_metabase_columns(chunk.columns)
+            chunks.append(_type_metabase_columns(chunk))
+        # A header-only export still yields one empty chunk
+        if not chunks:
+            _check_metabase_columns(())
+
+    return pd.concat(chunks, ignore_index=True)
 
 
 def fetch_metabase_df() -> pd.DataFrame:
     """
-    Wrapper around fetch_metabase_json + format_metabase_df.
     Returns a dataframe with columns:
       reference_code, council_name, team_slug, flow_id, service_name,
       service_slug, usage, first_online_at, url
+    from the card's JSON export (METABASE_EXPORT=json, the default) or its
+    streamed CSV export (METABASE_EXPORT=csv).
     """
+    if sync_config.METABASE_EXPORT == "csv":
+        return fetch_metabase_csv_df()
     payload = fetch_metabase_json()
     return format_metabase_df(payload)
 
@@ -112,19 +440,30 @@ def add_usage_rank_per_council(df: pd.DataFrame) -> pd.DataFrame:
 
 # ───────────────────────── Notion paging + prop readers ───────────
 def paginate_db(notion: Client, database_id: str, **kwargs):
-    cursor = None
-    while True:
-        resp = notion.databases.query(
+    """
+    Yields every page in the database. The next cursor page is requested in a
+    background thread while the current one is consumed, so only a couple of
+    query responses are held at once.
+    """
+
+    def fetch(cursor):
+        return notion.databases.query(
             database_id=database_id,
             start_cursor=cursor,
             page_size=sync_config.PAGE_SIZE,
             **kwargs,
         )
-        for r in resp["results"]:
-            yield r
-        if not resp.get("has_more"):
-            break
-        cursor = resp.get("next_cursor")
+
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending = prefetcher.submit(fetch, None)
+        while pending is not None:
+            resp = pending.result()
+            pending = (
+                prefetcher.submit(fetch, resp.get("next_cursor"))
+                if resp.get("has_more")
+                else None
+            )
+            yield from resp["results"]
 
 
 def title_val(prop: dict) -> str:
@@ -167,71 +506,167 @@ def relation_ids(prop: dict) -> list[str]:
     return [x.get("id") for x in rel if x.get("id")]
 
 
+# ───────────────────────── Page records ───────────────────────────
+# Pages are decoded into these as they stream in, so only the properties the
+# sync compares are held, not the page JSON.
+@dataclass(slots=True)
+class CouncilRecord:
+    ref: str
+    name: str
+    page_id: str = ""
+
+
+@dataclass(slots=True)
+class ServiceRecord:
+    flow_id: str
+    reference_code: str = ""
+    council_name: str = ""
+    service_name: str = ""
+    usage: int | float = 0
+    first_online: str = ""
+    url: str = ""
+    # list (not set) so the record can be persisted as JSON
+    council_rel_ids: list[str] = field(default_factory=list)
+    usage_rank_council: int | float = 0
+    page_id: str = ""
+    edited: str = ""  # The page's last_edited_time
+
+
 # ───────────────────────── Councils lookup (READ ONLY) ────────────
-def load_councils_by_ref_code(notion: Client) -> dict[str, dict]:
+def _council_record(page: dict) -> CouncilRecord | None:
+    p = page["properties"]
+    ref = rich_text_val(p.get(sync_config.COUNCIL_PROP_REF_CODE, {}))
+    name = title_val(p.get(sync_config.COUNCIL_PROP_NAME, {})) or ""
+    if not ref:
+        return None
+    return CouncilRecord(ref=ref.strip(), name=name.strip())
+
+
+def load_councils_by_ref_code(
+    notion: Client, pages: list | None = None
+) -> dict[str, CouncilRecord]:
     """
     Returns:
-      { "CMD": {"page_id": "...", "name": "Camden"} }
+      { "CMD": CouncilRecord(ref="CMD", name="Camden", page_id="...") }
+    If pages (an already loaded Councils DB snapshot of decoded council
+    records, see src/sync-all) is given, Notion is not queried.
     """
     if not sync_config.COUNCILS_DB_ID or sync_config.COUNCILS_DB_ID == "REPLACE_ME":
         raise ValueError(
             "COUNCILS_DB_ID not set (needed for reference-code reconciliation)."
         )
 
-    by_ref: dict[str, dict] = {}
-    for c in paginate_db(notion, sync_config.COUNCILS_DB_ID):
-        p = c["properties"]
-        ref = rich_text_val(p.get(sync_config.COUNCIL_PROP_REF_CODE, {}))
-        name = title_val(p.get(sync_config.COUNCIL_PROP_NAME, {})) or ""
-        if ref:
-            by_ref[ref.strip()] = {"page_id": c["id"], "name": name.strip()}
+    if pages is not None:
+        records = {
+            page.id: CouncilRecord(
+                ref=page.ref.strip(), name=(page.council_name or "").strip()
+            )
+            for page in pages
+            if page.ref
+        }
+    else:
+        records = load_db_records(
+            lambda db_id, **kwargs: paginate_db(notion, db_id, **kwargs),
+            sync_config.COUNCILS_DB_ID,
+            "councils-services-detailed",
+            _council_record,
+            CouncilRecord,
+        )
+    by_ref: dict[str, CouncilRecord] = {}
+    for page_id, rec in records.items():
+        rec.page_id = page_id
+        by_ref[rec.ref] = rec
     return by_ref
 
 
 # ───────────────────────── Services index (WRITE target) ───────────
-def load_services_by_flow_id(notion: Client) -> dict[str, dict]:
+def _service_record(page: dict) -> ServiceRecord | None:
+    p = page["properties"]
+
+    flow_id = title_val(p.get(sync_config.SVC_PROP_FLOW_ID, {}))
+    if not flow_id:
+        return None
+
+    rec = ServiceRecord(
+        flow_id=flow_id.strip(),
+        reference_code=rich_text_val(p.get(sync_config.SVC_PROP_REFERENCE_CODE, {}))
+        or "",
+        council_name=rich_text_val(p.get(sync_config.SVC_PROP_COUNCIL_NAME, {})) or "",
+        service_name=rich_text_val(p.get(sync_config.SVC_PROP_SERVICE_NAME, {})) or "",
+        usage=number_val(p.get(sync_config.SVC_PROP_USAGE, {})) or 0,
+        first_online=date_val(p.get(sync_config.SVC_PROP_FIRST_ONLINE, {})) or "",
+        url=url_val(p.get(sync_config.SVC_PROP_URL, {})) or "",
+        council_rel_ids=sorted(
+            relation_ids(p.get(sync_config.SVC_PROP_COUNCIL_REL, {}))
+        ),
+        edited=page.get("last_edited_time") or "",
+    )
+
+    if sync_config.ENABLE_USAGE_RANK:
+        rec.usage_rank_council = (
+            number_val(p.get(sync_config.SVC_PROP_USAGE_RANK, {})) or 0
+        )
+
+    return rec
+
+
+def load_services_by_flow_id(notion: Client) -> dict[str, ServiceRecord]:
     """
     Keyed by Flow Id (Title).
     """
     if not sync_config.SERVICES_DB_ID or sync_config.SERVICES_DB_ID == "REPLACE_ME":
         raise ValueError("SERVICES_DB_ID not set.")
 
-    idx: dict[str, dict] = {}
-    for s in paginate_db(notion, sync_config.SERVICES_DB_ID):
-        p = s["properties"]
+    records = load_db_records(
+        lambda db_id, **kwargs: paginate_db(notion, db_id, **kwargs),
+        sync_config.SERVICES_DB_ID,
+        "services-detailed",
+        _service_record,
+        ServiceRecord,
+    )
+    idx: dict[str, ServiceRecord] = {}
+    for page_id, rec in records.items():
+        rec.page_id = page_id
+        idx[rec.flow_id] = rec
 
-        flow_id = title_val(p.get(sync_config.SVC_PROP_FLOW_ID, {}))
-        if not flow_id:
-            continue
-        flow_id = flow_id.strip()
+    return idx
 
-        cur = {
-            "page_id": s["id"],
-            "reference_code": rich_text_val(
-                p.get(sync_config.SVC_PROP_REFERENCE_CODE, {})
-            )
-            or "",
-            "council_name": rich_text_val(p.get(sync_config.SVC_PROP_COUNCIL_NAME, {}))
-            or "",
-            "service_name": rich_text_val(p.get(sync_config.SVC_PROP_SERVICE_NAME, {}))
-            or "",
-            "usage": number_val(p.get(sync_config.SVC_PROP_USAGE, {})) or 0,
-            "first_online": date_val(p.get(sync_config.SVC_PROP_FIRST_ONLINE, {}))
-            or "",
-            "url": url_val(p.get(sync_config.SVC_PROP_URL, {})) or "",
-            "council_rel_ids": set(
-                relation_ids(p.get(sync_config.SVC_PROP_COUNCIL_REL, {}))
-            ),
-        }
 
-        if sync_config.ENABLE_USAGE_RANK:
-            cur["usage_rank_council"] = (
-                number_val(p.get(sync_config.SVC_PROP_USAGE_RANK, {})) or 0
-            )
+SERVICE_COLUMNS = (
+    "flow_id",
+    "page_id",
+    "reference_code",
+    "council_name",
+    "service_name",
+    "usage",
+    "first_online",
+    "url",
+    "usage_rank_council",
+    "edited",
+)
+SERVICE_NUMBER_COLUMNS = ("usage", "usage_rank_council")
 
-        idx[flow_id] = cur
 
-    return idx
+def services_index_df(idx: dict[str, ServiceRecord]) -> pd.DataFrame:
+    """
+    The services index as a dataframe, one row per Flow Id, for diffing
+    against Metabase column by column. Relations become "council_rel_key":
+    the distinct related page ids, sorted and comma-joined, so they compare
+    as plain strings. Dtypes are set explicitly, so an empty index (a first
+    run) still merges on flow_id like a full one.
+    """
+    recs = list(idx.values())
+    data = {col: [getattr(r, col) for r in recs] for col in SERVICE_COLUMNS}
+    data["council_rel_key"] = [",".join(sorted(set(r.council_rel_ids))) for r in recs]
+    return pd.DataFrame(
+        {
+            col: pd.Series(
+                values,
+                dtype="float64" if col in SERVICE_NUMBER_COLUMNS else object,
+            )
+            for col, values in data.items()
+        }
+    )
 
 
 # ───────────────────────── Build props + write helpers ─────────────
@@ -277,19 +712,16 @@ def create_service_page(notion: Client, props: dict) -> dict:
     )
 
 
-def update_page(notion: Client, page_id: str, props: dict) -> dict:
-    return notion.pages.update(page_id=page_id, properties=props)
-
-
-def set_relation(notion: Client, page_id: str, prop_name: str, ids: list[str]) -> dict:
-    return notion.pages.update(
-        page_id=page_id,
-        properties={prop_name: {"relation": [{"id": i} for i in ids]}},
+def query_service_by_flow_id(notion: Client, flow_id: str) -> dict:
+    return notion.databases.query(
+        database_id=sync_config.SERVICES_DB_ID,
+        filter={"property": sync_config.SVC_PROP_FLOW_ID, "title": {"equals": flow_id}},
+        page_size=1,
     )
 
 
-def gentle_sleep():
-    time.sleep(sync_config.GENTLE_DELAY_SECONDS)
+def update_page(notion: Client, page_id: str, props: dict) -> dict:
+    return notion.pages.update(page_id=page_id, properties=props)
 
 
 # ───────────────────────── Schema checks (fail fast) ───────────────
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Awaitable, Callable
+
+import httpx
+from notion_client import AsyncClient
+
+import api_helpers as api
+import sync_config
+from journal import Journal
+from metrics import METRICS, AsyncMetricsTransport
+
+log = logging.getLogger(__name__)
+
+PROGRESS_EVERY = 50
+
+
+class WritesFailed(RuntimeError):
+    """
+    Some page writes failed after every other one was attempted.
+    """
+
+
+# ───────────────────────── Async Notion client ─────────────────────
+def async_notion_client() -> AsyncClient:
+    if not sync_config.NOTION_TOKEN:
+        raise ValueError("NOTION_TOKEN env var not set.")
+    return AsyncClient(
+        client=httpx.AsyncClient(
+            transport=api.AsyncRetryTransport(AsyncMetricsTransport())
+        ),
+        auth=sync_config.NOTION_TOKEN,
+        base_url=sync_config.NOTION_BASE_URL,
+    )
+
+
+# ───────────────────────── Rate limiting ───────────────────────────
+class AsyncTokenBucket:
+    """
+    Shared by every worker: refills at the controller's current rate (see
+    api_helpers.AdaptiveRate) and banks up to `burst`. Waiters queue on the
+    lock, so tokens are handed out in order.
+    """
+
+    def __init__(self, rate: api.AdaptiveRate, burst: int):
+        self._rate = rate
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                rate = self._rate.rate
+                self._tokens = min(self._burst, self._tokens + elapsed * rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / rate
+                METRICS.add_sleep("rate_limit", wait)
+                await asyncio.sleep(wait)
+
+
+# ───────────────────────── Per-page writes ─────────────────────────
+# Every pending change to a page goes out in one request: a new page is
+# created with its relation already set, and an existing page's property
+# update and relation fix share one PATCH. The api_helpers write functions
+# only forward to notion.pages.*, so with an AsyncClient they return
+# awaitables.
+def _with_relation(props: dict | None, rel_ids: list[str] | None) -> dict:
+    merged = dict(props or {})
+    if rel_ids is not None:
+        merged[sync_config.SVC_PROP_COUNCIL_REL] = {
+            "relation": [{"id": i} for i in rel_ids]
+        }
+    return merged
+
+
+async def _create_page(
+    notion: AsyncClient,
+    bucket: AsyncTokenBucket,
+    props: dict,
+    council_page_id: str | None,
+    check_existing: bool,
+):
+    rel_ids = [council_page_id] if council_page_id else None
+    attempt = 0
+    while True:
+        if check_existing or attempt:
+            # Resumed from the journal or a saved plan, or an earlier attempt
+            # failed without saying whether Notion made the page: it may
+            # already exist, and then only its relation may still be missing.
+            await bucket.acquire()
+            found = await api.query_service_by_flow_id(notion, _flow_id(props))
+            existing = next(iter(found.get("results") or []), None)
+            if existing is not None:
+                if rel_ids is not None:
+                    await bucket.acquire()
+                    await api.update_page(
+                        notion, existing["id"], _with_relation(None, rel_ids)
+                    )
+                return
+        await bucket.acquire()
+        try:
+            await api.create_service_page(notion, _with_relation(props, rel_ids))
+            return
+        except Exception as e:
+            wait = api.create_retry_wait(e, attempt)
+            if wait is None:
+                raise
+        await asyncio.sleep(wait)
+        attempt += 1
+
+
+async def _update_page(
+    notion: AsyncClient,
+    bucket: AsyncTokenBucket,
+    page_id: str,
+    props: dict | None,
+    rel_ids: list[str] | None,
+):
+    await bucket.acquire()
+    await api.update_page(notion, page_id, _with_relation(props, rel_ids))
+
+
+def _flow_id(props: dict) -> str:
+    title = props.get(sync_config.SVC_PROP_FLOW_ID, {}).get("title") or []
+    return title[0]["text"]["content"] if title else "unknown flow"
+
+
+# ───────────────────────── Write plan ──────────────────────────────
+def plan_writes(
+    to_create: list[tuple[dict, str | None]],
+    to_update: list[tuple[str, dict]],
+    to_relate: list[tuple[str, list[str]]],
+) -> list[dict]:
+    """
+    Coalesces the planned changes into one op per page, each applied as a
+    single Notion request. Repeated writes to the same page (or creates of
+    the same Flow Id) collapse into one, later properties winning. Ops are
+    plain JSON, so they can be journaled.
+    """
+    creates: dict[str, dict] = {}
+    for props, council_page_id in to_create:
+        key = f"create:{_flow_id(props)}"
+        op = creates.setdefault(key, {"key": key, "props": {}})
+        op["props"] = {**op["props"], **props}
+        op["council_page_id"] = council_page_id
+    existing: dict[str, dict] = {}
+    for page_id, props in to_update:
+        writes = existing.setdefault(page_id, {"props": None, "rel_ids": None})
+        writes["props"] = {**(writes["props"] or {}), **props}
+    for page_id, rel_ids in to_relate:
+        existing.setdefault(page_id, {"props": None, "rel_ids": None})["rel_ids"] = (
+            rel_ids
+        )
+
+    planned = len(to_create) + len(to_update) + len(to_relate)
+    ops = list(creates.values()) + [
+        {"key": f"page:{page_id}", "page_id": page_id, **writes}
+        for page_id, writes in existing.items()
+    ]
+    if planned > len(ops):
+        log.info(f"Coalesced {planned} planned writes into {len(ops)} requests")
+    return ops
+
+
+# ───────────────────────── Apply engine ────────────────────────────
+async def _run_tasks(
+    tasks: list[tuple[str, Callable[[], Awaitable[None]]]],
+    concurrency: int,
+    journal: Journal,
+) -> list[tuple[str, str]]:
+    """
+    Runs every (key, task) on a pool of `concurrency` workers, marking each
+    done in the journal as it succeeds. Returns [(key, error)] for the tasks
+    that failed; the others still run.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for task in tasks:
+        queue.put_nowait(task)
+
+    errors: list[tuple[str, str]] = []
+    done = 0
+
+    async def worker():
+        nonlocal done
+        while True:
+            try:
+                label, run = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await run()
+                journal.mark_done(label)
+            except Exception as e:
+                errors.append((label, str(e)))
+            done += 1
+            if done % PROGRESS_EVERY == 0:
+                log.info(f"Applied {done}/{len(tasks)} pages")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return errors
+
+
+async def _apply(
+    ops: list[dict], journal: Journal, check_existing: bool
+) -> tuple[int, list[tuple[str, str]]]:
+    notion = async_notion_client()
+    bucket = AsyncTokenBucket(api.NOTION_RATE, sync_config.NOTION_WRITE_BURST)
+
+    tasks = []
+    for op in ops:
+        if op["key"].startswith("create:"):
+            run = partial(
+                _create_page,
+                notion,
+                bucket,
+                op["props"],
+                op["council_page_id"],
+                check_existing,
+            )
+        else:
+            run = partial(
+                _update_page, notion, bucket, op["page_id"], op["props"], op["rel_ids"]
+            )
+        tasks.append((op["key"], run))
+
+    try:
+        errors = await _run_tasks(tasks, sync_config.NOTION_WRITE_CONCURRENCY, journal)
+    finally:
+        await notion.aclose()
+    return len(tasks) - len(errors), errors
+
+
+def apply_changes(
+    ops: list[dict], journal: Journal, check_existing: bool = False
+) -> int:
+    """
+    Applies the planned Services DB writes (see plan_writes) concurrently: up
+    to NOTION_WRITE_CONCURRENCY pages at a time, all sharing one adaptive
+    rate limit. 429s and transient failures are retried underneath (see
+    api_helpers.RetryTransport). Each page is marked done in the journal
+    once written. A create is never resent blind: after a 5xx or dropped
+    connection it looks for the page first, and with check_existing it does
+    so before the first attempt too (resumed runs, saved plans).
+
+    Every page is attempted even if some fail; failures are logged and then
+    raised together as WritesFailed, so the run still ends in error. Returns
+    the number of pages written.
+    """
+    applied, errors = asyncio.run(_apply(ops, journal, check_existing))
+    if errors:
+        for label, err in errors[:15]:
+            log.error(f"Write failed for {label}: {err}")
+        raise WritesFailed(
+            f"{len(errors)} of {applied + len(errors)} page writes failed."
+        )
+    return applied
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+log = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+MAX_AGE = timedelta(hours=24)
+
+
+# ───────────────────────── Write-ahead journal ─────────────────────
+class Journal:
+    """
+    Append-only JSONL log of one run's planned writes, kept under
+    SYNC_STATE_DIR so an interrupted apply can be finished by the next run.
+
+    Records (one JSON object per line):
+      {"t": "header", ...}          job context and start time
+      {"t": "ops", "ops": [...]}    the planned writes, one op dict per page
+      {"t": "done", "key": ...}     a page whose writes all succeeded
+
+    The whole plan is logged before the first write and each page is marked
+    done as soon as it is written, so after a crash pending_ops() is exactly
+    the work left over. The file is removed once every write has succeeded,
+    and by a sync run that finished with failed writes (the next run plans
+    those afresh along with any new changes); MODE=apply keeps it, so a
+    re-run retries only what failed.
+
+    A journal from a run with a different context (databases, card, ...) or
+    older than MAX_AGE is discarded rather than resumed, since its plan would
+    be stale. With no state dir every method is a no-op.
+    """
+
+    def __init__(self, state_dir: str | None, name: str, context: dict):
+        self.enabled = bool(state_dir)
+        self.path = os.path.join(state_dir, f"{name}.jsonl") if state_dir else ""
+        self.resumed = False
+        self._planned: dict[str, dict] = {}
+        self._done: set[str] = set()
+        self._file = None
+
+        if not self.enabled:
+            return
+        os.makedirs(state_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            self._load(context)
+        if self.resumed:
+            self._file = open(self.path, "a", encoding="utf-8")
+        else:
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._append(
+                {
+                    "t": "header",
+                    "version": JOURNAL_VERSION,
+                    "context": context,
+                    "started_at": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+
+    def _load(self, context: dict):
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A crash mid-append leaves a partial last line
+                    break
+
+        header = records[0] if records else {}
+        reason = None
+        if header.get("t") != "header" or header.get("version") != JOURNAL_VERSION:
+            reason = "unreadable"
+        elif header.get("context") != context:
+            reason = "configuration changed"
+        else:
+            started = datetime.fromisoformat(header["started_at"])
+            if datetime.now(timezone.utc) - started > MAX_AGE:
+                reason = "older than 24h"
+        if reason:
+            log.warning(f"Discarding journal {self.path}: {reason}")
+            return
+
+        for record in records[1:]:
+            if record.get("t") == "ops":
+                for op in record.get("ops") or []:
+                    self._planned[op["key"]] = op
+            elif record.get("t") == "done":
+                self._done.add(record["key"])
+        # Nothing was planned yet, so there is nothing to resume
+        self.resumed = bool(self._planned)
+
+    def _append(self, record: dict):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def pending_ops(self) -> list[dict]:
+        """
+        Ops planned by the interrupted run that never completed, in plan order.
+        """
+        return [op for key, op in self._planned.items() if key not in self._done]
+
+    def record_ops(self, ops: list[dict]):
+        if self.enabled and ops:
+            self._append({"t": "ops", "ops": ops})
+
+    def mark_done(self, key: str):
+        if self.enabled:
+            self._append({"t": "done", "key": key})
+
+    def complete(self):
+        """
+        Removes the journal: the run finished and nothing needs resuming.
+        """
+        if not self.enabled:
+            return
+        self._file.close()
+        self._file = None
+        os.remove(self.path)
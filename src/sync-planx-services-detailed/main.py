@@ -1,6 +1,19 @@
 import sync_config
 import api_helpers as api
 import logging
+import queue
+import threading
+import time
+import pandas as pd
+from typing import Any, Callable
+from notion_client import Client
+from async_apply import WritesFailed, apply_changes, plan_writes
+from journal import Journal
+from metrics import METRICS, write_metrics
+from plan_file import read_plan, shard_ops, summarize_ops, write_plan
+from profiling import profile_run
+from record_hashes import RecordHashes, row_hashes
+from run_fingerprint import check_unchanged, frame_fingerprint, record_run
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -8,7 +21,22 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 
-def main():
+def main(council_pages: list | None = None):
+    """
+    council_pages: an already loaded Councils DB snapshot of decoded council
+    records (see src/sync-all). When given, the Councils DB is not queried
+    again.
+    """
+    try:
+        with profile_run(
+            sync_config.PROFILE, sync_config.PROFILE_DIR, sync_config.METRICS_JOB
+        ):
+            sync_services(council_pages)
+    finally:
+        write_metrics(sync_config.METRICS_DIR, sync_config.METRICS_JOB)
+
+
+def sync_services(council_pages: list | None = None):
     # Safety: only ever write to Services DB, but we will READ Councils DB.
     if not sync_config.SERVICES_DB_ID or sync_config.SERVICES_DB_ID == "REPLACE_ME":
         raise ValueError("SERVICES_DB_ID not set.")
@@ -16,145 +44,364 @@ def main():
         raise ValueError("COUNCILS_DB_ID not set.")
     if not sync_config.NOTION_TOKEN:
         raise ValueError("NOTION_TOKEN env var not set.")
-    if not sync_config.METABASE_API_KEY:
+    if sync_config.MODE not in ("sync", "plan", "apply"):
+        raise ValueError(f"Unknown MODE '{sync_config.MODE}'.")
+    if sync_config.METABASE_EXPORT not in ("json", "csv"):
+        raise ValueError(f"Unknown METABASE_EXPORT '{sync_config.METABASE_EXPORT}'.")
+    if sync_config.MODE == "apply" and not sync_config.PLAN_FILE:
+        raise ValueError("MODE=apply requires PLAN_FILE to be set.")
+    if not 0 <= sync_config.SHARD_INDEX < max(sync_config.SHARD_COUNT, 1):
+        raise ValueError("SHARD_INDEX must be between 0 and SHARD_COUNT - 1.")
+    if sync_config.MODE != "apply" and not sync_config.METABASE_API_KEY:
         raise ValueError("METABASE_API_KEY env var not set.")
+    if sync_config.INCREMENTAL and not sync_config.STATE_DIR:
+        raise ValueError("INCREMENTAL requires SYNC_STATE_DIR to be set.")
+    if sync_config.SKIP_UNCHANGED and not sync_config.STATE_DIR:
+        raise ValueError("SKIP_UNCHANGED requires SYNC_STATE_DIR to be set.")
 
     notion = api.notion_client()
 
-    # Validate we won't get type-mismatch errors mid-run
-    api.validate_services_db_schema(notion)
+    # Plans and journals only carry over between runs configured alike
+    context = {
+        "services_db_id": sync_config.SERVICES_DB_ID,
+        "councils_db_id": sync_config.COUNCILS_DB_ID,
+        "card_id": sync_config.CARD_ID,
+        "usage_rank": sync_config.ENABLE_USAGE_RANK,
+    }
+
+    if sync_config.MODE == "plan":
+        ops = plan_services(notion, council_pages)
+        METRICS.end_phase()
+        log.info(f"Plan: {summarize_ops(ops)}")
+        if sync_config.PLAN_FILE:
+            write_plan(sync_config.PLAN_FILE, sync_config.METRICS_JOB, context, ops)
+            log.info(f"Plan written to {sync_config.PLAN_FILE}")
+        log.info(f"Phases: {METRICS.phase_report()}")
+        log.info("✅ Done. (Plan only, nothing was written.)")
+        return
+
+    # A run that stopped part-way through applying its plan left the writes
+    # it had not finished in the journal: finish those instead of re-planning.
+    if sync_config.MODE == "apply":
+        # Validate we won't get type-mismatch errors mid-run (planning
+        # validates alongside its reads)
+        api.validate_services_db_schema(notion)
+        plan = read_plan(sync_config.PLAN_FILE, sync_config.METRICS_JOB, context)
+        ops = shard_ops(plan["ops"], sync_config.SHARD_INDEX, sync_config.SHARD_COUNT)
+        journal = Journal(
+            sync_config.STATE_DIR,
+            f"journal-{sync_config.METRICS_JOB}-apply-"
+            f"{sync_config.SHARD_INDEX}of{sync_config.SHARD_COUNT}",
+            context={**context, "plan_created_at": plan["created_at"]},
+        )
+    else:
+        journal = Journal(
+            sync_config.STATE_DIR, f"journal-{sync_config.METRICS_JOB}", context
+        )
+    source = None
+    if journal.resumed:
+        if sync_config.MODE != "apply":
+            api.validate_services_db_schema(notion)
+        ops = journal.pending_ops()
+        log.info(f"Resuming interrupted run: {len(ops)} pages left to write")
+    else:
+        if sync_config.MODE == "apply":
+            log.info(
+                f"Applying plan from {plan['created_at']} (shard "
+                f"{sync_config.SHARD_INDEX + 1}/{sync_config.SHARD_COUNT}): "
+                f"{summarize_ops(ops)}"
+            )
+        else:
+            df = None
+            if sync_config.SKIP_UNCHANGED:
+                # Metabase is read first: while it matches the last full run
+                # and Notion is untouched, there is nothing to sync
+                with METRICS.phase("fingerprint"):
+                    df = api.fetch_metabase_df()
+                    source = frame_fingerprint(df)
+                    unchanged, reason = check_unchanged(notion, context, source)
+                log.info(f"Fingerprints: {reason}")
+                if unchanged:
+                    journal.complete()
+                    log.info(f"Phases: {METRICS.phase_report()}")
+                    log.info("✅ Done. (Nothing changed; Notion was not read.)")
+                    return
+            hashes = (
+                RecordHashes(
+                    sync_config.STATE_DIR,
+                    f"record-hashes-{sync_config.METRICS_JOB}",
+                    context,
+                )
+                if sync_config.STATE_DIR
+                else None
+            )
+            ops = plan_services(notion, council_pages, df, hashes)
+            if hashes is not None:
+                hashes.save()
+        journal.record_ops(ops)
+
+    METRICS.enter_phase("apply")
+    # Apply creates, updates and relation fixes (Services DB only). Pages are
+    # written concurrently; a new page's relation is set once it exists. The
+    # plan is journaled first so an interrupted apply can be resumed.
+    try:
+        applied = apply_changes(
+            ops, journal, check_existing=journal.resumed or sync_config.MODE == "apply"
+        )
+    except WritesFailed:
+        # The sync got to the end: its failed writes are planned afresh by the
+        # next run, along with any new changes, so there is nothing to resume.
+        # A plan being applied keeps its journal, so a re-run retries only
+        # what failed.
+        if sync_config.MODE != "apply":
+            journal.complete()
+        raise
+    journal.complete()
+    log.info(f"Applied -> pages:{applied}")
+    if source is not None:
+        record_run(notion, context, source)
+
+    METRICS.end_phase()
+    log.info(f"Phases: {METRICS.phase_report()}")
+    log.info("✅ Done. (Councils DB was read-only.)")
+
 
-    # 1) Fetch Metabase data
-    df = api.fetch_metabase_df()
+def plan_services(
+    notion: Client,
+    council_pages: list | None,
+    df: pd.DataFrame | None = None,
+    hashes: RecordHashes | None = None,
+) -> list[dict]:
+    """
+    Reads Metabase (unless df already holds its rows) and both Notion DBs and
+    returns the Services DB writes to make, grouped per page (see
+    async_apply.plan_writes). hashes: see diff_services.
+    """
+    # The schema check and the reads are independent: run them side by side
+    # so startup takes as long as the slowest of them, not their sum
+    with METRICS.phase("fetch"):
+        results = run_concurrently(
+            {
+                # Validate we won't get type-mismatch errors mid-run
+                "schema": lambda: api.validate_services_db_schema(notion),
+                # Metabase data
+                "metabase": api.fetch_metabase_df if df is None else lambda: df,
+                # Councils lookup by reference code (READ ONLY)
+                "councils": lambda: api.load_councils_by_ref_code(
+                    notion, council_pages
+                ),
+                # Existing service pages by flow_id (TITLE)
+                "services": lambda: api.load_services_by_flow_id(notion),
+            }
+        )
+    df = results["metabase"]
+    councils_by_ref = results["councils"]
+    services_idx = results["services"]
     log.info(f"Metabase rows: {len(df)}")
+    log.info(f"Councils loaded (by Reference Code): {len(councils_by_ref)}")
+    log.info(f"Existing service pages: {len(services_idx)}")
 
+    METRICS.enter_phase("index")
     # Optional: rank services per council by usage desc
     df = api.add_usage_rank_per_council(df)
 
-    # 2) Councils lookup by reference code (READ ONLY)
-    councils_by_ref = api.load_councils_by_ref_code(notion)
-    log.info(f"Councils loaded (by Reference Code): {len(councils_by_ref)}")
+    METRICS.enter_phase("plan")
 
-    # 3) Existing service pages by flow_id (TITLE)
-    services_idx = api.load_services_by_flow_id(notion)
-    log.info(f"Existing service pages: {len(services_idx)}")
+    services_df = api.services_index_df(services_idx)
+    to_create, to_update, to_relate = diff_services(
+        df, councils_by_ref, services_df, hashes
+    )
+    log.info(
+        f"Planned -> create:{len(to_create)} update:{len(to_update)} "
+        f"relate:{len(to_relate)}"
+    )
 
-    to_create = []  # (props, council_page_id)
-    to_update = []  # (page_id, props)
-    to_relate = []  # (page_id, rel_ids)
+    return plan_writes(to_create, to_update, to_relate)
 
-    # Iterate rows
-    for _, r in df.iterrows():
-        row = r.to_dict()
 
-        flow_id = (row.get("flow_id") or "").strip()
-        if not flow_id:
-            continue
+def run_concurrently(tasks: dict[str, Callable[[], Any]]) -> dict[str, Any]:
+    """
+    Runs each task on its own thread and returns {name: result} once all have
+    finished. The first task to fail raises straight away, without waiting
+    for the rest; they run on daemon threads, so they cannot hold up exit.
+    Each task's wall time is logged and recorded, slowest (the critical path)
+    first.
+    """
+    done: queue.Queue = queue.Queue()
 
-        ref = (row.get("reference_code") or "").strip()
-        council = councils_by_ref.get(ref) if ref else None
+    def run(name: str, task: Callable[[], Any]) -> None:
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = task()
+        except BaseException as e:
+            error = e
+        done.put((name, time.perf_counter() - started, result, error))
 
-        council_page_id = council["page_id"] if council else None
-        # For readability only; relation is the real reconciliation
-        council_name_final = (
-            council["name"] if council else (row.get("council_name") or "")
-        ).strip()
+    for name, task in tasks.items():
+        threading.Thread(
+            target=run, args=(name, task), name=f"task-{name}", daemon=True
+        ).start()
 
-        desired_props = api.build_service_props(row, council_name_final)
+    results: dict[str, Any] = {}
+    timings: dict[str, float] = {}
+    for _ in tasks:
+        name, secs, result, error = done.get()
+        METRICS.add_task(name, secs)
+        if error is not None:
+            log.error(f"{name} failed after {secs:.2f}s; not waiting for the rest.")
+            raise error
+        results[name] = result
+        timings[name] = secs
 
-        cur = services_idx.get(flow_id)
+    slowest = sorted(timings.items(), key=lambda kv: kv[1], reverse=True)
+    log.info(
+        "Concurrent -> "
+        + ", ".join(f"{name}={secs:.2f}s" for name, secs in slowest)
+        + f" (critical path: {slowest[0][0]})"
+    )
+    return results
 
-        # Create
-        if cur is None:
-            to_create.append((desired_props, council_page_id))
-            continue
 
-        # Decide if update needed (avoid noisy updates)
-        desired_ref = (
-            desired_props[sync_config.SVC_PROP_REFERENCE_CODE]["rich_text"][0]["text"][
-                "content"
-            ]
-            if desired_props[sync_config.SVC_PROP_REFERENCE_CODE]["rich_text"]
-            else ""
-        )
-        desired_svcname = (
-            desired_props[sync_config.SVC_PROP_SERVICE_NAME]["rich_text"][0]["text"][
-                "content"
-            ]
-            if desired_props[sync_config.SVC_PROP_SERVICE_NAME]["rich_text"]
-            else ""
-        )
-        desired_council_name = (
-            desired_props[sync_config.SVC_PROP_COUNCIL_NAME]["rich_text"][0]["text"][
-                "content"
-            ]
-            if desired_props[sync_config.SVC_PROP_COUNCIL_NAME]["rich_text"]
-            else ""
-        )
-        desired_usage = desired_props[sync_config.SVC_PROP_USAGE]["number"]
-        desired_url = desired_props[sync_config.SVC_PROP_URL]["url"]
-        desired_first_online = (
-            desired_props[sync_config.SVC_PROP_FIRST_ONLINE]["date"]["start"]
-            if desired_props[sync_config.SVC_PROP_FIRST_ONLINE]["date"]
-            else ""
-        )
+def _as_int(col: pd.Series) -> pd.Series:
+    return pd.to_numeric(col, errors="coerce").fillna(0).astype(int)
 
-        changed = False
-        if (cur["reference_code"] or "") != (desired_ref or ""):
-            changed = True
-        if (cur["service_name"] or "") != (desired_svcname or ""):
-            changed = True
-        if (cur["council_name"] or "") != (desired_council_name or ""):
-            changed = True
-        if int(cur["usage"] or 0) != int(desired_usage or 0):
-            changed = True
-        if (cur["url"] or "") != (desired_url or ""):
-            changed = True
-        if (cur["first_online"] or "") != (desired_first_online or ""):
-            changed = True
-
-        if sync_config.ENABLE_USAGE_RANK:
-            desired_rank = desired_props[sync_config.SVC_PROP_USAGE_RANK]["number"]
-            if int(cur.get("usage_rank_council") or 0) != int(desired_rank or 0):
-                changed = True
-
-        if changed:
-            to_update.append((cur["page_id"], desired_props))
-
-        # Relation reconciliation (join by reference_code)
-        desired_rel = {council_page_id} if council_page_id else set()
-        if cur["council_rel_ids"] != desired_rel:
-            to_relate.append((cur["page_id"], list(desired_rel)))
-
-        log.info(
-            f"Planned -> create:{len(to_create)} update:{len(to_update)} "
-            f"relate:{len(to_relate)}"
-        )
 
-    # Apply creates (Services DB only)
-    for props, council_page_id in to_create:
-        created = api.create_service_page(notion, props)
-        api.gentle_sleep()
-        if council_page_id:
-            api.set_relation(
-                notion,
-                created["id"],
-                sync_config.SVC_PROP_COUNCIL_REL,
-                [council_page_id],
-            )
-            api.gentle_sleep()
+def _as_str(col: pd.Series) -> pd.Series:
+    return col.fillna("").astype(str)
 
-    # Apply updates (Services DB only)
-    for page_id, props in to_update:
-        api.update_page(notion, page_id, props)
-        api.gentle_sleep()
 
-    # Apply relation fixes (Services DB only)
-    for page_id, rel_ids in to_relate:
-        api.set_relation(notion, page_id, sync_config.SVC_PROP_COUNCIL_REL, rel_ids)
-        api.gentle_sleep()
+# The Metabase columns build_service_props reads
+PROP_COLUMNS = [
+    "flow_id",
+    "reference_code",
+    "service_name",
+    "usage",
+    "url",
+    "first_online_at",
+    "usage_rank_council",
+]
 
-    log.info("✅ Done. (Councils DB was read-only.)")
+
+def _prop_rows(frame: pd.DataFrame, *extra: str) -> list[dict]:
+    """
+    Row dicts holding only what the props (and the given extra columns) need;
+    converting every merged column would cost more than the diff itself.
+    """
+    cols = [c for c in PROP_COLUMNS if c in frame.columns]
+    return frame[[*cols, "council_name_final", *extra]].to_dict("records")
+
+
+def diff_services(
+    df: pd.DataFrame,
+    councils_by_ref: dict,
+    services_df: pd.DataFrame,
+    hashes: RecordHashes | None = None,
+) -> tuple[list, list, list]:
+    """
+    Diffs the Metabase rows against the existing service pages with column
+    operations over an outer merge on flow_id, and returns:
+      to_create  [(props, council_page_id)]
+      to_update  [(page_id, props)]
+      to_relate  [(page_id, rel_ids)]
+    Notion props are only built for the rows that need a write. With hashes,
+    pages whose record hash is unchanged skip the field comparison, and the
+    hashes of every existing page are updated for the next run.
+    """
+    df = df[df["flow_id"] != ""].copy()
+    df["_row"] = range(len(df))
+
+    # Councils join by reference_code; the relation is the real
+    # reconciliation, the council name is for readability only
+    council_page_ids = df["reference_code"].map(
+        {ref: c.page_id for ref, c in councils_by_ref.items()}
+    )
+    council_names = df["reference_code"].map(
+        {ref: c.name for ref, c in councils_by_ref.items()}
+    )
+    df["council_page_id"] = _as_str(council_page_ids)
+    df["council_name_final"] = (
+        council_names.fillna(df["council_name"]).astype(str).str.strip()
+    )
+
+    merged = df.merge(
+        services_df.add_prefix("cur_"),
+        how="outer",
+        left_on="flow_id",
+        right_on="cur_flow_id",
+        indicator=True,
+    )
+    unmatched = int((merged["_merge"] == "right_only").sum())
+    if unmatched:
+        log.info(f"Service pages with no Metabase row (left as is): {unmatched}")
+    merged = merged[merged["_merge"] != "right_only"].sort_values("_row", kind="stable")
+
+    created = merged[merged["_merge"] == "left_only"]
+    cur = merged[merged["_merge"] == "both"]
+
+    # What each existing page should hold, normalised as it reads back
+    want = pd.DataFrame(
+        {
+            "reference_code": _as_str(cur["reference_code"]),
+            "service_name": _as_str(cur["service_name"]),
+            "council_name": cur["council_name_final"],
+            "usage": _as_int(cur["usage"]),
+            "url": _as_str(cur["url"]),
+            "first_online": _as_str(cur["first_online_at"]),
+            "council_rel_key": cur["council_page_id"],
+        }
+    )
+    if sync_config.ENABLE_USAGE_RANK and "usage_rank_council" in cur.columns:
+        want["usage_rank_council"] = _as_int(cur["usage_rank_council"])
+
+    # A page whose record hash still matches is settled by that one
+    # comparison; only the rest are compared field by field
+    if hashes is not None:
+        digests = row_hashes(want)
+        settled = hashes.unchanged(cur["cur_page_id"], digests, cur["cur_edited"])
+        check, want = cur[~settled], want[~settled]
+        log.info(f"Unchanged by record hash: {int(settled.sum())}/{len(cur)}")
+    else:
+        check = cur
+
+    # Decide if update needed (avoid noisy updates)
+    changed = (
+        (_as_str(check["cur_reference_code"]) != want["reference_code"])
+        | (_as_str(check["cur_service_name"]) != want["service_name"])
+        | (_as_str(check["cur_council_name"]) != want["council_name"])
+        | (_as_int(check["cur_usage"]) != want["usage"])
+        | (_as_str(check["cur_url"]) != want["url"])
+        | (_as_str(check["cur_first_online"]) != want["first_online"])
+    )
+    if "usage_rank_council" in want.columns:
+        changed |= (
+            _as_int(check["cur_usage_rank_council"]) != want["usage_rank_council"]
+        )
+    relink = _as_str(check["cur_council_rel_key"]) != want["council_rel_key"]
+
+    if hashes is not None:
+        # Pages about to be written are remembered without a time
+        written = (changed | relink).reindex(cur.index, fill_value=False)
+        hashes.remember(cur["cur_page_id"], digests, cur["cur_edited"].where(~written))
+
+    to_create = [
+        (
+            api.build_service_props(row, row["council_name_final"]),
+            row["council_page_id"] or None,
+        )
+        for row in _prop_rows(created, "council_page_id")
+    ]
+    to_update = [
+        (row["cur_page_id"], api.build_service_props(row, row["council_name_final"]))
+        for row in _prop_rows(check[changed], "cur_page_id")
+    ]
+    to_relate = [
+        (page_id, [council_page_id] if council_page_id else [])
+        for page_id, council_page_id in zip(
+            check.loc[relink, "cur_page_id"], check.loc[relink, "council_page_id"]
+        )
+    ]
+    return to_create, to_update, to_relate
 
 
 if __name__ == "__main__":
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Path segments that are record ids (Notion UUIDs with or without dashes,
+# numeric ids) are replaced so each endpoint gets one label.
+_ID_SEGMENT = re.compile(
+    r"^(?:[0-9a-f]{32}|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}|\d+)$", re.I
+)
+
+
+# ───────────────────────── Run metrics ──────────────────────────
+def endpoint_label(method: str, url: str) -> str:
+    """
+    PATCH https://api.notion.com/v1/pages/<uuid>
+      -> "PATCH api.notion.com/v1/pages/{id}"
+    """
+    parts = urlsplit(url)
+    path = "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in parts.path.split("/")
+    )
+    return f"{method.upper()} {parts.netloc}{path}"
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)  # non-cumulative, one per bucket
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        out = []
+        running = 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            out.append((f"{bound:g}", running))
+        out.append(("+Inf", self.count))
+        return out
+
+
+class Metrics:
+    """
+    Thread-safe collector for one job run: per-endpoint latency histograms and
+    status counters, retries, time spent sleeping, and per-phase durations.
+
+    Phase durations are the main thread's wall time inside each phase, summed
+    over every time the phase is entered. Requests made from worker threads
+    (prefetching, concurrent writes) overlap with them. Task durations are
+    the wall time of steps run side by side on worker threads (add_task).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.latency: dict[str, Histogram] = {}
+        self.statuses: dict[tuple[str, str], int] = {}
+        self.retries: dict[tuple[str, str], int] = {}
+        self.sleep_secs: dict[str, float] = {}
+        self.phase_secs: dict[str, float] = {}
+        self.task_secs: dict[str, float] = {}
+        self._current: tuple[str, float] | None = None
+        self.profiler: Any | None = None  # set while profiling (profiling.py)
+
+    def observe_request(
+        self, method: str, url: str, status: Any, elapsed_secs: float
+    ) -> None:
+        """
+        status is the HTTP status code, or "error" if no response was received.
+        """
+        label = endpoint_label(method, url)
+        with self._lock:
+            hist = self.latency.get(label)
+            if hist is None:
+                hist = self.latency[label] = Histogram()
+            hist.observe(elapsed_secs)
+            key = (label, str(status))
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def count_retry(self, method: str, url: str, reason: str) -> None:
+        key = (endpoint_label(method, url), reason)
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def add_sleep(self, reason: str, secs: float) -> None:
+        with self._lock:
+            self.sleep_secs[reason] = self.sleep_secs.get(reason, 0.0) + secs
+
+    def add_task(self, name: str, secs: float) -> None:
+        """
+        Records a step that ran alongside others on a worker thread. Tasks
+        overlap, so they are kept apart from the main thread's phases.
+        """
+        with self._lock:
+            self.task_secs[name] = self.task_secs.get(name, 0.0) + secs
+
+    def _add_phase(self, name: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.phase_secs[name] = self.phase_secs.get(name, 0.0) + elapsed
+        if self.profiler is not None:
+            self.profiler.stop(name)
+
+    def _start_phase(self, name: str) -> float:
+        if self.profiler is not None:
+            self.profiler.start(name)
+        return time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = self._start_phase(name)
+        try:
+            yield
+        finally:
+            self._add_phase(name, started)
+
+    def enter_phase(self, name: str) -> None:
+        """
+        Ends the current enter_phase() section, if any, and starts timing name.
+        For sequential steps in a loop body, where nesting every step in a
+        `with` block would be awkward.
+        """
+        self.end_phase()
+        self._current = (name, self._start_phase(name))
+
+    def end_phase(self) -> None:
+        if self._current is not None:
+            self._add_phase(*self._current)
+            self._current = None
+
+    def timed_iter(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """
+        Yields from items, counting the time spent waiting for each one as
+        phase name (e.g. blocking on the next streamed Notion batch).
+        """
+        iterator = iter(items)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def phase_report(self) -> str:
+        with self._lock:
+            return ", ".join(f"{k}={v:.2f}s" for k, v in self.phase_secs.items())
+
+    def to_dict(self, job: str) -> dict[str, Any]:
+        with self._lock:
+            endpoints: dict[str, dict[str, Any]] = {}
+            for label, hist in sorted(self.latency.items()):
+                endpoints[label] = {
+                    "requests": hist.count,
+                    "total_secs": round(hist.total, 4),
+                    "mean_secs": round(hist.total / hist.count, 4),
+                    "max_secs": round(hist.max, 4),
+                    "buckets": dict(hist.cumulative()),
+                    "statuses": {},
+                    "retries": {},
+                }
+            for (label, status), n in sorted(self.statuses.items()):
+                endpoints[label]["statuses"][status] = n
+            for (label, reason), n in sorted(self.retries.items()):
+                endpoints[label]["retries"][reason] = n
+            return {
+                "job": job,
+                "started_at": self.started_at.isoformat(),
+                "duration_secs": round(time.perf_counter() - self._started, 3),
+                "phases_secs": {k: round(v, 3) for k, v in self.phase_secs.items()},
+                "tasks_secs": {k: round(v, 3) for k, v in self.task_secs.items()},
+                "sleep_secs": {k: round(v, 3) for k, v in self.sleep_secs.items()},
+                "endpoints": endpoints,
+            }
+
+    def to_prometheus(self, job: str) -> str:
+        """
+        Prometheus text exposition format, for node_exporter's textfile collector.
+        """
+        lines: list[str] = []
+
+        def family(name: str, mtype: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {mtype}")
+
+        def sample(name: str, labels: dict[str, str], value: float) -> None:
+            rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{rendered}}} {value}")
+
+        with self._lock:
+            name = "planx_http_request_duration_seconds"
+            family(name, "histogram", "HTTP request latency by endpoint.")
+            for label, hist in sorted(self.latency.items()):
+                base = {"job": job, "endpoint": label}
+                for le, n in hist.cumulative():
+                    sample(f"{name}_bucket", {**base, "le": le}, n)
+                sample(f"{name}_sum", base, hist.total)
+                sample(f"{name}_count", base, hist.count)
+
+            name = "planx_http_responses_total"
+            family(name, "counter", "HTTP responses by endpoint and status.")
+            for (label, status), n in sorted(self.statuses.items()):
+                sample(name, {"job": job, "endpoint": label, "status": status}, n)
+
+            name = "planx_http_retries_total"
+            family(name, "counter", "Retried HTTP requests by endpoint and reason.")
+            for (label, reason), n in sorted(self.retries.items()):
+                sample(name, {"job": job, "endpoint": label, "reason": reason}, n)
+
+            name = "planx_sleep_seconds_total"
+            family(name, "counter", "Time spent sleeping, by reason.")
+            for reason, secs in sorted(self.sleep_secs.items()):
+                sample(name, {"job": job, "reason": reason}, secs)
+
+            name = "planx_phase_duration_seconds"
+            family(name, "gauge", "Wall time spent in each sync phase.")
+            for phase, secs in self.phase_secs.items():
+                sample(name, {"job": job, "phase": phase}, secs)
+
+            name = "planx_task_duration_seconds"
+            family(name, "gauge", "Wall time of steps run concurrently.")
+            for task, secs in self.task_secs.items():
+                sample(name, {"job": job, "task": task}, secs)
+
+        name = "planx_run_duration_seconds"
+        family(name, "gauge", "Wall time of the whole run.")
+        sample(name, {"job": job}, time.perf_counter() - self._started)
+
+        name = "planx_run_finished_timestamp_seconds"
+        family(name, "gauge", "Unix time the run finished.")
+        sample(name, {"job": job}, time.time())
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, metrics_dir: str, job: str) -> list[str]:
+        """
+        Writes <job>.json and <job>.prom under metrics_dir (atomically, so the
+        textfile collector never scrapes a partial file). Returns the paths.
+        """
+        os.makedirs(metrics_dir, exist_ok=True)
+        outputs = [
+            (f"{job}.json", json.dumps(self.to_dict(job), indent=2)),
+            (f"{job}.prom", self.to_prometheus(job)),
+        ]
+        paths = []
+        for filename, content in outputs:
+            path = os.path.join(metrics_dir, filename)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            paths.append(path)
+        return paths
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# One collector per job process
+METRICS = Metrics()
+
+
+def write_metrics(metrics_dir: str | None, job: str) -> None:
+    if not metrics_dir:
+        return
+    # A run that failed mid-phase still reports the time spent in it
+    METRICS.end_phase()
+    paths = METRICS.write_reports(metrics_dir, job)
+    log.info(f"Metrics written: {', '.join(paths)}")
+
+
+# ───────────────────────── httpx instrumentation ──────────────────
+def _observe(request: httpx.Request, status: int | str, started: float) -> None:
+    METRICS.observe_request(
+        request.method, str(request.url), status, time.perf_counter() - started
+    )
+
+
+class MetricsTransport(httpx.BaseTransport):
+    """
+    Wraps the transport under notion_client's httpx.Client so every Notion
+    call is recorded. Latency is measured to the response headers; the
+    client reads the body afterwards.
+    """
+
+    def __init__(self, wrapped: httpx.BaseTransport | None = None) -> None:
+        self._wrapped = wrapped or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = self._wrapped.handle_request(request)
+        except Exception:
+            _observe(request, "error", started)
+            raise
+        _observe(request, response.status_code, started)
+        return response
+
+    def close(self) -> None:
+        self._wrapped.close()
+
+
+class AsyncMetricsTransport(httpx.AsyncBaseTransport):
+    """
+    MetricsTransport for notion_client's AsyncClient.
+    """
+
+    def __init__(self, wrapped: httpx.AsyncBaseTransport | None = None) -> None:
+        self._wrapped = wrapped or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self._wrapped.handle_async_request(request)
+        except Exception:
+            _observe(request, "error", started)
+            raise
+        _observe(request, response.status_code, started)
+        return response
+
+    async def aclose(self) -> None:
+        await self._wrapped.aclose()
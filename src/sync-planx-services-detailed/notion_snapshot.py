@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable
+
+import sync_config
+from state_store import load_state, save_state
+
+log = logging.getLogger(__name__)
+
+# 2: records are the dataclasses' fields (page_id, usage_rank_council always set)
+# 3: service records carry the page's last_edited_time
+SNAPSHOT_VERSION = 3
+# Notion gives every database's title property this id
+TITLE_PROPERTY_ID = "title"
+
+
+# ───────────────────────── Incremental DB snapshots ───────────────
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _record_dict(record: Any) -> dict | None:
+    return asdict(record) if record is not None else None
+
+
+def _is_removed(page: dict) -> bool:
+    return bool(page.get("archived") or page.get("in_trash"))
+
+
+def _choose_mode(state: dict | None, database_id: str) -> tuple[str, str]:
+    if state is None:
+        return "full", "no snapshot yet"
+    if state.get("version") != SNAPSHOT_VERSION:
+        return "full", "snapshot version changed"
+    if state.get("database_id") != database_id:
+        return "full", "snapshot is for a different database"
+    if not state.get("watermark"):
+        return "full", "snapshot has no watermark"
+    if sync_config.FULL_RESCAN:
+        return "full", "FULL_RESCAN requested"
+
+    last_full = state.get("last_full_scan_at")
+    max_age = timedelta(days=sync_config.FULL_RESCAN_INTERVAL_DAYS)
+    now = datetime.now(timezone.utc)
+    if not last_full or now - datetime.fromisoformat(last_full) > max_age:
+        return "full", f"last full scan older than {max_age.days} days"
+
+    return "incremental", f"pages edited since {state['watermark']}"
+
+
+def _sweep_due(state: dict) -> tuple[bool, str]:
+    """
+    Whether an incremental read also lists every live page id to find pages
+    archived or deleted since the snapshot. That costs as many requests as a
+    full scan, so it only runs every REMOVAL_SWEEP_INTERVAL_DAYS.
+    """
+    last_sweep = state.get("last_sweep_at") or state.get("last_full_scan_at")
+    max_age = timedelta(days=sync_config.REMOVAL_SWEEP_INTERVAL_DAYS)
+    if not last_sweep:
+        return True, "no sweep recorded yet"
+    if datetime.now(timezone.utc) - datetime.fromisoformat(last_sweep) >= max_age:
+        return True, f"last sweep older than {max_age.days} days"
+    return False, f"last sweep at {last_sweep}"
+
+
+def _report_drift(name: str, previous: dict, current: dict, watermark: str):
+    """
+    Compares the stored snapshot with a fresh full scan, counting only what an
+    incremental query could never have picked up: records edited before the
+    watermark that are missing or different, and pages that have disappeared.
+    """
+    unseen = 0
+    for page_id, entry in current.items():
+        if entry["edited"] >= watermark:
+            continue
+        old = previous.get(page_id)
+        if old is None or old["record"] != entry["record"]:
+            unseen += 1
+    removed = len(previous.keys() - current.keys())
+    status = "OK" if not unseen and not removed else "DRIFT"
+    log.info(
+        f"[CONSISTENCY] {name} {status}: snapshot={len(previous)} "
+        f"notion={len(current)} unseen_edits={unseen} removed={removed}"
+    )
+
+
+def load_db_records(
+    paginate: Callable[..., Iterable[dict]],
+    database_id: str,
+    name: str,
+    to_record: Callable[[dict], Any],
+    record_type: type,
+) -> dict[str, Any]:
+    """
+    Returns { page_id: record } for every page where to_record(page) is not None.
+    paginate(database_id, **query_kwargs) must yield the database's pages, and
+    each is decoded by to_record as it arrives. Records are record_type
+    dataclasses; the snapshot stores them as dicts.
+
+    With INCREMENTAL on, the records are persisted under SYNC_STATE_DIR and the
+    next run only queries pages whose last_edited_time is on or after the stored
+    watermark, merging them into the snapshot. Pages archived or deleted
+    since then are dropped by a title-only listing of the live page ids made
+    every REMOVAL_SWEEP_INTERVAL_DAYS. A full scan runs on the first run, on
+    FULL_RESCAN, or every FULL_RESCAN_INTERVAL_DAYS, and reports any drift
+    between the snapshot and Notion.
+    """
+    if not sync_config.INCREMENTAL:
+        records: dict[str, Any] = {}
+        for page in paginate(database_id):
+            record = to_record(page)
+            if record is not None:
+                records[page["id"]] = record
+        return records
+
+    state = load_state(sync_config.STATE_DIR, name)
+    mode, reason = _choose_mode(state, database_id)
+    log.info(f"{name} read mode: {mode} ({reason})")
+
+    entries: dict[str, dict] = {}
+    last_full_scan_at = state.get("last_full_scan_at") if state else None
+    last_sweep_at = state.get("last_sweep_at") if state else None
+
+    if mode == "full":
+        for page in paginate(database_id):
+            if _is_removed(page):
+                continue
+            entries[page["id"]] = {
+                "edited": page.get("last_edited_time") or "",
+                "record": _record_dict(to_record(page)),
+            }
+        # Drift is only meaningful against a snapshot in the same format
+        if (
+            state
+            and state.get("watermark")
+            and state.get("version") == SNAPSHOT_VERSION
+        ):
+            _report_drift(name, state.get("entries") or {}, entries, state["watermark"])
+        last_full_scan_at = last_sweep_at = _utc_now()
+    else:
+        entries = dict(state.get("entries") or {})
+        edited_filter = {
+            "timestamp": "last_edited_time",
+            "last_edited_time": {"on_or_after": state["watermark"]},
+        }
+        changed = 0
+        for page in paginate(database_id, filter=edited_filter):
+            if _is_removed(page):
+                entries.pop(page["id"], None)
+                continue
+            entries[page["id"]] = {
+                "edited": page.get("last_edited_time") or "",
+                "record": _record_dict(to_record(page)),
+            }
+            changed += 1
+        log.info(f"{name}: {changed} pages edited since last run")
+
+        # Archived and deleted pages drop out of queries rather than showing
+        # up as edited; only a listing of the live page ids (title only, so
+        # each response stays small) finds them
+        sweep, sweep_reason = _sweep_due(state)
+        log.info(
+            f"{name} removal sweep: {'running' if sweep else 'skipped'} "
+            f"({sweep_reason})"
+        )
+        if sweep:
+            swept_at = _utc_now()
+            live = {
+                page["id"]
+                for page in paginate(database_id, filter_properties=[TITLE_PROPERTY_ID])
+                if not _is_removed(page)
+            }
+            removed = entries.keys() - live
+            for page_id in removed:
+                del entries[page_id]
+            log.info(f"{name}: {len(removed)} pages archived or deleted")
+            last_sweep_at = swept_at
+
+    watermark = max(
+        (e["edited"] for e in entries.values() if e["edited"]),
+        default=state.get("watermark") if state else None,
+    )
+    save_state(
+        sync_config.STATE_DIR,
+        name,
+        {
+            "version": SNAPSHOT_VERSION,
+            "database_id": database_id,
+            "watermark": watermark,
+            "last_full_scan_at": last_full_scan_at,
+            "last_sweep_at": last_sweep_at,
+            "saved_at": _utc_now(),
+            "entries": entries,
+        },
+    )
+
+    return {
+        page_id: record_type(**e["record"])
+        for page_id, e in entries.items()
+        if e["record"] is not None
+    }
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+
+PLAN_VERSION = 1
+
+
+# ───────────────────────── Plan files ──────────────────────────────
+def _open(path: str, mode: str, compressed: bool):
+    if compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_plan(path: str, job: str, context: dict, ops: list[dict]) -> dict:
+    """
+    Writes a plan: every Services DB write a run would make, as the same op
+    dicts the journal records (see async_apply.plan_writes). Compact JSON,
+    gzipped if path ends in .gz.
+    """
+    plan = {
+        "version": PLAN_VERSION,
+        "job": job,
+        "context": context,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "ops": ops,
+    }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _open(f"{path}.tmp", "w", path.endswith(".gz")) as f:
+        json.dump(plan, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+    return plan
+
+
+def read_plan(path: str, job: str, context: dict) -> dict:
+    """
+    Loads a plan, refusing one made by another job, another plan version or a
+    differently configured run.
+    """
+    with _open(path, "r", path.endswith(".gz")) as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(
+            f"Plan {path} has version {plan.get('version')}, expected {PLAN_VERSION}."
+        )
+    if plan.get("job") != job:
+        raise ValueError(f"Plan {path} was made by {plan.get('job')}, not {job}.")
+    if plan.get("context") != context:
+        raise ValueError(
+            f"Plan {path} was made with a different configuration: "
+            f"{plan.get('context')} != {context}"
+        )
+    return plan
+
+
+def shard_ops(ops: list[dict], shard_index: int, shard_count: int) -> list[dict]:
+    """
+    This worker's share of the ops, assigned by a stable hash of each op's
+    key so every write to a page lands in the same shard.
+    """
+    if shard_count <= 1:
+        return ops
+    return [
+        op
+        for op in ops
+        if zlib.crc32(op["key"].encode("utf-8")) % shard_count == shard_index
+    ]
+
+
+def summarize_ops(ops: list[dict]) -> str:
+    kinds = Counter(op["key"].split(":", 1)[0] for op in ops)
+    detail = ", ".join(f"{kind}={n}" for kind, n in sorted(kinds.items()))
+    return f"{len(ops)} writes ({detail})" if ops else "0 writes"
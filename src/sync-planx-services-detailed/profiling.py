@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+# Frames kept per traced allocation; one is enough to group by source line
+TRACE_FRAMES = 1
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+# Collapsed stacks drop call paths below this share of the phase's time
+STACK_PRUNE_FRACTION = 1e-4
+MAX_STACK_DEPTH = 64
+
+Func = tuple[str, int, str]
+
+
+# ───────────────────────── Per-phase profiling ────────────────────
+class PhaseProfiler:
+    """
+    Profiles each METRICS phase on its own, for the thread that created it:
+    one cProfile.Profile per phase name (enabled only while inside the phase,
+    so repeated entries accumulate), CPU and wall time, and tracemalloc's
+    peak with the largest live allocations.
+
+    A phase entered inside another pauses the outer one's profile, so each
+    function call is counted once. tracemalloc sees every thread, so peaks
+    include memory held by worker threads during the phase.
+    """
+
+    def __init__(self) -> None:
+        self._thread = threading.get_ident()
+        self.profiles: dict[str, cProfile.Profile] = {}
+        self.phases: dict[str, dict[str, Any]] = {}
+        self.snapshots: dict[str, tracemalloc.Snapshot] = {}
+        # (name, wall start, cpu start, peak before) of each open phase
+        self._stack: list[tuple[str, float, float, int]] = []
+
+    def _fold_peak(self) -> None:
+        """
+        Credits the traced peak since the last reset to every open phase.
+        """
+        peak = tracemalloc.get_traced_memory()[1]
+        for name, _, _, _ in self._stack:
+            phase = self.phases[name]
+            phase["peak_bytes"] = max(phase["peak_bytes"], peak)
+
+    def start(self, name: str) -> None:
+        if threading.get_ident() != self._thread:
+            return
+        if self._stack:
+            self.profiles[self._stack[-1][0]].disable()
+            self._fold_peak()
+        tracemalloc.reset_peak()
+        phase = self.phases.setdefault(
+            name, {"entries": 0, "wall_secs": 0.0, "cpu_secs": 0.0, "peak_bytes": 0}
+        )
+        self._stack.append(
+            (name, time.perf_counter(), time.thread_time(), phase["peak_bytes"])
+        )
+        self.profiles.setdefault(name, cProfile.Profile()).enable()
+
+    def stop(self, name: str) -> None:
+        if threading.get_ident() != self._thread:
+            return
+        names = [entry[0] for entry in self._stack]
+        if name not in names:
+            return
+        index = len(names) - 1 - names[::-1].index(name)
+        if index == len(names) - 1:
+            self.profiles[name].disable()
+
+        phase = self.phases[name]
+        self._fold_peak()
+        _, wall_started, cpu_started, previous_peak = self._stack.pop(index)
+        phase["entries"] += 1
+        phase["wall_secs"] += time.perf_counter() - wall_started
+        phase["cpu_secs"] += time.thread_time() - cpu_started
+        if phase["peak_bytes"] > previous_peak or name not in self.snapshots:
+            self.snapshots[name] = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            )
+
+        tracemalloc.reset_peak()
+        if index == len(names) - 1 and self._stack:
+            self.profiles[self._stack[-1][0]].enable()
+
+    def close(self) -> None:
+        """
+        Stops profiling any phase still open (e.g. after an error).
+        """
+        while self._stack:
+            self.stop(self._stack[-1][0])
+
+    def top_allocations(self, name: str) -> list[dict[str, Any]]:
+        snapshot = self.snapshots.get(name)
+        if snapshot is None:
+            return []
+        return [
+            {
+                "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "kib": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+        ]
+
+    def phase_report(self, name: str) -> str:
+        phase = self.phases[name]
+        out = io.StringIO()
+        out.write(
+            f"phase: {name}\n"
+            f"entries: {phase['entries']}  wall: {phase['wall_secs']:.3f}s  "
+            f"cpu: {phase['cpu_secs']:.3f}s  "
+            f"peak traced memory: {phase['peak_bytes'] / 2**20:.1f} MiB\n\n"
+            "Top functions by cumulative time (this thread only):\n"
+        )
+        stats = pstats.Stats(self.profiles[name], stream=out)
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        out.write(
+            "Top live allocations at the end of the entry with the highest peak:\n"
+        )
+        for alloc in self.top_allocations(name):
+            out.write(
+                f"  {alloc['kib']:>10.1f} KiB {alloc['count']:>8} blocks  "
+                f"{alloc['where']}\n"
+            )
+        return out.getvalue()
+
+    def write(self, run_dir: str, job: str, started_at: datetime) -> None:
+        """
+        Writes, for each phase, <phase>.pstats (load with pstats or snakeviz),
+        <phase>.collapsed (for flamegraph.pl or speedscope) and <phase>.txt,
+        plus summary.json for the whole run.
+        """
+        os.makedirs(run_dir, exist_ok=True)
+        summary: dict[str, Any] = {
+            "job": job,
+            "started_at": started_at.isoformat(),
+            "phases": {},
+        }
+        for name, phase in self.phases.items():
+            profile = self.profiles[name]
+            profile.dump_stats(os.path.join(run_dir, f"{name}.pstats"))
+            stacks = collapsed_stacks(pstats.Stats(profile))
+            with open(
+                os.path.join(run_dir, f"{name}.collapsed"), "w", encoding="utf-8"
+            ) as f:
+                f.writelines(f"{line}\n" for line in stacks)
+            with open(os.path.join(run_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+                f.write(self.phase_report(name))
+            summary["phases"][name] = {
+                "entries": phase["entries"],
+                "wall_secs": round(phase["wall_secs"], 3),
+                "cpu_secs": round(phase["cpu_secs"], 3),
+                "peak_mib": round(phase["peak_bytes"] / 2**20, 2),
+                "top_allocations": self.top_allocations(name)[:5],
+            }
+        with open(os.path.join(run_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+def _frame_label(func: Func) -> str:
+    filename, lineno, name = func
+    if filename == "~":  # built-in
+        label = name
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{lineno})"
+    return label.replace(";", ":")
+
+
+def collapsed_stacks(stats: pstats.Stats) -> list[str]:
+    """
+    Rebuilds "frame;frame;... microseconds" lines from a profile's caller
+    graph. cProfile keeps time per caller -> callee edge, not per full stack,
+    so a function reached along several paths has its time split between
+    them in proportion to how much of it each caller accounted for. Recursive
+    calls are folded into the first frame of the function on the path.
+    """
+    entries = stats.stats  # type: ignore[attr-defined]
+    callees: dict[Func, dict[Func, float]] = {}
+    pending: list[tuple[Func, tuple[Func, ...], float]] = []
+    for func, (calls, _, _, cumulative, callers) in entries.items():
+        # Calls from outside the profile (the phase's own code) have no
+        # caller entry; they root the stacks
+        external = calls - sum(
+            edge[0] for caller, edge in callers.items() if caller != func
+        )
+        if external > 0 and calls:
+            pending.append((func, (func,), cumulative * external / calls))
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+
+    total = sum(secs for _, _, secs in pending)
+    threshold = max(total * STACK_PRUNE_FRACTION, 1e-6)
+    lines: dict[str, float] = {}
+    while pending:
+        func, path, secs = pending.pop()
+        cumulative = entries[func][3]
+        scale = secs / cumulative if cumulative else 0.0
+        own = secs
+        if len(path) < MAX_STACK_DEPTH:
+            for callee, edge_secs in callees.get(func, {}).items():
+                child = edge_secs * scale
+                if callee in path or child < threshold:
+                    continue
+                own -= child
+                pending.append((callee, path + (callee,), child))
+        if own >= threshold:
+            key = ";".join(_frame_label(frame) for frame in path)
+            lines[key] = lines.get(key, 0.0) + own
+
+    return [
+        f"{key} {round(secs * 1e6)}"
+        for key, secs in sorted(lines.items())
+        if round(secs * 1e6) > 0
+    ]
+
+
+@contextmanager
+def profile_run(enabled: bool, profile_dir: str, job: str) -> Iterator[None]:
+    """
+    With enabled set, profiles every METRICS phase entered inside the block
+    and writes the artifacts to <profile_dir>/<job>-<UTC timestamp>, also if
+    the block raises.
+    """
+    if not enabled:
+        yield
+        return
+
+    started_at = datetime.now(timezone.utc)
+    run_dir = os.path.join(profile_dir, f"{job}-{started_at:%Y%m%dT%H%M%SZ}")
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACE_FRAMES)
+    profiler = PhaseProfiler()
+    METRICS.profiler = profiler
+    try:
+        yield
+    finally:
+        # A phase left open by an error is still profiled up to here
+        METRICS.end_phase()
+        METRICS.profiler = None
+        profiler.close()
+        if started_tracing:
+            tracemalloc.stop()
+        profiler.write(run_dir, job, started_at)
+        log.info(f"Profile written: {run_dir}")
+        for name, phase in profiler.phases.items():
+            log.info(
+                f"  {name}: wall={phase['wall_secs']:.2f}s "
+                f"cpu={phase['cpu_secs']:.2f}s "
+                f"peak={phase['peak_bytes'] / 2**20:.1f}MiB"
+            )
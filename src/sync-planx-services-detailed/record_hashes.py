@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import logging
+
+import pandas as pd
+
+from state_store import load_state, save_state
+
+log = logging.getLogger(__name__)
+
+RECORD_HASHES_VERSION = 1
+
+
+# ───────────────────────── Per-record content hashes ──────────────
+def row_hashes(frame: pd.DataFrame) -> pd.Series:
+    """
+    One hash per row over the frame's (already normalised) columns, as hex
+    strings so they can be stored as JSON.
+    """
+    return pd.util.hash_pandas_object(frame, index=False).map("{:016x}".format)
+
+
+class RecordHashes:
+    """
+    For each service page: the hash of the properties and relation this job
+    last wanted it to have, and the page's last_edited_time when it was seen
+    to hold them. While both still match, the page needs no write and its
+    properties are not compared one by one.
+
+    Pages planned for a write are stored without a time (their new one is
+    not known until Notion reports it), so the next run compares them field
+    by field once and stores the time then. A store saved with a different
+    context is ignored. With no state dir nothing is loaded or saved.
+
+    This only saves the per-field comparison: Metabase and both Notion DBs
+    are still read in full to know what each page should hold. The methods
+    take Series, one entry per page, since the diff works column by column.
+    """
+
+    def __init__(self, state_dir: str | None, name: str, context: dict):
+        self.state_dir = state_dir
+        self.name = name
+        self.context = context
+        state = load_state(state_dir, name)
+        if (
+            state is None
+            or state.get("version") != RECORD_HASHES_VERSION
+            or state.get("context") != context
+        ):
+            state = {}
+        pages = state.get("pages") or {}
+        self._hash = {page_id: entry[0] for page_id, entry in pages.items()}
+        self._edited = {page_id: entry[1] for page_id, entry in pages.items()}
+        self.pages: dict[str, list] = {}
+
+    def unchanged(
+        self, page_ids: pd.Series, hashes: pd.Series, edited: pd.Series
+    ) -> pd.Series:
+        """
+        True where a page's stored hash equals hashes and it has not been
+        edited since it was seen to hold those values.
+        """
+        same_hash = page_ids.map(self._hash) == hashes
+        same_time = page_ids.map(self._edited) == edited
+        return same_hash & same_time
+
+    def remember(
+        self, page_ids: pd.Series, hashes: pd.Series, edited: pd.Series
+    ) -> None:
+        """
+        edited is the page's last_edited_time if it already holds the hashed
+        values, or None if it is about to be written.
+        """
+        self.pages.update(
+            (page_id, [digest, time if isinstance(time, str) else None])
+            for page_id, digest, time in zip(page_ids, hashes, edited)
+        )
+
+    def save(self) -> None:
+        """
+        Stores this run's hashes, replacing the previous ones: every run
+        diffs every existing page, so pages since deleted drop out.
+        """
+        if not self.state_dir:
+            return
+        save_state(
+            self.state_dir,
+            self.name,
+            {
+                "version": RECORD_HASHES_VERSION,
+                "context": self.context,
+                "pages": self.pages,
+            },
+        )
+        log.info(f"Record hashes saved: {len(self.pages)} pages")
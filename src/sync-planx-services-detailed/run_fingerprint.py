@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pandas as pd
+from notion_client import Client
+
+import sync_config
+from state_store import load_state, save_state
+
+log = logging.getLogger(__name__)
+
+FINGERPRINT_VERSION = 1
+STATE_NAME = f"fingerprint-{sync_config.METRICS_JOB}"
+# Notion keeps last_edited_time to the minute, so an edit made in the same
+# minute as the newest recorded one would not show up. A target fingerprint
+# is only trusted once that newest edit is at least this old.
+SETTLE_SECS = 120
+
+
+# ───────────────────────── Run fingerprints ───────────────
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """
+    sha256 over the column names and pandas' per-row hashes, so the same
+    Metabase rows in the same order always give the same fingerprint.
+    """
+    digest = hashlib.sha256(json.dumps(list(df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _latest_edit(notion: Client, database_id: str) -> list[str] | None:
+    resp = notion.databases.query(
+        database_id=database_id,
+        page_size=1,
+        sorts=[{"timestamp": "last_edited_time", "direction": "descending"}],
+    )
+    results = resp.get("results") or []
+    if not results:
+        return None
+    return [results[0]["id"], results[0].get("last_edited_time") or ""]
+
+
+def target_fingerprint(notion: Client) -> str | None:
+    """
+    Fingerprint of the Services and Councils DBs as they stand, from one query
+    each: the id and last_edited_time of each DB's most recently edited page.
+    Any later edit, by this job or by hand, puts a newer page on top and
+    changes it. Deleting or archiving an older page does not, which is why a
+    skip is only trusted until the next full run is due.
+
+    Returns None if either DB's newest edit is under SETTLE_SECS old.
+    """
+    latest: list[Any] = []
+    for database_id in (sync_config.SERVICES_DB_ID, sync_config.COUNCILS_DB_ID):
+        edit = _latest_edit(notion, database_id)
+        if edit is not None:
+            if not edit[1]:
+                return None
+            edited_at = datetime.fromisoformat(edit[1].replace("Z", "+00:00"))
+            if _utc_now() - edited_at < timedelta(seconds=SETTLE_SECS):
+                return None
+        latest.append(edit)
+    return hashlib.sha256(json.dumps(latest).encode("utf-8")).hexdigest()
+
+
+def check_unchanged(notion: Client, context: dict, source: str) -> tuple[bool, str]:
+    """
+    Returns (unchanged, reason). unchanged is True only if the last recorded
+    run had the same context and Metabase fingerprint, neither Notion DB has
+    been edited since, and no full run is due (FULL_RESCAN or
+    FULL_RESCAN_INTERVAL_DAYS). Notion is only queried if everything else
+    matches.
+    """
+    state = load_state(sync_config.STATE_DIR, STATE_NAME)
+    if state is None:
+        return False, "no fingerprints recorded yet"
+    if state.get("version") != FINGERPRINT_VERSION:
+        return False, "fingerprint version changed"
+    if state.get("context") != context:
+        return False, "configuration changed"
+    if sync_config.FULL_RESCAN:
+        return False, "FULL_RESCAN requested"
+
+    recorded_at = state.get("recorded_at")
+    max_age = timedelta(days=sync_config.FULL_RESCAN_INTERVAL_DAYS)
+    if not recorded_at or _utc_now() - datetime.fromisoformat(recorded_at) > max_age:
+        return False, f"last full run older than {max_age.days} days"
+    if state.get("source") != source:
+        return False, "Metabase data changed"
+    if not state.get("target"):
+        return False, "Notion was still settling after the last run"
+    if state["target"] != target_fingerprint(notion):
+        return False, "Notion edited since the last run"
+
+    return True, f"Metabase and Notion unchanged since {recorded_at}"
+
+
+def record_run(notion: Client, context: dict, source: str):
+    """
+    Records the fingerprints of a completed run: the Metabase data it synced
+    from and both Notion DBs as it left them.
+    """
+    try:
+        target = target_fingerprint(notion)
+    except Exception as e:
+        log.warning(f"Could not fingerprint Notion: {e}")
+        target = None
+    save_state(
+        sync_config.STATE_DIR,
+        STATE_NAME,
+        {
+            "version": FINGERPRINT_VERSION,
+            "context": context,
+            "source": source,
+            "target": target,
+            "recorded_at": _utc_now().isoformat(),
+        },
+    )
+    if target is None:
+        log.info("Notion was edited moments ago; the next run will not skip.")
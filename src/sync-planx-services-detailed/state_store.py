@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+
+# ───────────────────────── Local state files ──────────────────────
+def state_path(state_dir: str, name: str) -> str:
+    return os.path.join(state_dir, f"{name}.json")
+
+
+def load_state(state_dir: str | None, name: str) -> dict | None:
+    """
+    Returns the JSON document stored under name, or None if there is no state
+    directory, no file yet, or the file cannot be read.
+    """
+    if not state_dir:
+        return None
+    path = state_path(state_dir, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable state file {path}: {e}")
+        return None
+
+
+def save_state(state_dir: str, name: str, data: dict) -> None:
+    """
+    Writes the document atomically, so an interrupted run never leaves a
+    half-written state file behind.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    path = state_path(state_dir, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
@@ -1,18 +1,25 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load .env FIRST (before importing sync_config or api_helpers)
 load_dotenv()
 
 # ───────────────────────── Metabase ─────────────────────────
-METABASE_URL = "https://metabase.editor.planx.uk"
+METABASE_URL = os.environ.get("METABASE_URL", "https://metabase.editor.planx.uk")
 METABASE_API_KEY = os.environ.get("METABASE_API_KEY")
 CARD_ID = 1239
 TIMEOUT_SECONDS = 60
+# "json" loads the card's JSON export in one go; "csv" streams its CSV export
+# and decodes it METABASE_CHUNK_ROWS rows at a time (see api_helpers.py).
+METABASE_EXPORT = os.environ.get("METABASE_EXPORT", "json").strip().lower()
+METABASE_CHUNK_ROWS = int(os.environ.get("METABASE_CHUNK_ROWS", "50000"))
 
 # ───────────────────────── Notion ───────────────────────────
 # Read from env (recommended)
 NOTION_TOKEN = os.environ.get("NOTION_TOKEN")
+# Overridable to point the job at a local stand-in (benchmarks/)
+NOTION_BASE_URL = os.environ.get("NOTION_BASE_URL", "https://api.notion.com")
 
 # DB IDs (set these)
 COUNCILS_DB_ID = "27c35d469ad180aaacf4d8beb0ddb20c"
@@ -20,7 +27,77 @@ SERVICES_DB_ID = "2e235d469ad18014a673cd7719bb400a"  # Live Services - Detailed
 
 # Pagination / throttling
 PAGE_SIZE = 100
-GENTLE_DELAY_SECONDS = 0.15
+
+# Writes are applied by NOTION_WRITE_CONCURRENCY workers sharing one rate
+# limit matched to Notion's ~3 requests/second (see async_apply.py).
+NOTION_WRITES_PER_SECOND = float(os.environ.get("NOTION_WRITES_PER_SECOND", "3"))
+NOTION_WRITE_BURST = int(os.environ.get("NOTION_WRITE_BURST", "5"))
+NOTION_WRITE_CONCURRENCY = int(os.environ.get("NOTION_WRITE_CONCURRENCY", "4"))
+
+# The write rate adapts (see api_helpers.AdaptiveRate): it starts at
+# NOTION_WRITES_PER_SECOND, halves on every 429 and, while Notion keeps
+# accepting requests, climbs quickly back to the rate that drew the 429 and
+# then creeps past it, staying within these bounds. The ceiling defaults to
+# Notion's documented average of 3 requests/second; raise it if the
+# integration is allowed more (it is never below the starting rate). 429s,
+# 5xx responses and connection errors are retried up to NOTION_MAX_ATTEMPTS
+# times in all, honouring Retry-After.
+NOTION_MIN_WRITES_PER_SECOND = float(
+    os.environ.get("NOTION_MIN_WRITES_PER_SECOND", "0.5")
+)
+NOTION_MAX_WRITES_PER_SECOND = float(
+    os.environ.get("NOTION_MAX_WRITES_PER_SECOND", "3")
+)
+NOTION_RATE_INCREASE = 0.05  # writes/second added per successful request
+# Share of the gap back to the last throttled rate closed per success
+NOTION_RATE_RECOVERY = 0.2
+NOTION_MAX_ATTEMPTS = int(os.environ.get("NOTION_MAX_ATTEMPTS", "7"))
+RETRY_BASE_DELAY_SECS = 1.0
+RETRY_MAX_DELAY_SECS = 30.0
+
+# ───────────────────────── Incremental reads ────────────────
+# With INCREMENTAL on, each DB is snapshotted under SYNC_STATE_DIR and later
+# runs only read pages edited since the last one (see notion_snapshot.py).
+TRUTHY = {"1", "true", "yes", "y", "on"}
+STATE_DIR = os.environ.get("SYNC_STATE_DIR") or None
+INCREMENTAL = os.environ.get("INCREMENTAL", "").strip().lower() in TRUTHY
+FULL_RESCAN = os.environ.get("FULL_RESCAN", "").strip().lower() in TRUTHY
+FULL_RESCAN_INTERVAL_DAYS = int(os.environ.get("FULL_RESCAN_INTERVAL_DAYS", "7"))
+# Pages archived or deleted since the snapshot only show up in a listing of
+# every page id, so incremental runs make one this often (0 = every run)
+REMOVAL_SWEEP_INTERVAL_DAYS = int(os.environ.get("REMOVAL_SWEEP_INTERVAL_DAYS", "3"))
+# With SKIP_UNCHANGED on, a run whose Metabase data and Notion DBs match the
+# fingerprints the last full run recorded stops before reading Notion (see
+# run_fingerprint.py). A full run is still made every FULL_RESCAN_INTERVAL_DAYS.
+SKIP_UNCHANGED = os.environ.get("SKIP_UNCHANGED", "").strip().lower() in TRUTHY
+
+# ───────────────────────── Plan / apply ─────────────────────
+# MODE=sync plans and applies in one go. MODE=plan only computes the writes,
+# logs a summary and saves them to PLAN_FILE if set (DRY_RUN=true is the same
+# thing). MODE=apply executes a saved plan without reading Metabase or the
+# Councils DB; with SHARD_COUNT > 1, each worker (SHARD_INDEX 0..N-1) applies
+# its own share. See plan_file.py.
+DRY_RUN = os.environ.get("DRY_RUN", "").strip().lower() in TRUTHY
+MODE = (os.environ.get("MODE") or ("plan" if DRY_RUN else "sync")).strip().lower()
+PLAN_FILE = os.environ.get("PLAN_FILE") or None
+SHARD_INDEX = int(os.environ.get("SHARD_INDEX") or "0")
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT") or "1")
+
+# ───────────────────────── Run metrics ──────────────────────
+# With METRICS_DIR set, a JSON report and a Prometheus textfile are written
+# there at the end of each run (see metrics.py).
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+METRICS_JOB = "sync-planx-services-detailed"
+
+# ───────────────────────── Profiling ────────────────────────
+# With PROFILE on (or --profile on the command line), each phase is run under
+# cProfile and tracemalloc and the results are written to a per-run directory
+# under PROFILE_DIR (see profiling.py).
+PROFILE = (
+    os.environ.get("PROFILE", "").strip().lower() in TRUTHY
+    or "--profile" in sys.argv[1:]
+)
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or "profiles"
 
 # ───────────────────────── Councils DB props ─────────────────
 COUNCIL_PROP_NAME = "Council Name"  # title
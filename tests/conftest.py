@@ -0,0 +1,103 @@
+"""
+Shared fixtures for the job tests.
+
+Every job folder under src/ is a standalone script directory whose modules use
+the same local names (config, api_helpers, metrics, ...), so a test imports a
+job's modules in isolation with load_job_modules, like src/sync-all does.
+Each load gets fresh module state (metrics, rate limiters, shared sessions).
+
+End-to-end cases run against the local API stand-ins from benchmarks/.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_ROOT / "src"
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from fake_servers import FakeServer, Scenario  # noqa: E402
+from run_benchmarks import job_env  # noqa: E402
+
+ENTITY_SYNC_DIR = "planning-data-entity-sync"
+API_FETCH_DIR = "planning-data-api-fetch"
+SERVICES_DIR = "sync-planx-services-detailed"
+SYNC_ALL_DIR = "sync-all"
+
+
+def load_job_modules(dirname: str, *names: str) -> SimpleNamespace:
+    """
+    Imports the named modules of src/<dirname> and returns them as attributes.
+    Their local imports resolve within the job folder; sys.modules is left as
+    it was found.
+    """
+    job_dir = SRC_DIR / dirname
+    local_names = {path.stem for path in job_dir.glob("*.py")}
+    saved = {name: sys.modules.pop(name) for name in local_names if name in sys.modules}
+
+    sys.path.insert(0, str(job_dir))
+    try:
+        modules = {name: importlib.import_module(name) for name in names}
+    finally:
+        sys.path.remove(str(job_dir))
+        for name in local_names:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+    return SimpleNamespace(**modules)
+
+
+@pytest.fixture
+def fake_server() -> Iterator[Callable[..., FakeServer]]:
+    """
+    Starts a FakeServer for the given Scenario fields; stopped after the test.
+    """
+    servers: list[FakeServer] = []
+
+    def start(**scenario: Any) -> FakeServer:
+        server = FakeServer(Scenario(**scenario)).__enter__()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.__exit__(None, None, None)
+
+
+@pytest.fixture
+def load_job(monkeypatch, tmp_path) -> Callable[..., SimpleNamespace]:
+    """
+    Returns load(dirname, *modules, server=None, **env): sets the job
+    environment (pointed at server if given, with state under tmp_path and
+    fast write rates) and imports the modules. Env values override the
+    defaults; the environment is restored after the test.
+    """
+
+    def load(
+        dirname: str, *names: str, server: FakeServer | None = None, **env: str
+    ) -> SimpleNamespace:
+        base_url = server.base_url if server is not None else "http://127.0.0.1:9"
+        settings = job_env(base_url, str(tmp_path))
+        settings.update(
+            {
+                "HTTP_CACHE_DIR": "",
+                "NOTION_WRITES_PER_SECOND": "200",
+                "NOTION_MAX_WRITES_PER_SECOND": "400",
+                "NOTION_WRITE_BURST": "50",
+                "RETRY_BASE_DELAY_SECS": "0.01",
+                "RETRY_MAX_DELAY_SECS": "0.05",
+            }
+        )
+        settings.update(env)
+        for key, value in settings.items():
+            monkeypatch.setenv(key, value)
+        return load_job_modules(dirname, *names)
+
+    return load
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from collections import Counter
+
+from conftest import ENTITY_SYNC_DIR
+from fake_servers import COUNCILS_DB_ID
+
+
+def _reference_codes(server) -> Counter:
+    return Counter(
+        page["properties"]["Reference Code"]["rich_text"][0]["plain_text"]
+        for page in server.data.databases[COUNCILS_DB_ID].values()
+    )
+
+
+def test_failed_creates_are_not_duplicated(load_job, fake_server):
+    server = fake_server(councils=30, entities_per_dataset=50)
+    jobs = load_job(ENTITY_SYNC_DIR, "main", server=server)
+    config = jobs.main.build_config(notion_token="test")
+    # Every create is applied, but the first ones are answered with a 503
+    server.forced_5xx["notion.pages.create"] = 3
+
+    jobs.main.sync_notion_from_planning_data(config)
+
+    codes = _reference_codes(server)
+    assert set(codes) == {la["reference"] for la in server.data.local_authorities}
+    assert max(codes.values()) == 1
+    assert server.counters.requests[("notion.pages.create", 503)] == 3
+
+
+def test_skipped_run_leaves_no_writer_open(load_job, fake_server, monkeypatch, capsys):
+    server = fake_server(councils=20, entities_per_dataset=50)
+    jobs = load_job(ENTITY_SYNC_DIR, "main", server=server, SKIP_UNCHANGED="true")
+    config = jobs.main.build_config(notion_token="test")
+    opened: list = []
+    closed: list = []
+
+    class RecordingExecutor(jobs.main.NotionWriteExecutor):
+        def __init__(self, *args):
+            super().__init__(*args)
+            opened.append(self)
+
+        def __exit__(self, *exc_info):
+            closed.append(self)
+            return super().__exit__(*exc_info)
+
+    monkeypatch.setattr(jobs.main, "NotionWriteExecutor", RecordingExecutor)
+    jobs.main.sync_notion_from_planning_data(config)
+    jobs.main.sync_notion_from_planning_data(config)
+
+    assert "nothing changed" in capsys.readouterr().out
+    assert len(opened) == 1
+    assert closed == opened
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from conftest import API_FETCH_DIR, load_job_modules
+
+http_cache = load_job_modules(API_FETCH_DIR, "http_cache").http_cache
+
+
+@dataclass
+class Response:
+    status_code: int
+    content: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class Origin:
+    """Serves one body per URL with an ETag and honours If-None-Match."""
+
+    def __init__(self, bodies: Dict[str, bytes]) -> None:
+        self.bodies = bodies
+        self.sent: List[Dict[str, str]] = []
+
+    def send(self, url: str):
+        def _send(headers: Dict[str, str]) -> Response:
+            self.sent.append(headers)
+            etag = f'"{hash(self.bodies[url])}"'
+            if headers.get("If-None-Match") == etag:
+                return Response(304)
+            return Response(200, self.bodies[url], {"ETag": etag})
+
+        return _send
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(tmp_path, monkeypatch, ttl_secs=60, max_bytes=1024) -> tuple:
+    clock = Clock()
+    monkeypatch.setattr(http_cache.time, "time", clock)
+    return http_cache.HttpCache(str(tmp_path), ttl_secs, max_bytes), clock
+
+
+def test_fresh_entries_are_served_without_a_request(tmp_path, monkeypatch):
+    cache, clock = _cache(tmp_path, monkeypatch)
+    origin = Origin({"a": b"alpha"})
+
+    assert cache.fetch("a", origin.send("a")) == b"alpha"
+    clock.now += 59
+    assert cache.fetch("a", origin.send("a")) == b"alpha"
+
+    assert len(origin.sent) == 1
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+
+
+def test_stale_entries_are_revalidated(tmp_path, monkeypatch):
+    cache, clock = _cache(tmp_path, monkeypatch)
+    origin = Origin({"a": b"alpha"})
+    cache.fetch("a", origin.send("a"))
+
+    clock.now += 61
+    assert cache.fetch("a", origin.send("a")) == b"alpha"
+    assert "If-None-Match" in origin.sent[-1]
+    assert cache.stats.revalidations == 1
+
+    # A 304 restarts the TTL
+    clock.now += 30
+    cache.fetch("a", origin.send("a"))
+    assert len(origin.sent) == 2
+
+    origin.bodies["a"] = b"changed"
+    clock.now += 61
+    assert cache.fetch("a", origin.send("a")) == b"changed"
+    assert cache.stats.misses == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache, clock = _cache(tmp_path, monkeypatch, max_bytes=20)
+    origin = Origin({url: url.encode() * 8 for url in "abc"})
+
+    cache.fetch("a", origin.send("a"))
+    clock.now += 1
+    cache.fetch("b", origin.send("b"))
+    clock.now += 1
+    cache.fetch("a", origin.send("a"))  # hit: "b" is now the oldest
+    clock.now += 1
+    cache.fetch("c", origin.send("c"))
+
+    assert cache.stats.evictions == 1
+    sent = len(origin.sent)
+    cache.fetch("a", origin.send("a"))
+    cache.fetch("c", origin.send("c"))
+    assert len(origin.sent) == sent
+    cache.fetch("b", origin.send("b"))
+    assert len(origin.sent) == sent + 1
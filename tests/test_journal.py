@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+from conftest import API_FETCH_DIR, SERVICES_DIR, load_job_modules
+from fake_servers import COUNCILS_DB_ID
+
+CONTEXT = {"database_id": "db"}
+
+
+def _ops(*keys: str) -> list[dict]:
+    return [{"key": key, "value": key.upper()} for key in keys]
+
+
+# ----------------------------
+# Resuming after a crash
+# ----------------------------
+
+
+@pytest.mark.parametrize("dirname", [API_FETCH_DIR, SERVICES_DIR])
+def test_interrupted_run_resumes_pending_ops(dirname, tmp_path):
+    Journal = load_job_modules(dirname, "journal").journal.Journal
+    first = Journal(str(tmp_path), "journal-test", CONTEXT)
+    first.record_ops(_ops("a", "b", "c"))
+    first.mark_done("b")
+    # The run dies here, without complete()
+
+    resumed = Journal(str(tmp_path), "journal-test", CONTEXT)
+
+    assert resumed.resumed
+    assert resumed.pending_ops() == _ops("a", "c")
+
+
+@pytest.mark.parametrize("dirname", [API_FETCH_DIR, SERVICES_DIR])
+def test_journal_from_another_configuration_is_discarded(dirname, tmp_path):
+    Journal = load_job_modules(dirname, "journal").journal.Journal
+    Journal(str(tmp_path), "journal-test", CONTEXT).record_ops(_ops("a"))
+
+    fresh = Journal(str(tmp_path), "journal-test", {"database_id": "other"})
+
+    assert not fresh.resumed
+    assert fresh.pending_ops() == []
+
+
+def test_partial_last_line_is_ignored(tmp_path):
+    Journal = load_job_modules(API_FETCH_DIR, "journal").journal.Journal
+    first = Journal(str(tmp_path), "journal-test", CONTEXT)
+    first.record_batch("cursor-1", ["p1", "p2"], _ops("a", "b"))
+    first.mark_done("a")
+    with open(first.path, "a", encoding="utf-8") as f:
+        f.write('{"t": "done", "ke')
+
+    resumed = Journal(str(tmp_path), "journal-test", CONTEXT)
+
+    assert resumed.cursor == "cursor-1"
+    assert resumed.seen_pages == {"p1", "p2"}
+    assert resumed.pending_ops() == _ops("b")
+
+
+# ----------------------------
+# Finished runs with failed writes
+# ----------------------------
+
+
+def _flip_checkbox(server) -> None:
+    page = next(
+        p
+        for p in server.data.databases[COUNCILS_DB_ID].values()
+        if p["properties"]["PD Entity"]["rich_text"]
+    )
+    current = page["properties"]["PD-Trees"]["checkbox"]
+    server.data.update_page(
+        page["id"], {"properties": {"PD-Trees": {"checkbox": not current}}}
+    )
+
+
+def _journals(state_dir: str) -> list[str]:
+    return [name for name in os.listdir(state_dir) if name.startswith("journal-")]
+
+
+def _writes(server) -> int:
+    return sum(
+        n
+        for (endpoint, _), n in server.counters.requests.items()
+        if endpoint in ("notion.pages.create", "notion.pages.update")
+    )
+
+
+def test_failed_writes_do_not_stop_the_next_run_planning(load_job, fake_server):
+    server = fake_server(councils=20, entities_per_dataset=200)
+    jobs = load_job(API_FETCH_DIR, "main", server=server, RETRY_MAX_ATTEMPTS="1")
+    config = jobs.main.build_config(notion_token="test")
+    server.forced_5xx["notion.pages.update"] = 1
+
+    jobs.main.sync_notion_from_planning_data(config)
+    assert server.counters.requests[("notion.pages.update", 503)] == 1
+    assert not _journals(config.state_dir)
+
+    # Changed after the failed run: the next one must see it, not just resume
+    _flip_checkbox(server)
+    jobs.main.sync_notion_from_planning_data(config)
+    writes = _writes(server)
+    jobs.main.sync_notion_from_planning_data(config)
+
+    assert _writes(server) == writes
+
+
+def test_failed_service_writes_do_not_stop_the_next_run_planning(
+    load_job, fake_server, tmp_path
+):
+    server = fake_server(councils=10, services=40, existing_services=0.8)
+    jobs = load_job(
+        SERVICES_DIR, "main", "async_apply", server=server, NOTION_MAX_ATTEMPTS="1"
+    )
+    server.forced_5xx["notion.pages.update"] = 1
+
+    with pytest.raises(jobs.async_apply.WritesFailed):
+        jobs.main.sync_services()
+    assert server.counters.requests[("notion.pages.update", 503)] == 1
+    assert not _journals(str(tmp_path / "state"))
+
+    # Changed after the failed run: the next one must see it, not just resume
+    server.data.metabase_rows[0]["usage"] += 7
+    jobs.main.sync_services()
+    writes = _writes(server)
+    jobs.main.sync_services()
+
+    assert _writes(server) == writes
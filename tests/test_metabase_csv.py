@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from conftest import SERVICES_DIR
+
+
+def _load(load_job, fake_server, **env):
+    server = fake_server(councils=10, services=25)
+    rows = server.data.metabase_rows
+    # Values pandas would otherwise read as numbers, NaN or padded text
+    rows[0].update(team_slug="007", service_name="  Padded  ", url="")
+    rows[1].update(reference_code="NA", usage="")
+    jobs = load_job(
+        SERVICES_DIR, "api_helpers", server=server, METABASE_CHUNK_ROWS="4", **env
+    )
+    return server, jobs.api_helpers
+
+
+def test_streamed_csv_matches_the_json_export(load_job, fake_server):
+    _, api_helpers = _load(load_job, fake_server)
+
+    df = api_helpers.fetch_metabase_csv_df()
+
+    pd.testing.assert_frame_equal(df, api_helpers.fetch_metabase_df())
+    assert len(df) == 25
+    assert df.loc[0, "team_slug"] == "007"
+    assert df.loc[0, "service_name"] == "Padded"
+    assert df.loc[0, "url"] == ""
+    assert df.loc[1, "reference_code"] == "NA"
+    assert df.loc[1, "usage"] == 0
+    assert df["usage"].dtype == int
+    assert all(
+        df[col].dtype == api_helpers.STRING_DTYPE
+        for col in api_helpers.METABASE_TEXT_COLUMNS
+    )
+
+
+def test_streamed_csv_missing_a_column_fails(load_job, fake_server):
+    server, api_helpers = _load(load_job, fake_server)
+    for row in server.data.metabase_rows:
+        del row["flow_id"]
+
+    with pytest.raises(ValueError, match="flow_id"):
+        api_helpers.fetch_metabase_csv_df()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+
+from conftest import SERVICES_DIR, load_job_modules
+
+metrics = load_job_modules(SERVICES_DIR, "metrics").metrics
+
+PAGE_URL = "https://api.notion.com/v1/pages/0123456789abcdef0123456789abcdef"
+LABEL = "PATCH api.notion.com/v1/pages/{id}"
+
+
+def _collector():
+    collector = metrics.Metrics()
+    collector.observe_request("PATCH", PAGE_URL, 200, 0.07)
+    collector.observe_request("patch", PAGE_URL.replace("0123", "4567"), 429, 0.3)
+    collector.observe_request("PATCH", PAGE_URL, "error", 12.0)
+    collector.count_retry("PATCH", PAGE_URL, "429")
+    collector.add_sleep("retry", 1.5)
+    with collector.phase("apply"):
+        pass
+    return collector
+
+
+def test_reports_group_requests_by_endpoint(tmp_path):
+    paths = _collector().write_reports(str(tmp_path), "job")
+
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["job.json", "job.prom"]
+    report = json.loads((tmp_path / "job.json").read_text())
+    endpoint = report["endpoints"][LABEL]
+    assert report["endpoints"].keys() == {LABEL}
+    assert endpoint["requests"] == 3
+    assert endpoint["statuses"] == {"200": 1, "429": 1, "error": 1}
+    assert endpoint["retries"] == {"429": 1}
+    assert endpoint["buckets"]["0.1"] == 1
+    assert endpoint["buckets"]["0.5"] == 2
+    assert endpoint["buckets"]["+Inf"] == 3
+    assert report["sleep_secs"] == {"retry": 1.5}
+    assert "apply" in report["phases_secs"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_prometheus_histogram_is_cumulative():
+    text = _collector().to_prometheus("job")
+
+    samples = dict(
+        line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#")
+    )
+    base = f'job="job",endpoint="{LABEL}"'
+    bucket = "planx_http_request_duration_seconds_bucket"
+    assert samples[f'{bucket}{{{base},le="0.05"}}'] == "0"
+    assert samples[f'{bucket}{{{base},le="0.1"}}'] == "1"
+    assert samples[f'{bucket}{{{base},le="10"}}'] == "2"
+    assert samples[f'{bucket}{{{base},le="+Inf"}}'] == "3"
+    assert samples[f"planx_http_request_duration_seconds_count{{{base}}}"] == "3"
+    assert samples[f'planx_http_responses_total{{{base},status="429"}}'] == "1"
+    assert samples[f'planx_http_retries_total{{{base},reason="429"}}'] == "1"
+    assert "# TYPE planx_http_request_duration_seconds histogram" in text
+    assert text.endswith("\n")
+
+
+def test_write_metrics_without_a_directory_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    metrics.write_metrics(None, "job")
+
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from conftest import API_FETCH_DIR, SERVICES_DIR
+from fake_servers import COUNCILS_DB_ID, SERVICES_DB_ID
+
+
+def _archive_first(server, database_id: str) -> str:
+    page_id = next(iter(server.data.databases[database_id]))
+    server.data.update_page(page_id, {"archived": True})
+    return page_id
+
+
+def _council_snapshot(load_job, server, **env):
+    jobs = load_job(
+        API_FETCH_DIR,
+        "main",
+        "notion_snapshot",
+        server=server,
+        INCREMENTAL="true",
+        **env,
+    )
+    config = jobs.main.build_config(notion_token="test")
+    jobs.main.configure_transport(config)
+
+    def snapshot_ids() -> set[str]:
+        return {
+            page_id
+            for batch in jobs.notion_snapshot.iter_snapshot_page_batches(
+                config, "councils-test", ["Reference Code"], lambda p: p["id"]
+            )
+            for page_id in batch
+        }
+
+    return snapshot_ids
+
+
+def _queries(server) -> int:
+    return server.counters.requests[("notion.databases.query", 200)]
+
+
+def test_incremental_council_snapshot_drops_archived_pages(
+    load_job, fake_server, capsys
+):
+    server = fake_server(councils=30, entities_per_dataset=10)
+    snapshot_ids = _council_snapshot(load_job, server, REMOVAL_SWEEP_INTERVAL_DAYS="0")
+
+    assert snapshot_ids() == set(server.data.databases[COUNCILS_DB_ID])
+    archived = _archive_first(server, COUNCILS_DB_ID)
+    capsys.readouterr()
+
+    ids = snapshot_ids()
+
+    out = capsys.readouterr().out
+    assert "Notion read mode: incremental" in out
+    assert "Removal sweep: running" in out
+    assert archived not in ids
+    assert len(ids) == len(server.data.databases[COUNCILS_DB_ID]) - 1
+
+
+def test_incremental_services_snapshot_drops_archived_pages(
+    load_job, fake_server, caplog
+):
+    server = fake_server(councils=10, services=40, existing_services=1.0)
+    caplog.set_level("INFO")
+    jobs = load_job(
+        SERVICES_DIR,
+        "api_helpers",
+        server=server,
+        INCREMENTAL="true",
+        REMOVAL_SWEEP_INTERVAL_DAYS="0",
+    )
+    api = jobs.api_helpers
+    notion = api.notion_client()
+    flow_ids = {
+        page["id"]: page["properties"]["Flow Id"]["title"][0]["plain_text"]
+        for page in server.data.databases[SERVICES_DB_ID].values()
+    }
+
+    assert set(api.load_services_by_flow_id(notion)) == set(flow_ids.values())
+    archived = _archive_first(server, SERVICES_DB_ID)
+
+    services = api.load_services_by_flow_id(notion)
+
+    assert "services-detailed read mode: incremental" in caplog.text
+    assert flow_ids[archived] not in services
+    assert len(services) == len(flow_ids) - 1
+
+
+def test_incremental_read_between_sweeps_only_queries_edits(
+    load_job, fake_server, capsys
+):
+    # Three query pages for a full listing
+    server = fake_server(councils=250, entities_per_dataset=10)
+    snapshot_ids = _council_snapshot(load_job, server)
+    snapshot_ids()
+    capsys.readouterr()
+    queries = _queries(server)
+
+    assert len(snapshot_ids()) == len(server.data.databases[COUNCILS_DB_ID])
+
+    assert "Removal sweep: skipped" in capsys.readouterr().out
+    assert _queries(server) == queries + 1
+
+
+def test_filter_properties_trims_pages_to_the_title(load_job, fake_server):
+    server = fake_server(councils=10, entities_per_dataset=10)
+    jobs = load_job(API_FETCH_DIR, "api_helpers", "config", server=server)
+    config = jobs.config.build_config(notion_token="test")
+
+    pages = [
+        page
+        for batch in jobs.api_helpers.iter_database_page_batches(
+            config, filter_properties=["title"]
+        )
+        for page in batch
+    ]
+
+    assert {page["id"] for page in pages} == set(server.data.databases[COUNCILS_DB_ID])
+    assert all(list(page["properties"]) == ["Council Name"] for page in pages)
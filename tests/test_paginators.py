@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from conftest import API_FETCH_DIR, SERVICES_DIR
+from fake_servers import COUNCILS_DB_ID, SERVICES_DB_ID
+
+
+def _page_ids(server, database_id: str) -> set[str]:
+    return {
+        page["id"]
+        for page in server.data.databases[database_id].values()
+        if not page["archived"]
+    }
+
+
+def test_cursor_batches_cover_the_database_once(load_job, fake_server):
+    server = fake_server(councils=40, entities_per_dataset=10)
+    jobs = load_job(API_FETCH_DIR, "api_helpers", "config", server=server)
+    config = jobs.config.build_config(notion_token="test")
+
+    batches = list(jobs.api_helpers.iter_database_cursor_batches(config, page_size=7))
+
+    ids = [page["id"] for batch, _ in batches for page in batch]
+    assert len(ids) == len(set(ids))
+    assert set(ids) == _page_ids(server, COUNCILS_DB_ID)
+    assert all(len(batch) == 7 for batch, _ in batches[:-1])
+    assert [cursor is None for _, cursor in batches] == [False] * (len(batches) - 1) + [
+        True
+    ]
+
+
+def test_cursor_batches_resume_after_a_cursor(load_job, fake_server):
+    server = fake_server(councils=40, entities_per_dataset=10)
+    jobs = load_job(API_FETCH_DIR, "api_helpers", "config", server=server)
+    config = jobs.config.build_config(notion_token="test")
+    batches = list(jobs.api_helpers.iter_database_cursor_batches(config, page_size=7))
+
+    _, cursor = batches[2]
+    resumed = list(
+        jobs.api_helpers.iter_database_cursor_batches(
+            config, page_size=7, start_cursor=cursor
+        )
+    )
+
+    assert resumed == batches[3:]
+
+
+def test_services_paginator_covers_the_database_once(
+    load_job, fake_server, monkeypatch
+):
+    server = fake_server(councils=10, services=60, existing_services=0.5)
+    jobs = load_job(SERVICES_DIR, "api_helpers", "sync_config", server=server)
+    monkeypatch.setattr(jobs.sync_config, "PAGE_SIZE", 7)
+    notion = jobs.api_helpers.notion_client()
+
+    ids = [page["id"] for page in jobs.api_helpers.paginate_db(notion, SERVICES_DB_ID)]
+
+    assert len(ids) == len(set(ids))
+    assert set(ids) == _page_ids(server, SERVICES_DB_ID)
+    assert server.counters.requests[("notion.databases.query", 200)] == -(
+        -len(ids) // 7
+    )
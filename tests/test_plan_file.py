@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import SERVICES_DIR, load_job_modules
+
+plan_file = load_job_modules(SERVICES_DIR, "plan_file").plan_file
+
+CONTEXT = {"services_db": "db", "shards": 3}
+OPS = [{"key": f"create:service-{i}", "props": {"Name": i}} for i in range(30)] + [
+    {"key": f"page:{i:032x}", "page_id": f"{i:032x}", "props": {}} for i in range(30)
+]
+
+
+@pytest.mark.parametrize("filename", ["plan.json", "plans/plan.json.gz"])
+def test_plan_round_trips(tmp_path, filename):
+    path = str(tmp_path / filename)
+
+    written = plan_file.write_plan(path, "job", CONTEXT, OPS)
+    plan = plan_file.read_plan(path, "job", CONTEXT)
+
+    assert plan == written
+    assert plan["ops"] == OPS
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_plan_from_another_job_or_configuration_is_refused(tmp_path):
+    path = str(tmp_path / "plan.json")
+    plan_file.write_plan(path, "job", CONTEXT, OPS)
+
+    with pytest.raises(ValueError, match="made by job"):
+        plan_file.read_plan(path, "other-job", CONTEXT)
+    with pytest.raises(ValueError, match="different configuration"):
+        plan_file.read_plan(path, "job", {**CONTEXT, "shards": 2})
+
+
+def test_shards_partition_the_ops():
+    shards = [plan_file.shard_ops(OPS, i, 3) for i in range(3)]
+
+    assert sorted(op["key"] for shard in shards for op in shard) == sorted(
+        op["key"] for op in OPS
+    )
+    assert all(shards)
+    assert shards == [plan_file.shard_ops(OPS, i, 3) for i in range(3)]
+    assert plan_file.shard_ops(OPS, 0, 1) == OPS
+    assert plan_file.summarize_ops(OPS) == "60 writes (create=30, page=30)"
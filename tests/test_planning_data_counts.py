@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from conftest import API_FETCH_DIR
+from fake_servers import PD_DATASETS
+
+
+def _load(load_job, server, **env):
+    jobs = load_job(API_FETCH_DIR, "main", server=server, **env)
+    config = jobs.main.build_config(notion_token="test")
+    jobs.main.configure_transport(config)
+    return jobs.main, config
+
+
+def test_concurrent_counts_match_planning_data(load_job, fake_server):
+    server = fake_server(councils=20, entities_per_dataset=200)
+    main, config = _load(load_job, server, PD_MAX_IN_FLIGHT="4")
+    entities = [str(la["entity"]) for la in server.data.local_authorities[:10]]
+
+    counts = main.fetch_dataset_counts(config, entities + entities[:3], PD_DATASETS)
+
+    assert len(counts) == len(entities) * len(PD_DATASETS)
+    for (entity, dataset), count in counts.items():
+        assert count == server.data.org_counts.get((dataset, entity), 0)
+
+
+def test_failed_count_only_affects_its_own_pair(load_job, fake_server):
+    server = fake_server(councils=5, entities_per_dataset=50)
+    main, config = _load(load_job, server, RETRY_MAX_ATTEMPTS="1")
+    server.forced_5xx["planning_data.entity"] = 1
+    entities = [str(la["entity"]) for la in server.data.local_authorities[:3]]
+
+    counts = main.fetch_dataset_counts(config, entities, PD_DATASETS)
+
+    failed = [key for key, value in counts.items() if isinstance(value, Exception)]
+    assert len(failed) == 1
+    assert len(counts) == len(entities) * len(PD_DATASETS)
+
+
+def test_index_backend_agrees_with_probe_backend(load_job, fake_server):
+    server = fake_server(councils=15, entities_per_dataset=300)
+    entities = [str(la["entity"]) for la in server.data.local_authorities[:15]]
+    probe, probe_config = _load(load_job, server)
+    index, index_config = _load(
+        load_job, server, PD_COUNT_BACKEND="index", PD_PAGE_SIZE="40"
+    )
+
+    assert index.resolve_dataset_counts(
+        index_config, entities, PD_DATASETS
+    ) == probe.resolve_dataset_counts(probe_config, entities, PD_DATASETS)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import cProfile
+import pstats
+
+from conftest import API_FETCH_DIR, load_job_modules
+
+profiling = load_job_modules(API_FETCH_DIR, "profiling").profiling
+
+
+def fib(n: int) -> int:
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+def spin() -> int:
+    return sum(i * i for i in range(20000))
+
+
+def outer() -> int:
+    return fib(18) + spin()
+
+
+def test_collapsed_stacks_fold_recursion_and_keep_the_total():
+    profiler = cProfile.Profile()
+    profiler.runcall(outer)
+    stats = pstats.Stats(profiler)
+
+    lines = profiling.collapsed_stacks(stats)
+
+    stacks = [line.rsplit(" ", 1) for line in lines]
+    # The profiler's own disable() call is a root of its own
+    frames = [stack.split(";") for stack, _ in stacks if "_lsprof" not in stack]
+    assert all(len(path) == len(set(path)) for path in frames)
+    assert all(path[0].startswith("outer (") for path in frames)
+    assert any(path[-1].startswith("fib (") for path in frames)
+    assert any(path[-1].startswith("spin (") for path in frames)
+
+    outer_func = next(func for func in stats.stats if func[2] == "outer")
+    total_us = stats.stats[outer_func][3] * 1e6
+    assert abs(sum(int(us) for _, us in stacks) - total_us) < total_us * 0.01
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+import pytest
+from conftest import API_FETCH_DIR, ENTITY_SYNC_DIR, SERVICES_DIR, load_job_modules
+
+CONTEXT = {"database_id": "db"}
+EDITED = "2024-01-01T00:00:00.000Z"
+
+
+@pytest.mark.parametrize("dirname", [API_FETCH_DIR, ENTITY_SYNC_DIR])
+def test_hash_settles_a_page_until_it_is_edited(dirname, tmp_path):
+    module = load_job_modules(dirname, "record_hashes").record_hashes
+    digest = module.record_hash({"PD-Trees": True})
+    first = module.RecordHashes(str(tmp_path), "hashes", CONTEXT)
+    first.remember("a", digest, EDITED)
+    first.remember("b", digest, None)  # about to be written
+    first.save()
+
+    hashes = module.RecordHashes(str(tmp_path), "hashes", CONTEXT)
+
+    assert hashes.unchanged("a", digest, EDITED)
+    assert not hashes.unchanged("a", digest, "2024-01-02T00:00:00.000Z")
+    assert not hashes.unchanged("a", module.record_hash({"PD-Trees": False}), EDITED)
+    assert not hashes.unchanged("b", digest, None)
+    assert not module.RecordHashes(str(tmp_path), "hashes", {}).unchanged(
+        "a", digest, EDITED
+    )
+
+
+@pytest.mark.parametrize("dirname", [API_FETCH_DIR, ENTITY_SYNC_DIR, SERVICES_DIR])
+def test_no_state_dir_saves_nothing(dirname, tmp_path, monkeypatch):
+    module = load_job_modules(dirname, "record_hashes").record_hashes
+    monkeypatch.chdir(tmp_path)
+
+    module.RecordHashes(None, "hashes", CONTEXT).save()
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_services_hashes_compare_column_by_column(tmp_path):
+    module = load_job_modules(SERVICES_DIR, "record_hashes").record_hashes
+    frame = pd.DataFrame({"usage": [1, 2, 3], "url": ["a", "b", "c"]})
+    page_ids = pd.Series(["p1", "p2", "p3"])
+    digests = module.row_hashes(frame)
+    first = module.RecordHashes(str(tmp_path), "hashes", CONTEXT)
+    first.remember(page_ids, digests, pd.Series([EDITED, EDITED, None]))
+    first.save()
+
+    hashes = module.RecordHashes(str(tmp_path), "hashes", CONTEXT)
+    frame.loc[1, "usage"] = 5
+
+    assert hashes.unchanged(
+        page_ids, module.row_hashes(frame), pd.Series([EDITED] * 3)
+    ).tolist() == [True, False, False]
+
+
+def test_settled_entity_sync_run_skips_by_hash(load_job, fake_server, capsys):
+    server = fake_server(councils=20, entities_per_dataset=50)
+    jobs = load_job(ENTITY_SYNC_DIR, "main", server=server)
+    config = jobs.main.build_config(notion_token="test")
+
+    # The first run writes, so the second still checks those pages by value
+    for _ in range(2):
+        jobs.main.sync_notion_from_planning_data(config)
+    capsys.readouterr()
+    jobs.main.sync_notion_from_planning_data(config)
+
+    out = capsys.readouterr().out
+    assert "Skipped (no changes needed): 23" in out
+    assert "settled by record hash: 23" in out
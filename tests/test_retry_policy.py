@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import API_FETCH_DIR, load_job_modules
+from fake_servers import COUNCILS_DB_ID
+
+jobs = load_job_modules(API_FETCH_DIR, "retry_policy")
+RetryPolicy = jobs.retry_policy.RetryPolicy
+CircuitBreaker = jobs.retry_policy.CircuitBreaker
+CircuitOpenError = jobs.retry_policy.CircuitOpenError
+
+
+# ----------------------------
+# Backoff and circuit breaker
+# ----------------------------
+
+
+def test_backoff_is_jittered_below_a_capped_ceiling():
+    policy = RetryPolicy(base_delay_secs=1.0, max_delay_secs=5.0)
+
+    for attempt, ceiling in [(0, 1.0), (1, 2.0), (2, 4.0), (3, 5.0), (10, 5.0)]:
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert len(set(delays)) > 1
+
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("example.org", failure_threshold=3, cooldown_secs=60)
+
+    for _ in range(2):
+        breaker.before_request()
+        breaker.record_failure()
+    breaker.record_success()  # resets the count
+    for _ in range(3):
+        breaker.before_request()
+        breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_circuit_lets_one_trial_through_after_the_cooldown():
+    breaker = CircuitBreaker("example.org", failure_threshold=1, cooldown_secs=0)
+    breaker.record_failure()
+
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # the trial is still in flight
+    breaker.record_failure()  # the trial failed: open again
+
+    breaker.before_request()
+    breaker.record_success()
+    breaker.before_request()
+    breaker.before_request()  # closed: no longer limited to one trial
+
+
+# ----------------------------
+# request_with_retry
+# ----------------------------
+
+
+def _api(load_job, server, **env):
+    jobs = load_job(API_FETCH_DIR, "api_helpers", "config", server=server, **env)
+    config = jobs.config.build_config(notion_token="test")
+    jobs.api_helpers.configure_transport(config)
+    return jobs.api_helpers, config
+
+
+def _create(api, config, idempotent: bool):
+    return api.request_with_retry(
+        "POST",
+        f"{config.notion_base_url}/pages",
+        timeout_secs=config.request_timeout_secs,
+        headers=api.build_notion_headers(config),
+        json_body={"parent": {"database_id": COUNCILS_DB_ID}, "properties": {}},
+        idempotent=idempotent,
+    )
+
+
+def _council_pages(server) -> int:
+    return len(server.data.databases[COUNCILS_DB_ID])
+
+
+def test_idempotent_request_is_retried_after_5xx(load_job, fake_server):
+    server = fake_server(councils=5, entities_per_dataset=10)
+    api, config = _api(load_job, server)
+    server.forced_5xx["notion.databases.query"] = 2
+
+    pages = api.query_all_database_pages(config)
+
+    assert len(pages) == _council_pages(server)
+    assert server.counters.requests[("notion.databases.query", 503)] == 2
+
+
+def test_non_idempotent_request_is_not_resent_after_5xx(load_job, fake_server):
+    server = fake_server(councils=5, entities_per_dataset=10)
+    api, config = _api(load_job, server)
+    before = _council_pages(server)
+    # Applied, then answered with a 503: a resend would create a second page
+    server.forced_5xx["notion.pages.create"] = 1
+
+    with pytest.raises(api.requests.HTTPError):
+        _create(api, config, idempotent=False)
+
+    assert _council_pages(server) == before + 1
+    assert server.counters.requests[("notion.pages.create", 200)] == 0
+
+
+def test_non_idempotent_request_is_retried_after_429(load_job, fake_server):
+    server = fake_server(councils=5, entities_per_dataset=10, error_rate_429=0.6)
+    api, config = _api(load_job, server, RETRY_MAX_ATTEMPTS="30")
+    before = _council_pages(server)
+
+    for _ in range(10):
+        assert _create(api, config, idempotent=False).status_code == 200
+
+    assert server.counters.injected_429 > 0
+    assert _council_pages(server) == before + 10
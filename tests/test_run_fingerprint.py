@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from collections import Counter
+
+import pytest
+
+from conftest import API_FETCH_DIR, load_job_modules
+from fake_servers import COUNCILS_DB_ID
+
+
+def _writes(server) -> int:
+    return sum(
+        n
+        for (endpoint, _), n in server.counters.requests.items()
+        if endpoint in ("notion.pages.create", "notion.pages.update")
+    )
+
+
+def _move_entity(server) -> None:
+    """
+    Moves one Planning Data entity to another council in Notion, leaving every
+    dataset's total unchanged.
+    """
+    data = server.data
+    in_notion = {
+        page["properties"]["PD Entity"]["rich_text"][0]["text"]["content"]
+        for page in data.databases[COUNCILS_DB_ID].values()
+        if page["properties"]["PD Entity"]["rich_text"]
+    }
+    for dataset, entities in data.dataset_entities.items():
+        source = next(
+            (e for e in entities if e["organisation-entity"] in in_notion), None
+        )
+        if source is None:
+            continue
+        target = sorted(in_notion - {source["organisation-entity"]})[0]
+        source["organisation-entity"] = target
+        data.org_counts = Counter(
+            (name, e["organisation-entity"])
+            for name, rows in data.dataset_entities.items()
+            for e in rows
+        )
+        return
+    raise AssertionError("no entity belongs to a council in Notion")
+
+
+@pytest.mark.parametrize("backend", ["probe", "index"])
+def test_skip_unchanged_sees_an_entity_change_organisation(
+    backend, load_job, fake_server
+):
+    server = fake_server(councils=20, entities_per_dataset=200)
+    jobs = load_job(
+        API_FETCH_DIR,
+        "main",
+        server=server,
+        SKIP_UNCHANGED="true",
+        PD_COUNT_BACKEND=backend,
+    )
+    config = jobs.main.build_config(notion_token="test")
+    jobs.main.sync_notion_from_planning_data(config)
+    writes = _writes(server)
+
+    _move_entity(server)
+    jobs.main.sync_notion_from_planning_data(config)
+
+    assert _writes(server) > writes
+
+
+def test_unchanged_index_run_is_skipped(load_job, fake_server):
+    server = fake_server(councils=20, entities_per_dataset=200)
+    jobs = load_job(
+        API_FETCH_DIR,
+        "main",
+        server=server,
+        SKIP_UNCHANGED="true",
+        PD_COUNT_BACKEND="index",
+    )
+    config = jobs.main.build_config(notion_token="test")
+    jobs.main.sync_notion_from_planning_data(config)
+    queries = server.counters.requests[("notion.databases.query", 200)]
+
+    jobs.main.sync_notion_from_planning_data(config)
+
+    # Only the Councils DB fingerprint query: the DB itself is not scanned
+    assert server.counters.requests[("notion.databases.query", 200)] == queries + 1
+
+
+def test_fingerprint_ignores_key_order():
+    fingerprint = load_job_modules(API_FETCH_DIR, "run_fingerprint").run_fingerprint
+    a = {"dataset": {"1001": 3, "1002": 0}, "version": 1}
+    b = {"version": 1, "dataset": {"1002": 0, "1001": 3}}
+
+    assert fingerprint.fingerprint(a) == fingerprint.fingerprint(b)
+    assert fingerprint.fingerprint(a) != fingerprint.fingerprint({**a, "version": 2})
+
+
+def test_check_unchanged_reasons(load_job, fake_server):
+    server = fake_server(councils=10, entities_per_dataset=10)
+    jobs = load_job(API_FETCH_DIR, "run_fingerprint", "config", server=server)
+    config = jobs.config.build_config(notion_token="test")
+    check_unchanged = jobs.run_fingerprint.check_unchanged
+    context = {"datasets": ["tree"]}
+
+    assert check_unchanged(config, "fp", context, "a") == (
+        False,
+        "no fingerprints recorded yet",
+    )
+    jobs.run_fingerprint.record_run(config, "fp", context, "a")
+
+    assert check_unchanged(config, "fp", context, "a")[0]
+    assert check_unchanged(config, "fp", {"datasets": []}, "a") == (
+        False,
+        "configuration changed",
+    )
+    assert check_unchanged(config, "fp", context, "b") == (
+        False,
+        "source data changed",
+    )
+    page_id = next(iter(server.data.databases[COUNCILS_DB_ID]))
+    server.data.update_page(page_id, {"properties": {}})
+    assert check_unchanged(config, "fp", context, "a") == (
+        False,
+        "Notion edited since the last run",
+    )
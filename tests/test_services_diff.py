@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import pytest
+from conftest import SERVICES_DIR
+
+
+@pytest.fixture
+def jobs(load_job):
+    return load_job(SERVICES_DIR, "main", "api_helpers")
+
+
+def _row(flow_id: str, **overrides) -> dict:
+    return {
+        "reference_code": "REF00001",
+        "council_name": "Council 1",
+        "team_slug": "team-1",
+        "flow_id": flow_id,
+        "service_name": f"Service {flow_id}",
+        "service_slug": f"service-{flow_id}",
+        "usage": 10,
+        "first_online_at": "2024-01-01T00:00:00.000Z",
+        "url": f"https://example.planx.uk/{flow_id}",
+        **overrides,
+    }
+
+
+def _record(api, row: dict, page_id: str, **overrides):
+    fields = {
+        "flow_id": row["flow_id"],
+        "reference_code": row["reference_code"],
+        "council_name": row["council_name"],
+        "service_name": row["service_name"],
+        "usage": row["usage"],
+        "first_online": row["first_online_at"],
+        "url": row["url"],
+        "page_id": page_id,
+    }
+    return api.ServiceRecord(**{**fields, **overrides})
+
+
+def _diff(jobs, rows: list[dict], records: list) -> tuple[list, list, list]:
+    api = jobs.api_helpers
+    df = api.format_metabase_df(rows)
+    services_df = api.services_index_df({r.flow_id: r for r in records})
+    return jobs.main.diff_services(df, {}, services_df)
+
+
+def test_empty_services_db_and_no_flow_ids_plans_nothing(jobs):
+    assert _diff(jobs, [_row(""), _row("  ")], []) == ([], [], [])
+
+
+def test_first_run_creates_every_service(jobs):
+    to_create, to_update, to_relate = _diff(jobs, [_row("a"), _row("b")], [])
+
+    assert [
+        props["Flow Id"]["title"][0]["text"]["content"] for props, _ in to_create
+    ] == [
+        "a",
+        "b",
+    ]
+    assert to_update == [] and to_relate == []
+
+
+def test_existing_pages_without_flow_ids_plan_nothing(jobs):
+    row = _row("a")
+    records = [_record(jobs.api_helpers, row, "page-a")]
+
+    assert _diff(jobs, [_row("")], records) == ([], [], [])
+
+
+def test_only_changed_pages_are_updated(jobs):
+    api = jobs.api_helpers
+    same, stale = _row("a"), _row("b")
+    records = [
+        _record(api, same, "page-a"),
+        _record(api, stale, "page-b", usage=stale["usage"] - 1),
+    ]
+
+    to_create, to_update, to_relate = _diff(jobs, [same, stale], records)
+
+    assert to_create == [] and to_relate == []
+    assert [page_id for page_id, _ in to_update] == ["page-b"]
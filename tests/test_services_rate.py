@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+from conftest import SERVICES_DIR, load_job_modules
+
+
+@pytest.fixture
+def api(load_job):
+    return load_job(SERVICES_DIR, "api_helpers").api_helpers
+
+
+def _rate(api, rate: float = 4.0):
+    return api.AdaptiveRate(rate, 0.5, 10.0, increase=0.05, recovery=0.2)
+
+
+def _throttle(rate, retry_after: float | None = None) -> None:
+    rate.on_throttle(time.monotonic(), retry_after)
+
+
+def test_rate_rises_additively_until_throttled(api):
+    rate = _rate(api)
+    for _ in range(10):
+        rate.on_success()
+
+    assert rate.rate == pytest.approx(4.5)
+
+
+def _successes_to_reach(rate, target: float) -> int:
+    for n in range(1, 1000):
+        rate.on_success()
+        if rate.rate >= target:
+            return n
+    raise AssertionError(f"rate stuck at {rate.rate}")
+
+
+def test_throttled_rate_recovers_within_a_few_requests(api):
+    rate = _rate(api)
+    _throttle(rate)
+    assert rate.rate == pytest.approx(2.0)
+
+    # Additive increase alone would take 36 successes to get back to 3.8/s
+    assert _successes_to_reach(rate, 3.8) <= 15
+
+    # Past the rate that drew the 429 it only creeps up again
+    rate = _rate(api)
+    _throttle(rate)
+    _successes_to_reach(rate, 4.0)
+    assert _successes_to_reach(rate, 5.0) >= 19
+
+
+def test_429s_in_flight_at_the_cut_do_not_cut_again(api):
+    rate = _rate(api)
+    sent_before_cut = time.monotonic()
+    _throttle(rate)
+    rate.on_throttle(sent_before_cut, None)
+
+    assert rate.rate == pytest.approx(2.0)
+
+
+def test_repeated_429s_lower_the_target_gradually(api):
+    rate = _rate(api)
+    _throttle(rate)
+    time.sleep(0.001)
+    _throttle(rate)
+    assert rate.rate == pytest.approx(1.0)
+
+    target = 4.0 * api.THROTTLED_RATE_DECAY
+    assert _successes_to_reach(rate, target - 0.1) <= 20
+    assert rate.rate < target
+
+
+def test_retry_after_pauses_every_request(api):
+    rate = _rate(api)
+    _throttle(rate, retry_after=5)
+
+    assert 4 < rate.pause_remaining() <= 5
+
+
+def test_default_rate_stays_within_notions_average(monkeypatch):
+    for name in ("NOTION_WRITES_PER_SECOND", "NOTION_MAX_WRITES_PER_SECOND"):
+        monkeypatch.delenv(name, raising=False)
+    rate = load_job_modules(SERVICES_DIR, "api_helpers").api_helpers.NOTION_RATE
+
+    for _ in range(500):
+        rate.on_success()
+
+    assert rate.rate == pytest.approx(3.0)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter
+
+import pytest
+
+from conftest import SERVICES_DIR, load_job_modules
+from fake_servers import SERVICES_DB_ID
+
+
+def _load(load_job, server, **env):
+    return load_job(SERVICES_DIR, "main", "sync_config", server=server, **env)
+
+
+def _flow_ids(server) -> Counter:
+    return Counter(
+        page["properties"]["Flow Id"]["title"][0]["plain_text"]
+        for page in server.data.databases[SERVICES_DB_ID].values()
+    )
+
+
+def test_failed_creates_are_not_duplicated(load_job, fake_server):
+    server = fake_server(councils=10, services=30, existing_services=0.0)
+    jobs = _load(load_job, server)
+    # The first creates are applied but answered with a 503, as when a
+    # proxy drops Notion's reply
+    server.forced_5xx["notion.pages.create"] = 8
+
+    jobs.main.sync_services()
+
+    flow_ids = _flow_ids(server)
+    assert set(flow_ids) == {row["flow_id"] for row in server.data.metabase_rows}
+    assert max(flow_ids.values()) == 1
+    assert server.counters.requests[("notion.pages.create", 503)] == 8
+
+
+def test_plan_writes_sends_one_request_per_page():
+    plan_writes = load_job_modules(SERVICES_DIR, "async_apply").async_apply.plan_writes
+
+    def flow(flow_id: str, **props) -> dict:
+        return {"Flow Id": {"title": [{"text": {"content": flow_id}}]}, **props}
+
+    ops = plan_writes(
+        to_create=[
+            (flow("f1", Usage={"number": 1}), "council-a"),
+            (flow("f1", Usage={"number": 2}), "council-b"),
+            (flow("f2"), None),
+        ],
+        to_update=[("p1", {"Usage": {"number": 3}}), ("p1", {"Rank": {"number": 1}})],
+        to_relate=[("p1", ["council-a"]), ("p2", [])],
+    )
+
+    by_key = {op["key"]: op for op in ops}
+    assert sorted(by_key) == ["create:f1", "create:f2", "page:p1", "page:p2"]
+    assert by_key["create:f1"]["props"]["Usage"] == {"number": 2}
+    assert by_key["create:f1"]["council_page_id"] == "council-b"
+    assert by_key["page:p1"]["props"] == {
+        "Usage": {"number": 3},
+        "Rank": {"number": 1},
+    }
+    assert by_key["page:p1"]["rel_ids"] == ["council-a"]
+    assert by_key["page:p2"] == {
+        "key": "page:p2",
+        "page_id": "p2",
+        "props": None,
+        "rel_ids": [],
+    }
+
+
+def test_run_concurrently_returns_every_result():
+    main = load_job_modules(SERVICES_DIR, "main").main
+    started = threading.Barrier(3, timeout=5)
+
+    def task(value):
+        def run():
+            # All three must be running at once to get past the barrier
+            started.wait()
+            return value
+
+        return run
+
+    results = main.run_concurrently({name: task(name * 2) for name in "abc"})
+
+    assert results == {"a": "aa", "b": "bb", "c": "cc"}
+    assert main.METRICS.task_secs.keys() == {"a", "b", "c"}
+
+
+def test_run_concurrently_raises_the_first_failure_without_waiting():
+    main = load_job_modules(SERVICES_DIR, "main").main
+    release = threading.Event()
+
+    def fail():
+        raise LookupError("council missing")
+
+    try:
+        with pytest.raises(LookupError, match="council missing"):
+            main.run_concurrently({"slow": lambda: release.wait(5), "fails": fail})
+    finally:
+        release.set()
+    assert "slow" not in main.METRICS.task_secs
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import sys
+from types import ModuleType
+
+from conftest import (
+    API_FETCH_DIR,
+    ENTITY_SYNC_DIR,
+    SERVICES_DIR,
+    SRC_DIR,
+    SYNC_ALL_DIR,
+)
+from fake_servers import COUNCILS_DB_ID
+
+
+def _record_redundant_checkbox_writes(server, monkeypatch) -> list[str]:
+    """
+    Returns a list that collects the ids of pages sent a checkbox they
+    already hold.
+    """
+    redundant: list[str] = []
+    update_page = server.data.update_page
+
+    def recording_update(page_id: str, body: dict):
+        page = server.data.databases[COUNCILS_DB_ID].get(page_id)
+        props = body.get("properties") or {}
+        if page is not None and any(
+            "checkbox" in value
+            and page["properties"][name]["checkbox"] == value["checkbox"]
+            for name, value in props.items()
+        ):
+            redundant.append(page_id)
+        return update_page(page_id, body)
+
+    monkeypatch.setattr(server.data, "update_page", recording_update)
+    return redundant
+
+
+def test_councils_created_by_entity_sync_are_not_rewritten(
+    load_job, fake_server, monkeypatch
+):
+    server = fake_server(councils=20, services=20, entities_per_dataset=10)
+    sync_all = load_job(SYNC_ALL_DIR, "main", server=server).main
+    before = set(server.data.databases[COUNCILS_DB_ID])
+    redundant = _record_redundant_checkbox_writes(server, monkeypatch)
+
+    sync_all.main()
+
+    assert set(server.data.databases[COUNCILS_DB_ID]) > before
+    assert redundant == []
+
+
+def test_jobs_load_with_their_own_modules(load_job, monkeypatch):
+    sync_all = load_job(SYNC_ALL_DIR, "main").main
+    sentinel = ModuleType("config")
+    monkeypatch.setitem(sys.modules, "config", sentinel)
+    local_names = {
+        path.stem
+        for dirname in (ENTITY_SYNC_DIR, API_FETCH_DIR, SERVICES_DIR)
+        for path in (SRC_DIR / dirname).glob("*.py")
+    }
+    before = {name: sys.modules.get(name) for name in local_names}
+
+    entity_job = sync_all.load_job(sync_all.ENTITY_SYNC_DIR)
+    fetch_job = sync_all.load_job(sync_all.API_FETCH_DIR)
+    services_job = sync_all.load_job(sync_all.SERVICES_DETAILED_DIR)
+
+    assert {name: sys.modules.get(name) for name in local_names} == before
+    assert sys.modules["config"] is sentinel
+    # Same local module names, separate copies and state
+    assert entity_job.build_config is not fetch_job.build_config
+    assert entity_job.METRICS is not fetch_job.METRICS
+    assert services_job.METRICS not in (entity_job.METRICS, fetch_job.METRICS)
+    entity_config = entity_job.build_config(notion_token="test")
+    fetch_config = fetch_job.build_config(notion_token="test")
+    assert hasattr(fetch_config, "dataset_to_notion_prop")
+    assert not hasattr(entity_config, "dataset_to_notion_prop")
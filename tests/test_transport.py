@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import API_FETCH_DIR
+
+
+def _api(load_job, server, **env):
+    jobs = load_job(API_FETCH_DIR, "api_helpers", "config", server=server, **env)
+    config = jobs.config.build_config(notion_token="test")
+    jobs.api_helpers.configure_transport(config)
+    return jobs.api_helpers, config
+
+
+def test_one_pooled_session_per_host(load_job, fake_server):
+    server = fake_server(councils=5, entities_per_dataset=10)
+    api, config = _api(load_job, server)
+
+    notion = api.get_session(f"{config.notion_base_url}/databases/x/query")
+    planning_data = api.get_session(config.planning_data_base_url)
+
+    assert notion is planning_data  # the fakes share one host
+    assert isinstance(notion, api.requests.Session)
+    assert api.get_session("http://127.0.0.2:9/entity.json") is not notion
+
+
+def test_http2_uses_an_httpx_client(load_job, fake_server):
+    pytest.importorskip("h2")
+    server = fake_server(councils=5, entities_per_dataset=10)
+    api, config = _api(load_job, server, HTTP2="true")
+    httpx = pytest.importorskip("httpx")
+
+    session = api.get_session(config.planning_data_base_url)
+    payload = api.fetch_json(
+        f"{config.planning_data_base_url}?dataset=tree&limit=1",
+        timeout_secs=config.request_timeout_secs,
+    )
+
+    assert isinstance(session, httpx.Client)
+    assert "count" in payload